@@ -5,7 +5,7 @@ import argparse
 import os
 from socket import socket, AF_INET, SOCK_STREAM
 
-from src.factory import create_node_manger_by_node_info
+from src.factory import create_node_manger_by_node_info, ENGINES, THREAD_ENGINE
 from src.status_handler import StatusHandler
 from src.beans import NodeInformation, NetAddress
 from src.cmd_controller import CmdController
@@ -43,6 +43,20 @@ PARSER.add_argument('-n',
 PARSER.add_argument('--use_port_instead_of_life_time',
                     help='Use PORT instead of lifetime to determine quorum',
                     action='store_true')
+PARSER.add_argument('--use_load',
+                    help='Use advertised load instead of PORT or lifetime to determine '
+                         'quorum, least loaded node becomes master',
+                    action='store_true')
+PARSER.add_argument('--use_rtt',
+                    help='Use advertised round trip times to determine quorum, node '
+                         'closest to its peers becomes master',
+                    action='store_true')
+PARSER.add_argument('--digest_heartbeats',
+                    help='Send only key and version of own information while it is unchanged',
+                    action='store_true')
+PARSER.add_argument('--gossip',
+                    help='Probe few random nodes per interval and spread membership by gossip',
+                    action='store_true')
 PARSER.add_argument('-m', '--masterScript',
                     help='Python script that will be executed when node '
                          'become master or keep master status',
@@ -53,6 +67,11 @@ PARSER.add_argument('-s', '--slaveScript',
                          'node become normal or keep normal status',
                     type=str,
                     default=None)
+PARSER.add_argument('-e', '--engine',
+                    help='Use one send thread per connected node, one asyncio event loop '
+                         'or one selector thread for network communication',
+                    choices=ENGINES,
+                    default=THREAD_ENGINE)
 PARSER.add_argument('-d', '--debug', help='Print DEBUG messages while running',
                     action='store_true')
 
@@ -95,12 +114,20 @@ if __name__ == '__main__':
         NODE_MANGER = create_node_manger_by_node_info(node_info=OWN_INFO,
                                                       broadcast_address=BROAD_INFO,
                                                       vote_by_port=False, debug=DEBUG,
-                                                      human_user=True)
+                                                      human_user=True, engine=ARGS.engine,
+                                                      digest_heartbeats=ARGS.digest_heartbeats,
+                                                      gossip=ARGS.gossip,
+                                                      vote_by_load=ARGS.use_load,
+                                                      vote_by_rtt=ARGS.use_rtt)
     else:
         NODE_MANGER = create_node_manger_by_node_info(node_info=OWN_INFO,
                                                       broadcast_address=BROAD_INFO,
                                                       vote_by_port=True, debug=DEBUG,
-                                                      human_user=True)
+                                                      human_user=True, engine=ARGS.engine,
+                                                      digest_heartbeats=ARGS.digest_heartbeats,
+                                                      gossip=ARGS.gossip,
+                                                      vote_by_load=ARGS.use_load,
+                                                      vote_by_rtt=ARGS.use_rtt)
 
     SLAVE_SCRIPT = ARGS.slaveScript
 
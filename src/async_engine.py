@@ -0,0 +1,391 @@
+"""
+Provides asyncio based replacements for PingMan and Handshake. All sends, accepts,
+reads and broadcast datagrams of one node are handled on one event loop instead of
+one send thread per target.
+"""
+import asyncio
+import struct
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Lock, current_thread
+from socket import socket, AF_INET, SOCK_DGRAM, IPPROTO_UDP, SO_BROADCAST, \
+    SOL_SOCKET, SO_REUSEPORT
+
+from synchronized_set import SynchronizedSet
+from observer import Observable
+
+from src.beans import NetAddress, NodeInformation, UpdateValue, \
+    node_information_from_discovery_json
+from src.connection_pool import HEADER_FORMAT, HEADER_LENGTH, CONNECT_TIMEOUT, \
+    SEND_TIMEOUT, add_header
+from src.failure_detector import PhiAccrualFailureDetector
+from src.gossip import GossipMembership
+from src.heartbeat_scheduler import HeartbeatScheduler
+from src.inbound_pool import InboundWorkerPool
+from src.rtt import RttTracker
+from src.handshake import DEFAULT_BROADCAST, ENCODE_UTF_8, NEW_ENTERING_NODE
+from src.message_dict import MessageDict
+from src.pinger import INCOMING_MESSAGE, CONNECTION_LOST, SECOND_INTERVAL_PING_TRY, \
+    HeartbeatSender
+
+SECONDS_WAIT_FOR_LOOP = 5
+
+
+class AsyncEngine:
+    """
+    Owns the event loop of one node which runs in a single thread. Observers are
+    notified in one separate thread, so they can block (e.g. dispatching) without
+    blocking the loop. Loop is stopped when last user released it.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = Thread(target=self.__run_loop, daemon=True)
+        self.notify_executor = ThreadPoolExecutor(max_workers=1)
+        self.lock = Lock()
+        self.users = 0
+
+    def acquire(self):
+        """
+        Register user of loop and start loop thread if not running.
+        :return: None
+        """
+        with self.lock:
+            self.users += 1
+            if not self.loop_thread.is_alive():
+                self.loop_thread.start()
+
+    def release(self):
+        """
+        Unregister user of loop. Last user stops the loop.
+        :return: None
+        """
+        with self.lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.loop_thread is not current_thread():
+            self.loop_thread.join(SECONDS_WAIT_FOR_LOOP)
+        self.notify_executor.shutdown(wait=False)
+
+    def run(self, coroutine):
+        """
+        Execute coroutine on loop and wait for result.
+        :param coroutine: coroutine to execute
+        :return: result of coroutine
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(SECONDS_WAIT_FOR_LOOP)
+
+    def notify(self, observable: Observable, update_value: UpdateValue):
+        """
+        Notify observers of observable in notify thread.
+        :param observable: instance which observers will be notified
+        :param update_value: value which will be passed to observers
+        :return: None
+        """
+        try:
+            self.notify_executor.submit(observable.notify, update_value)
+        except RuntimeError:
+            pass
+
+    def __run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+
+
+class AsyncPingMan(HeartbeatSender):
+    """
+    Responsible for send messages and check if target is still in network.
+    Uses persistent stream per target and reads all incoming streams on loop of engine.
+    """
+
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 connected: SynchronizedSet, engine: AsyncEngine,
+                 scheduler: HeartbeatScheduler = None,
+                 failure_detector: PhiAccrualFailureDetector = None,
+                 membership: GossipMembership = None,
+                 inbound_pool: InboundWorkerPool = None,
+                 rtt: RttTracker = None):
+        super().__init__(own_information, message_dict, connected, scheduler,
+                         failure_detector, membership, inbound_pool, rtt)
+        self.engine = engine
+        self.wake_event = None
+        self.scheduler.add_listener(self.__wake_up)
+        self.server = None
+        self.ping_task = None
+        self.connections = dict()
+        self.in_writers = set()
+        self.uses_engine = False
+
+    def start(self):
+        """
+        Start server and ping task on loop of engine.
+        :return: None
+        """
+        self.running = True
+        self.uses_engine = True
+        self.inbound_pool.start(self.__notify_incoming_message)
+        self.engine.acquire()
+        self.engine.run(self.__start())
+
+    def kill(self):
+        """
+        Close server and all streams. Will release loop of engine.
+        :return: None
+        """
+        self.running = False
+        if self.uses_engine:
+            self.uses_engine = False
+            self.inbound_pool.stop()
+            self.engine.run(self.__close())
+            self.engine.release()
+
+    def flush(self, target: NodeInformation):
+        """
+        Send queued messages to target immediately, even if target is not connected
+        any longer. Used to acknowledge dispatch message of target. Must not be called
+        from loop of engine.
+        :param target: node with queued messages
+        :return: None
+        """
+        if self.running and target in self.message_dict.nodes_with_messages():
+            try:
+                self.engine.run(self.__flush(target))
+            except (OSError, asyncio.TimeoutError, futures.TimeoutError):
+                pass
+
+    async def __flush(self, target: NodeInformation):
+        writer = await self.__connection_to(target.net_address)
+        writer.write(add_header(self.message_dict.get_next_frame(target)))
+        await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+
+    def __notify_incoming_message(self, frame: bytes):
+        self.notify(UpdateValue(INCOMING_MESSAGE, frame))
+
+    def notify_connection_lost(self, target: NodeInformation):
+        self.engine.notify(self, UpdateValue(CONNECTION_LOST, target))
+
+    def __wake_up(self):
+        if self.wake_event is not None and self.running:
+            self.engine.loop.call_soon_threadsafe(self.wake_event.set)
+
+    async def __start(self):
+        self.wake_event = asyncio.Event()
+        self.server = await asyncio.start_server(self.__read_frames,
+                                                 *self.own_information.net_address.to_tuple(),
+                                                 reuse_address=True)
+        self.ping_task = asyncio.ensure_future(self.__send_ping_to_all())
+
+    async def __close(self):
+        if self.ping_task is not None:
+            self.ping_task.cancel()
+        for task, _ in self.pipelines.values():
+            task.cancel()
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.in_writers):
+            writer.close()
+        for address in list(self.connections):
+            self.__close_connection(address)
+
+    async def __read_frames(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Read frames of persistent connection from other node until connection is
+        closed. Each frame is passed to inbound pool which notifies observer.
+        :param reader: incoming stream
+        :param writer: stream used to close connection
+        :return: None
+        """
+        self.in_writers.add(writer)
+        try:
+            while self.running:
+                raw_msglen = await reader.readexactly(HEADER_LENGTH)
+                msg_len = struct.unpack(HEADER_FORMAT, raw_msglen)[0]
+                msg = await reader.readexactly(msg_len)
+                if msg:
+                    self.inbound_pool.submit(msg)
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            self.in_writers.discard(writer)
+            writer.close()
+
+    async def __connection_to(self, address: NetAddress) -> asyncio.StreamWriter:
+        """
+        Return open stream to address. Stream is (re)opened if it doesn't exists
+        or was closed by other node.
+        :param address: address of target
+        :return: stream to target
+        """
+        connection = self.connections.get(address)
+        if connection is not None:
+            reader, writer = connection
+            if reader.at_eof() or writer.is_closing():
+                self.__close_connection(address)
+                connection = None
+        if connection is None:
+            connection = await asyncio.wait_for(asyncio.open_connection(*address.to_tuple()),
+                                                CONNECT_TIMEOUT)
+            self.connections[address] = connection
+        return connection[1]
+
+    def __close_connection(self, address: NetAddress):
+        connection = self.connections.pop(address, None)
+        if connection is not None:
+            connection[1].close()
+
+    async def __send_ping_to_target(self, target: NodeInformation):
+        """
+        Take message from message dict and will make MAX_PING_TRY tries to send it
+        to target. Each try is bounded by connect and send timeout.
+        :param target: target of send messages/ping
+        :return: None
+        """
+        message = add_header(self.message_dict.get_next_frame(target))
+        ping_counter = 0
+        while self.keeps_trying(target, ping_counter):
+            try:
+                writer = await self.__connection_to(target.net_address)
+                writer.write(message)
+                await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+                break
+            except (OSError, asyncio.TimeoutError):
+                self.__close_connection(target.net_address)
+                ping_counter += 1
+                await asyncio.sleep(SECOND_INTERVAL_PING_TRY)
+
+        self.finish_send(target, ping_counter)
+
+    async def __pipeline(self, target: NodeInformation, event: asyncio.Event):
+        """
+        Send messages to one node whenever event is set. So a slow or dead node only
+        delays his own heartbeats and never heartbeats of other nodes.
+        :param target: node which get messages of this pipeline
+        :param event: event which triggers next send
+        :return: None
+        """
+        while self.running:
+            await event.wait()
+            event.clear()
+            await self.__send_ping_to_target(target)
+
+    async def __send_ping_to_all(self):
+        """
+        Will retransmit unacknowledged control messages and notify Observer about nodes
+        which are suspected by failure detector and not reached by indirect probes of
+        other nodes. Also trigger pipelines of all currently connected Nodes in Network whose
+        heartbeat is due by scheduler. Each connected Node keeps an own pipeline task, so
+        this task never waits for a send, and it is only cancelled after node disconnected.
+        Sleeps until next heartbeat is due or an urgent message was queued.
+        :return: None
+        """
+        while self.running:
+            connected, due = self.due_targets()
+            for target in list(self.pipelines):
+                if target not in connected:
+                    self.pipelines.pop(target)[0].cancel()
+            for target in due:
+                if target not in self.pipelines or self.pipelines[target][0].done():
+                    event = asyncio.Event()
+                    self.pipelines[target] = (asyncio.ensure_future(self.__pipeline(target, event)),
+                                              event)
+                self.pipelines[target][1].set()
+            try:
+                await asyncio.wait_for(self.wake_event.wait(), self.scheduler.time_until_next())
+            except asyncio.TimeoutError:
+                pass
+            self.wake_event.clear()
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    """
+    Pass received broadcast datagrams to AsyncHandshake.
+    """
+
+    def __init__(self, handshake):
+        self.handshake = handshake
+
+    def datagram_received(self, data, addr):
+        self.handshake.add_node_info(data)
+
+
+class AsyncHandshake(Observable):
+    """
+    Class responsible for send message per broadcast and listen to incoming messages
+    on loop of engine. Notify observers about incoming.
+    """
+
+    def __init__(self, own_information: NodeInformation, engine: AsyncEngine,
+                 broadcast_address: NetAddress = DEFAULT_BROADCAST):
+        super().__init__()
+        self.own_information = own_information
+        self.broadcast_address = broadcast_address
+        self.engine = engine
+        self.running = False
+        self.transport = None
+        self.uses_engine = False
+
+    def start(self):
+        """
+        Start listing for incoming messages and send own information per broadcast.
+        :return: None
+        """
+        self.running = True
+        self.uses_engine = True
+        self.engine.acquire()
+        self.engine.run(self.__collect_entering_node())
+        time.sleep(1)
+        self.engine.run(self.__send_broadcast())
+
+    def kill(self):
+        """
+        Close broadcast listener and release loop of engine.
+        :return: None
+        """
+        self.running = False
+        if self.uses_engine:
+            self.uses_engine = False
+            self.engine.run(self.__close())
+            self.engine.release()
+
+    def add_node_info(self, data: bytes):
+        """
+        Notify observer about entering node.
+        :param data: data from socket who send information
+        :return: None
+        """
+        if self.running and data != b'':
+            node_information = node_information_from_discovery_json(
+                data.decode(encoding=ENCODE_UTF_8))
+            self.engine.notify(self, UpdateValue(NEW_ENTERING_NODE, node_information))
+
+    async def __collect_entering_node(self):
+        response_socket = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
+        response_socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        response_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+        response_socket.bind(('', self.broadcast_address.port))
+        self.transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(self), sock=response_socket)
+
+    async def __send_broadcast(self):
+        introduce_socket = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
+        introduce_socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        introduce_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+        introduce_socket.setblocking(False)
+        try:
+            message = self.own_information.to_discovery_json()
+            introduce_socket.sendto(bytes(message, encoding=ENCODE_UTF_8),
+                                    (self.broadcast_address.host, self.broadcast_address.port))
+        finally:
+            introduce_socket.close()
+
+    async def __close(self):
+        if self.transport is not None:
+            self.transport.close()
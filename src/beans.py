@@ -2,98 +2,533 @@
 Beans contains data classes used for better communication of addresses and information
 regarding one node."""
 
+import hashlib
 import json
+import struct
 import time
-import copy
+import weakref
+from threading import Lock
+
+RECORD_STRUCT = struct.Struct('>Hdi')
+LENGTH_STRUCT = struct.Struct('>H')
+FLAG_STRUCT = struct.Struct('>B')
+NONE_LENGTH = 0xFFFF
+NO_WISH_MASTER = 0
+INLINE_WISH_MASTER = 1
+NO_TERM = -1
+NO_METRICS = 0
+INLINE_METRICS = 1
+METRICS_STRUCT = struct.Struct('>dQIdd')
+NO_RTT = -1.0
+JSON_ENCODING = 'json'
+DISCOVERY_ENCODING = 'discovery'
+BINARY_ENCODING = 'binary'
 
 class NetAddress:
     """
-    Dataclass for host ADDRESS and PORT.
+    Dataclass for host ADDRESS and PORT. Instances are immutable, so hash is computed
+    once.
     """
+    __slots__ = ('_host', '_port', '_hash')
 
     def __init__(self, host='0.0.0.0', port=3030):
-        self.host = host
-        self.port = port
+        self._host = host
+        self._port = port
+        self._hash = hash((host, port))
+
+    @property
+    def host(self):
+        """
+        :return: host of address
+        """
+        return self._host
+
+    @property
+    def port(self):
+        """
+        :return: port of address
+        """
+        return self._port
 
     def to_json(self) -> str:
         """
         Convert instance to json string.
         :return: json string of instance
         """
-        return json.dumps(self, default=lambda o: o.__dict__,
-                          sort_keys=True, indent=4)
+        return json.dumps(self.to_dict(), sort_keys=True, indent=4)
+
+    def to_dict(self) -> dict:
+        """
+        Convert instance to dict which can be serialized as json.
+        :return: dict of host and PORT
+        """
+        return {'host': self._host, 'port': self._port}
 
     def to_tuple(self):
         """
         Convert instance to tuple of host and PORT.
         :return: tuple of host and PORT
         """
-        return self.host, self.port
+        return self._host, self._port
 
     def __eq__(self, o: object) -> bool:
+        if self is o:
+            return True
         if not isinstance(o, NetAddress):
             return False
-        return self.host == o.host and self.port == o.port
+        return self._hash == o._hash and self._host == o._host and self._port == o._port
 
     def __hash__(self) -> int:
-        return hash((self.host, self.port))
+        return self._hash
+
+
+class NodeMetrics:
+    """
+    Dataclass for load of a node which is advertised in heartbeats. Load average is
+    divided by number of cpus, rss is resident memory in bytes and queue depth is number
+    of received frames waiting to be handled. Median and p95 of round trip times to
+    peers are NO_RTT as long as no round trip was measured. Instances are immutable.
+    """
+    __slots__ = ('_load_average', '_rss', '_queue_depth', '_rtt_median', '_rtt_p95')
+
+    def __init__(self, load_average=0.0, rss=0, queue_depth=0, rtt_median=NO_RTT,
+                 rtt_p95=NO_RTT):
+        self._load_average = load_average
+        self._rss = rss
+        self._queue_depth = queue_depth
+        self._rtt_median = rtt_median
+        self._rtt_p95 = rtt_p95
+
+    @property
+    def load_average(self) -> float:
+        """
+        :return: load average of last minute per cpu
+        """
+        return self._load_average
+
+    @property
+    def rss(self) -> int:
+        """
+        :return: resident memory in bytes
+        """
+        return self._rss
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        :return: number of received frames waiting to be handled
+        """
+        return self._queue_depth
+
+    @property
+    def rtt_median(self) -> float:
+        """
+        :return: median of round trip times to peers in seconds or NO_RTT
+        """
+        return self._rtt_median
+
+    @property
+    def rtt_p95(self) -> float:
+        """
+        :return: 95th percentile of round trip times to peers in seconds or NO_RTT
+        """
+        return self._rtt_p95
+
+    def to_tuple(self) -> tuple:
+        """
+        :return: tuple of all fields in order of constructor
+        """
+        return self._load_average, self._rss, self._queue_depth, self._rtt_median, \
+               self._rtt_p95
+
+    def to_dict(self) -> dict:
+        """
+        Convert instance to dict which can be serialized as json.
+        :return: dict of load average, rss, queue depth and round trip times
+        """
+        return {'load_average': self._load_average, 'rss': self._rss,
+                'queue_depth': self._queue_depth, 'rtt_median': self._rtt_median,
+                'rtt_p95': self._rtt_p95}
+
+    def __eq__(self, o: object) -> bool:
+        if not isinstance(o, NodeMetrics):
+            return False
+        return self.to_tuple() == o.to_tuple()
+
+    def __hash__(self) -> int:
+        return hash(self.to_tuple())
 
 
 class NodeInformation:
     """
     Dataclass for information regarding one network node. Like ADDRESS, birthtime and NAME.
+    Address, birthtime and name identify the node and can't be changed, so hash is
+    computed once. Version is increased whenever wish master, term of election or
+    metrics change, so other nodes know if their copy of the information is outdated.
+    Encoded forms are cached, because own information is sent to every node in every
+    heartbeat. Changing wish master, term or metrics drops the cache.
+    Term is NO_TERM if node was received from a node which does not know terms.
     """
+    __slots__ = ('_net_address', '_birthtime', '_name', '_hash', 'version', '_wish_master',
+                 '_term', '_metrics', '_node_key', '_encodings', '__weakref__')
 
     def __init__(self,
                  net_address: NetAddress,
                  birthtime=time.time(),
-                 name=None, wish_master = None):
-        self.net_address = net_address
-        self.birthtime = birthtime
-        self.name = name
-        self.wish_master = wish_master
+                 name=None, wish_master = None, term=0, metrics=None):
+        self._net_address = net_address
+        self._birthtime = birthtime
+        self._name = name
+        self._hash = hash((net_address, birthtime, name))
+        self.version = 0
+        self._wish_master = wish_master
+        self._term = term
+        self._metrics = metrics
+        self._node_key = None
+        self._encodings = dict()
+
+    @property
+    def net_address(self) -> NetAddress:
+        """
+        :return: address of node
+        """
+        return self._net_address
+
+    @property
+    def birthtime(self):
+        """
+        :return: time when node was started
+        """
+        return self._birthtime
+
+    @property
+    def name(self):
+        """
+        :return: nickname of node
+        """
+        return self._name
+
+    @property
+    def identity(self) -> tuple:
+        """
+        :return: tuple of host, port, birthtime and name which identifies node
+        """
+        return self._net_address.host, self._net_address.port, self._birthtime, self._name
+
+    def cached_encoding(self, key, encode):
+        """
+        Return encoded form of instance from cache or encode and cache it. Fields are
+        read by encode after the cache was taken and cache is dropped after wish master
+        changed, so an encoding of a concurrently changed instance lands in the dropped
+        cache.
+        :param key: identifies format of encoding
+        :param encode: callable without arguments which encodes instance
+        :return: encoded form
+        """
+        encodings = self._encodings
+        encoded = encodings.get(key)
+        if encoded is None:
+            encoded = encode()
+            encodings[key] = encoded
+        return encoded
+
+    @property
+    def wish_master(self):
+        """
+        :return: node which is voted by this node as master
+        """
+        return self._wish_master
+
+    @wish_master.setter
+    def wish_master(self, wish_master):
+        if wish_master != self._wish_master:
+            self.version += 1
+        self._wish_master = wish_master
+        self._encodings = dict()
+
+    @property
+    def term(self) -> int:
+        """
+        :return: term of election in which node cast his wish master
+        """
+        return self._term
+
+    @term.setter
+    def term(self, term):
+        if term != self._term:
+            self.version += 1
+        self._term = term
+        self._encodings = dict()
+
+    @property
+    def metrics(self) -> NodeMetrics:
+        """
+        :return: load which node advertised or None
+        """
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        if metrics != self._metrics:
+            self.version += 1
+        self._metrics = metrics
+        self._encodings = dict()
+
+    @property
+    def node_key(self) -> int:
+        """
+        Stable 64 bit key of address, birthtime and name. Same node has same key on
+        every node of network, so key can be used to refer to node in messages.
+        :return: key of node
+        """
+        if self._node_key is None:
+            identity = '{}|{}|{!r}|{}'.format(self.net_address.host, self.net_address.port,
+                                             self.birthtime, self.name)
+            digest = hashlib.blake2b(identity.encode('utf8'), digest_size=8).digest()
+            self._node_key = int.from_bytes(digest, 'big')
+        return self._node_key
 
     def to_json(self) -> str:
         """
-        Convert instance to tuple of host and PORT.
-        :return: tuple of host and PORT
+        Convert instance to json string. Wish master is included without his wish master.
+        :return: json string of instance
+        """
+        return self.cached_encoding(
+            JSON_ENCODING, lambda: json.dumps(self.to_dict(), sort_keys=True, indent=4))
+
+    def to_discovery_json(self) -> str:
+        """
+        Convert instance without wish master to compact json string, which is broadcast
+        to find other nodes. Wish master, term and metrics are sent after handshake, so
+        size of broadcast does not grow with them.
+        :return: json string of identifying fields and empty wish master
+        """
+        return self.cached_encoding(
+            DISCOVERY_ENCODING,
+            lambda: json.dumps(self.to_dict(with_wish_master=False), sort_keys=True,
+                               separators=(',', ':')))
+
+    def to_dict(self, with_wish_master=True) -> dict:
+        """
+        Convert instance to dict which can be serialized as json. Dict contains only keys
+        which nodes of older versions know, so they are able to decode it. Term and
+        metrics are only sent in binary format.
+        :param with_wish_master: False if wish master should be None
+        :return: dict of address, birthtime, name and wish master
         """
-        copsy = copy.deepcopy(self)
-        master_copy = copy.deepcopy(self.wish_master)
-        if copsy.wish_master is not None:
-            master_copy.wish_master = None
-        copsy.wish_master = master_copy
-        return json.dumps(copsy, default=lambda o: o.__dict__,
-                          sort_keys=True,  indent=4)
+        wish_master = None
+        if with_wish_master and self.wish_master is not None:
+            wish_master = self.wish_master.to_dict(with_wish_master=False)
+        return {'birthtime': self.birthtime,
+                'name': self.name,
+                'net_address': self.net_address.to_dict(),
+                'wish_master': wish_master}
 
     def __eq__(self, o: object) -> bool:
+        if self is o:
+            return True
         if not isinstance(o, NodeInformation):
             return False
-        return self.net_address == o.net_address \
-               and self.birthtime == o.birthtime \
-               and self.name == o.name
+        return self._hash == o._hash \
+               and self._net_address == o._net_address \
+               and self._birthtime == o._birthtime \
+               and self._name == o._name
 
     def __hash__(self) -> int:
-        return hash((self.net_address, self.birthtime, self.name))
+        return self._hash
+
+
+class InternTable:
+    """
+    Resolves received records to one shared instance per node, so repeated heartbeats
+    do not allocate new instances. Instances are kept as long as they are referenced
+    elsewhere, e.g. in connected or in votes. Wish master of an instance is only
+    changed by records which node sent about itself. Own information is resolved
+    but never changed by received records. Methods are thread safe.
+    """
+
+    def __init__(self, own_information: NodeInformation = None):
+        self.own_information = own_information
+        self.instances = weakref.WeakValueDictionary()
+        self.lock = Lock()
+        if own_information is not None:
+            self.instances[own_information.identity] = own_information
+
+    def resolve(self, host, port, birthtime, name) -> NodeInformation:
+        """
+        Return shared instance of node or create it without wish master.
+        :param host: host of node
+        :param port: port of node
+        :param birthtime: birthtime of node
+        :param name: name of node
+        :return: shared instance
+        """
+        identity = (host, port, birthtime, name)
+        with self.lock:
+            node_info = self.instances.get(identity)
+            if node_info is None:
+                node_info = NodeInformation(NetAddress(host, port), birthtime, name)
+                self.instances[identity] = node_info
+            return node_info
+
+    def intern(self, node_info: NodeInformation) -> NodeInformation:
+        """
+        Return shared instance of node or register node_info as shared instance.
+        :param node_info: instance which was not decoded by table
+        :return: shared instance
+        """
+        with self.lock:
+            return self.instances.setdefault(node_info.identity, node_info)
+
+    def update(self, node_info: NodeInformation, wish_master, term=0,
+               metrics=None) -> NodeInformation:
+        """
+        Set wish master, term and metrics which node sent about itself.
+        :param node_info: shared instance
+        :param wish_master: received wish master
+        :param term: received term of election
+        :param metrics: received metrics or None
+        :return: node_info or a copy if node_info is own information
+        """
+        if node_info is self.own_information:
+            node_info = NodeInformation(node_info.net_address, node_info.birthtime,
+                                        node_info.name)
+        node_info.term = term
+        node_info.metrics = metrics
+        node_info.wish_master = wish_master
+        return node_info
 
 
+def _resolve(intern_table, host, port, birthtime, name) -> NodeInformation:
+    if intern_table is None:
+        return NodeInformation(NetAddress(host, port), birthtime=birthtime, name=name)
+    return intern_table.resolve(host, port, birthtime, name)
 
 
-def node_information_from_json(json_string) -> NodeInformation:
+def _with_wish_master(node_info, wish_master, term, metrics, intern_table,
+                      update) -> NodeInformation:
+    if intern_table is None:
+        node_info.term = term
+        node_info.metrics = metrics
+        node_info.wish_master = wish_master
+        return node_info
+    if update:
+        return intern_table.update(node_info, wish_master, term, metrics)
+    return node_info
+
+
+def _node_information_from_dict(node_info_dict, intern_table) -> NodeInformation:
+    net_address = node_info_dict['net_address']
+    return _resolve(intern_table, net_address['host'], net_address['port'],
+                    node_info_dict['birthtime'], node_info_dict['name'])
+
+
+def node_information_from_json(json_string, intern_table: InternTable = None,
+                               update=True) -> NodeInformation:
 
     """
     Deserialized instance of NodeInformation.
     :param json_string: json String of an instance
+    :param intern_table: table which resolves nodes to shared instances or None
+    :param update: False if record was not sent by node itself and must not change
+    wish master of shared instance
     :return: Deserialized instance
     """
     node_info_dict = json.loads(json_string)
-    net_address = NetAddress(**node_info_dict['net_address'])
-    node_info_obj = NodeInformation(**node_info_dict)
-    node_info_obj.net_address = net_address
-    if (node_info_dict['wish_master']) is not None:
-        node_info_obj.wish_master = NodeInformation(**node_info_dict['wish_master'])
-        node_info_obj.wish_master.net_address = NetAddress(**node_info_dict['wish_master']['net_address'])
-    return node_info_obj
+    node_info = _node_information_from_dict(node_info_dict, intern_table)
+    wish_master = None
+    if node_info_dict['wish_master'] is not None:
+        wish_master = _node_information_from_dict(node_info_dict['wish_master'], intern_table)
+    metrics = None
+    if node_info_dict.get('metrics') is not None:
+        metrics = NodeMetrics(**node_info_dict['metrics'])
+    return _with_wish_master(node_info, wish_master, node_info_dict.get('term', NO_TERM),
+                             metrics, intern_table, update)
+
+
+def node_information_from_discovery_json(json_string) -> NodeInformation:
+    """
+    Deserialized instance of NodeInformation from broadcast. Only identifying fields are
+    read, so full json of an instance is accepted too.
+    :param json_string: json String of identifying fields
+    :return: Deserialized instance without wish master
+    """
+    return _node_information_from_dict(json.loads(json_string), None)
+
+
+def _pack_string(value) -> bytes:
+    if value is None:
+        return LENGTH_STRUCT.pack(NONE_LENGTH)
+    encoded = value.encode('utf8')
+    return LENGTH_STRUCT.pack(len(encoded)) + encoded
+
+
+def _unpack_string(data, offset):
+    length = LENGTH_STRUCT.unpack_from(data, offset)[0]
+    offset += LENGTH_STRUCT.size
+    if length == NONE_LENGTH:
+        return None, offset
+    return str(data[offset:offset + length], 'utf8'), offset + length
+
+
+def node_information_to_bytes(node_info: NodeInformation, with_wish_master=True) -> bytes:
+    """
+    Serialize instance to compact binary record. Port, birthtime and term have fixed width,
+    host and name are prefixed by their length. Wish master is appended as inline record
+    without own wish master, followed by metrics which inline records omit.
+    :param node_info: instance to serialize
+    :param with_wish_master: False if wish master should be omitted
+    :return: binary record
+    """
+    return node_info.cached_encoding((BINARY_ENCODING, with_wish_master),
+                                     lambda: _encode_record(node_info, with_wish_master))
+
+
+def _encode_record(node_info: NodeInformation, with_wish_master) -> bytes:
+    record = RECORD_STRUCT.pack(node_info.net_address.port, node_info.birthtime,
+                                node_info.term) \
+             + _pack_string(node_info.net_address.host) + _pack_string(node_info.name)
+    if with_wish_master and node_info.wish_master is not None:
+        record += FLAG_STRUCT.pack(INLINE_WISH_MASTER) \
+                  + node_information_to_bytes(node_info.wish_master, with_wish_master=False)
+    else:
+        record += FLAG_STRUCT.pack(NO_WISH_MASTER)
+    metrics = node_info.metrics
+    if with_wish_master and metrics is not None:
+        return record + FLAG_STRUCT.pack(INLINE_METRICS) \
+               + METRICS_STRUCT.pack(*metrics.to_tuple())
+    return record + FLAG_STRUCT.pack(NO_METRICS)
+
+
+def node_information_from_bytes(data, offset=0, intern_table: InternTable = None,
+                                update=True):
+    """
+    Deserialize instance of NodeInformation from binary record.
+    :param data: bytes which contain record
+    :param offset: position of record in data
+    :param intern_table: table which resolves nodes to shared instances or None
+    :param update: False if record was not sent by node itself and must not change
+    wish master of shared instance
+    :return: tuple of deserialized instance and position after record
+    """
+    port, birthtime, term = RECORD_STRUCT.unpack_from(data, offset)
+    host, offset = _unpack_string(data, offset + RECORD_STRUCT.size)
+    name, offset = _unpack_string(data, offset)
+    node_info = _resolve(intern_table, host, port, birthtime, name)
+    flag = FLAG_STRUCT.unpack_from(data, offset)[0]
+    offset += FLAG_STRUCT.size
+    wish_master = None
+    if flag == INLINE_WISH_MASTER:
+        wish_master, offset = node_information_from_bytes(data, offset, intern_table,
+                                                          update=False)
+    metrics = None
+    flag = FLAG_STRUCT.unpack_from(data, offset)[0]
+    offset += FLAG_STRUCT.size
+    if flag == INLINE_METRICS:
+        metrics = NodeMetrics(*METRICS_STRUCT.unpack_from(data, offset))
+        offset += METRICS_STRUCT.size
+    return _with_wish_master(node_info, wish_master, term, metrics, intern_table,
+                             update), offset
 
 
 def net_address_information_from_json(json_string) -> NetAddress:
@@ -106,6 +541,37 @@ def net_address_information_from_json(json_string) -> NetAddress:
     net_address = NetAddress(**net_address_dict)
     return net_address
 
+class Message:
+    """
+    Bean of one message between nodes with subject and information of sending node.
+    Digests contain only key and version of sending node instead of information.
+    Indirect probes contain key of probed node. Control messages and their
+    acknowledges contain a sequence number. Lease messages contain key and term of
+    sending node, timestamp of sender, echoed timestamp of receiver, seconds echo was
+    held by sender and grant.
+    """
+    def __init__(self, subject, node_info: NodeInformation, version=None, node_key=None,
+                 seq=None, term=None, stamp=None, echo=None, held=0.0, grant=False):
+        self.subject = subject
+        self.node_info = node_info
+        self.version = version
+        self.node_key = node_key
+        self.seq = seq
+        self.term = term
+        self.stamp = stamp
+        self.echo = echo
+        self.held = held
+        self.grant = grant
+
+    def __eq__(self, o: object) -> bool:
+        if not isinstance(o, Message):
+            return False
+        return self.subject == o.subject and self.node_info == o.node_info
+
+    def __hash__(self) -> int:
+        return hash((self.subject, self.node_info))
+
+
 class UpdateValue:
     """
     Bean of transfer update values with NAME for identification what happened.
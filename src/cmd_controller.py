@@ -5,13 +5,12 @@ user input.
 from threading import Thread
 from observer import Observer
 
-from src.beans import node_information_from_json
 from src.node_manger import NodeManger
 from src.handshake import NEW_ENTERING_NODE
 from src.vote_strategy import VOTE_FOR, NEW_MASTER, NO_MAJORITY_SHUTDOWN
 from src.pinger import CONNECTION_LOST, INCOMING_MESSAGE
-from src.message_dict import DEFAULT_MESSAGE, DISPATCH_MESSAGE, \
-    JSON_SEPARATOR, HANDSHAKE_MESSAGE, MESSAGE_SEPARATOR
+from src.message_dict import DEFAULT_MESSAGE, DISPATCH_MESSAGE, HANDSHAKE_MESSAGE, \
+    decode_frame
 
 class CmdController(Observer):
     """
@@ -38,6 +37,28 @@ class CmdController(Observer):
             if name == 'q':
                 self.node_manger.dispatch()
                 running = False
+            elif name == 'm':
+                self.print_metrics()
+
+    def print_metrics(self):
+        """
+        Print depth of inbound queue, number of handled and rejected frames and depths
+        of outgoing priority lanes and stats of current election term.
+        :return: None
+        """
+        metrics = self.node_manger.ping_man.inbound_pool.metrics()
+        print('{} inbound queue depth {} (max {}), processed {}, rejected {}'.format(
+            self.own_information.name, metrics['queue_depth'], metrics['max_queue_depth'],
+            metrics['processed'], metrics['rejected']))
+        depths = self.node_manger.message_dict.lane_depths()
+        print('{} outgoing lanes {}'.format(
+            self.own_information.name,
+            ', '.join('{} {}'.format(lane, depth) for lane, depth in depths.items())))
+        stats = self.node_manger.vote_strategy.election_stats()
+        print('{} election term {}, converged after {} s, master changes {}, '
+              'stale votes {}'.format(self.own_information.name, stats['term'],
+                                      stats['convergence'], stats['transitions'],
+                                      stats['stale_votes']))
 
     def update(self, update_value):
         """
@@ -68,15 +89,13 @@ class CmdController(Observer):
             elif event == NO_MAJORITY_SHUTDOWN:
                 print('{} dispatching their is not majority'.format(self.own_information.name))
             elif event == INCOMING_MESSAGE:
-                messages = str(update_value.value).split(MESSAGE_SEPARATOR)
-                messages.sort(key=lambda x: x.startswith(HANDSHAKE_MESSAGE))
+                messages = decode_frame(update_value.value)
                 for message in messages:
-                    subject = message.split(JSON_SEPARATOR)[0]
+                    subject = message.subject
                     if subject == DEFAULT_MESSAGE:
                         return
 
-                    json = message.split(JSON_SEPARATOR)[1]
-                    node_info = node_information_from_json(json)
+                    node_info = message.node_info
                     if subject == DISPATCH_MESSAGE:
                         print('{} Dispatched from {}'.format(node_info.name, self.own_information.name))
                     elif subject == HANDSHAKE_MESSAGE:
@@ -0,0 +1,213 @@
+"""
+Provides pool of long lived tcp connections, so that PingMan is able to send many
+length prefixed frames over one connection per node instead of connect for every ping.
+"""
+import struct
+from threading import Lock
+from socket import AF_INET, SOCK_STREAM, IPPROTO_TCP, TCP_NODELAY, SHUT_RDWR, MSG_PEEK, \
+    socket
+
+from src.beans import NetAddress
+
+CONNECT_TIMEOUT = 0.25
+SEND_TIMEOUT = 0.25
+HEADER_FORMAT = '>I'
+HEADER_LENGTH = struct.calcsize(HEADER_FORMAT)
+HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
+RECEIVE_BUFFER_SIZE = 64 * 1024
+
+
+def add_header(payload: bytes) -> bytes:
+    """
+    Prefix payload with header which contains length of payload.
+    :param payload: bytes that will be send
+    :return: frame with header and payload
+    """
+    return struct.pack(HEADER_FORMAT, len(payload)) + payload
+
+
+class FrameReader:
+    """
+    Reads length prefixed frames of one connection with recv_into into a reusable
+    buffer. Frames are returned as memoryview into this buffer, so no bytes are copied
+    between socket and decoder. Buffer only grows if a frame is larger than buffer.
+    Works with blocking sockets by read_frame and with non blocking sockets by receive
+    and next_frame, which reassemble frames of several partial reads.
+    """
+
+    def __init__(self, sock: socket, buffer_size=RECEIVE_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def read_frame(self):
+        """
+        Receive until next frame is complete. Returned memoryview is only valid until
+        next call, so it has to be decoded or copied before.
+        :return: payload of frame or None if connection was closed
+        """
+        frame = self.next_frame()
+        while frame is None:
+            if not self.receive():
+                return None
+            frame = self.next_frame()
+        return frame
+
+    def next_frame(self):
+        """
+        Return next frame which is already completely received. Returned memoryview is
+        only valid until next receive.
+        :return: payload of frame or None if frame is not complete yet
+        """
+        frame_length = self.__frame_length()
+        if frame_length is None or self.end - self.start < frame_length:
+            return None
+        frame = self.view[self.start + HEADER_LENGTH:self.start + frame_length]
+        self.start += frame_length
+        return frame
+
+    def receive(self) -> bool:
+        """
+        Receive once as many bytes as available and fit into buffer. Non blocking
+        socket should only be read if it is readable.
+        :return: False if connection was closed
+        """
+        if self.start == self.end:
+            self.start = self.end = 0
+        frame_length = self.__frame_length()
+        needed = HEADER_LENGTH if frame_length is None else frame_length
+        if self.start + needed > len(self.buffer) or self.end == len(self.buffer):
+            self.__make_room(max(needed, self.end - self.start + 1))
+        try:
+            received = self.sock.recv_into(self.view[self.end:])
+        except BlockingIOError:
+            return True
+        if received == 0:
+            return False
+        self.end += received
+        return True
+
+    def __frame_length(self):
+        """
+        :return: length of next frame with header or None if header is not complete
+        """
+        if self.end - self.start < HEADER_LENGTH:
+            return None
+        return HEADER_LENGTH + HEADER_STRUCT.unpack_from(self.buffer, self.start)[0]
+
+    def __make_room(self, size):
+        """
+        Move unread bytes to begin of buffer. Buffer is replaced by a larger one if
+        size does not fit.
+        :param size: number of bytes which have to fit behind begin
+        :return: None
+        """
+        unread = bytes(self.view[self.start:self.end])
+        if size > len(self.buffer):
+            self.buffer = bytearray(max(size, 2 * len(self.buffer)))
+            self.view = memoryview(self.buffer)
+        self.buffer[:len(unread)] = unread
+        self.start, self.end = 0, len(unread)
+
+
+def _is_closed_by_peer(sock: socket) -> bool:
+    """
+    Nodes never answer on connection of pool. So if a byte can be peeked without
+    blocking or connection is at its end the other side closed or reset the
+    connection. Peeking works for any file descriptor, unlike select.
+    :param sock: socket to check
+    :return: True if connection can't be used any longer
+    """
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        sock.recv(1, MSG_PEEK)
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+    finally:
+        sock.settimeout(timeout)
+    return True
+
+
+class ConnectionPool:
+    """
+    Keep one connection per NetAddress. Connection is created at first send and
+    will be reused until send fails or peer closed it. Connect and send are bounded
+    by timeouts, so a dead node never blocks sender longer than timeout.
+    """
+
+    def __init__(self):
+        self.connections = dict()
+        self.locks = dict()
+        self.lock = Lock()
+
+    def send(self, address: NetAddress, payload: bytes):
+        """
+        Send payload with header over persistent connection to address. Connection
+        is opened if not exists. If send fails connection is closed and OSError
+        is raised, so next call will reconnect.
+        :param address: address of target node
+        :param payload: bytes that will be send
+        :return: None
+        """
+        with self.__lock_for(address):
+            connection = self.connections.get(address)
+            if connection is not None and _is_closed_by_peer(connection):
+                self.__close_connection(address)
+                connection = None
+            try:
+                if connection is None:
+                    connection = self.__connect(address)
+                connection.sendall(add_header(payload))
+            except OSError:
+                self.__close_connection(address)
+                raise
+
+    def close(self, address: NetAddress):
+        """
+        Close connection to address if exists.
+        :param address: address of node
+        :return: None
+        """
+        with self.__lock_for(address):
+            self.__close_connection(address)
+
+    def close_all(self):
+        """
+        Close all connections of pool.
+        :return: None
+        """
+        for address in list(self.connections):
+            self.close(address)
+
+    def __lock_for(self, address: NetAddress) -> Lock:
+        with self.lock:
+            if address not in self.locks:
+                self.locks[address] = Lock()
+            return self.locks[address]
+
+    def __connect(self, address: NetAddress) -> socket:
+        connection = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP)
+        try:
+            connection.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+            connection.settimeout(CONNECT_TIMEOUT)
+            connection.connect(address.to_tuple())
+            connection.settimeout(SEND_TIMEOUT)
+        except OSError:
+            connection.close()
+            raise
+        self.connections[address] = connection
+        return connection
+
+    def __close_connection(self, address: NetAddress):
+        connection = self.connections.pop(address, None)
+        if connection is not None:
+            try:
+                connection.shutdown(SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
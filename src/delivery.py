@@ -0,0 +1,155 @@
+"""
+Provides tracking of acknowledged delivery for control messages like handshakes
+and dispatching.
+"""
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+RETRANSMIT_TIMEOUT = 0.5
+UNSEQUENCED = 0
+
+
+class DeliveryTracker:
+    """
+    Control messages to a node get consecutive sequence numbers per node. Node answers
+    with cumulative acknowledge of highest sequence number it handled in order. Messages
+    which are not acknowledged within timeout are retransmitted. Receiving side drops
+    duplicates and messages after a gap, so retransmission restores order. First
+    message of an unknown node starts its sequence.
+    Futures of completions resolve as soon as every node acknowledged its message.
+    """
+
+    def __init__(self, retransmit_timeout=RETRANSMIT_TIMEOUT, clock=time.monotonic):
+        self.retransmit_timeout = retransmit_timeout
+        self.clock = clock
+        self.last_seq = dict()
+        self.unacked = dict()
+        self.handled_seq = dict()
+        self.completions = []
+        self.lock = Lock()
+
+    def track(self, message, target):
+        """
+        Assign next sequence number of target to message and wait for acknowledge.
+        :param message: control message
+        :param target: node which receives message
+        :return: None
+        """
+        with self.lock:
+            message.seq = self.last_seq.get(target, UNSEQUENCED) + 1
+            self.last_seq[target] = message.seq
+            self.unacked.setdefault(target, OrderedDict())[message.seq] = \
+                [message, self.clock() + self.retransmit_timeout]
+
+    def acknowledge(self, target, seq):
+        """
+        Target handled all messages up to seq.
+        :param target: node which sent acknowledge
+        :param seq: cumulative sequence number
+        :return: None
+        """
+        with self.lock:
+            unacked = self.unacked.get(target, OrderedDict())
+            for acked in [acked for acked in unacked if acked <= seq]:
+                unacked.pop(acked)
+            self.__complete(target, lambda waiting: isinstance(waiting, int) and waiting <= seq)
+
+    def untrack(self, target, seq):
+        """
+        Stop waiting for acknowledge of message, because target never sends one.
+        :param target: node which received message
+        :param seq: sequence number of message
+        :return: None
+        """
+        with self.lock:
+            self.unacked.get(target, OrderedDict()).pop(seq, None)
+
+    def taken(self, target, messages):
+        """
+        Messages to node without acknowledges were taken from queue to be send, which
+        is all what can be known about their delivery.
+        :param target: node which does not acknowledge
+        :param messages: messages taken from queue of target
+        :return: None
+        """
+        with self.lock:
+            self.__complete(target, lambda waiting: waiting in messages)
+
+    def accept(self, sender, seq) -> bool:
+        """
+        Decide on receiving side if control message is handled.
+        :param sender: node which sent message
+        :param seq: sequence number of message
+        :return: True if message is next one in order, first one of unknown sender
+        or unsequenced
+        """
+        if seq == UNSEQUENCED:
+            return True
+        with self.lock:
+            handled = self.handled_seq.get(sender)
+            if handled is not None and seq != handled + 1:
+                return False
+            self.handled_seq[sender] = seq
+            return True
+
+    def handled(self, sender) -> int:
+        """
+        :param sender: node which sent control messages
+        :return: highest sequence number of sender which was handled in order
+        """
+        with self.lock:
+            return self.handled_seq.get(sender, UNSEQUENCED)
+
+    def due_retransmissions(self) -> list:
+        """
+        Take messages whose acknowledge is overdue and restart their timeout.
+        :return: list of tuples with target and message
+        """
+        with self.lock:
+            now = self.clock()
+            due = []
+            for target, unacked in self.unacked.items():
+                for entry in unacked.values():
+                    if now >= entry[1]:
+                        entry[1] = now + self.retransmit_timeout
+                        due.append((target, entry[0]))
+            return due
+
+    def completion(self, waiting) -> Future:
+        """
+        Future which resolves if every target acknowledged or took its message.
+        :param waiting: dict which maps target to sequence number or to message if
+        target does not acknowledge
+        :return: future with None as result
+        """
+        future = Future()
+        with self.lock:
+            waiting = dict(waiting)
+            if waiting:
+                self.completions.append((waiting, future))
+        if not waiting:
+            future.set_result(None)
+        return future
+
+    def forget(self, target):
+        """
+        Drop all state of node, because it is lost or dispatched. Completions do not
+        wait for it any longer. Sequence numbers to node keep increasing, so node which
+        still knows us accepts our next message if it comes back.
+        :param target: node to forget
+        :return: None
+        """
+        with self.lock:
+            self.unacked.pop(target, None)
+            self.handled_seq.pop(target, None)
+            self.__complete(target, lambda waiting: True)
+
+    def __complete(self, target, is_done):
+        for waiting, future in list(self.completions):
+            if target in waiting and is_done(waiting[target]):
+                waiting.pop(target)
+            if not waiting:
+                self.completions.remove((waiting, future))
+                future.set_result(None)
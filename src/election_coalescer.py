@@ -0,0 +1,104 @@
+"""
+Provides coalescer which merges many requests for an election into one election, e.g.
+when several nodes join or restart together.
+"""
+import time
+from threading import Thread, Condition
+
+ELECTION_WINDOW = 0.1
+ELECTION_MAX_DELAY = 1.0
+
+
+class ElectionCoalescer:
+    """
+    Changes of membership and votes only mark election as pending. Election runs once no
+    further request came in for window seconds, but at latest max_delay seconds after
+    first pending request, so a burst of changes causes one election and observers see
+    only the final master. Requests during a running election cause one more election.
+    """
+
+    def __init__(self, elect, window=ELECTION_WINDOW, max_delay=ELECTION_MAX_DELAY,
+                 clock=time.monotonic):
+        self.elect = elect
+        self.window = window
+        self.max_delay = max_delay
+        self.clock = clock
+        self.first_request = None
+        self.last_request = None
+        self.elections = 0
+        self.running = False
+        self.condition = Condition()
+        self.thread = None
+
+    def request(self):
+        """
+        Mark election as pending.
+        :return: None
+        """
+        with self.condition:
+            now = self.clock()
+            if self.first_request is None:
+                self.first_request = now
+            self.last_request = now
+            self.condition.notify()
+
+    def deadline(self):
+        """
+        :return: time of clock when pending election is due or None if none is pending
+        """
+        with self.condition:
+            return self.__deadline()
+
+    def run_if_due(self) -> bool:
+        """
+        Run pending election if its deadline passed.
+        :return: True if election ran
+        """
+        with self.condition:
+            deadline = self.__deadline()
+            if deadline is None or self.clock() < deadline:
+                return False
+            self.first_request = None
+            self.last_request = None
+        self.elect()
+        self.elections += 1
+        return True
+
+    def start(self):
+        """
+        Start thread which runs pending elections when they are due.
+        :return: None
+        """
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop thread, pending election is dropped.
+        :return: None
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def __deadline(self):
+        if self.first_request is None:
+            return None
+        return min(self.last_request + self.window, self.first_request + self.max_delay)
+
+    def __run(self):
+        while True:
+            with self.condition:
+                while self.running and self.__deadline() is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                delay = self.__deadline() - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+            self.run_if_due()
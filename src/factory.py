@@ -4,15 +4,28 @@ Provides help method for better creation of instances in testing and cmd script.
 
 import time
 
-import synchronized_set
-
+from src.async_engine import AsyncEngine, AsyncHandshake, AsyncPingMan
 from src.beans import NetAddress, NodeInformation
 from src.cmd_controller import CmdController
 from src.node_manger import NodeManger
 from src.handshake import Handshake, DEFAULT_BROADCAST
+from src.gossip import GossipMembership
+from src.election_coalescer import ELECTION_WINDOW, ELECTION_MAX_DELAY
+from src.leader_lease import LEASE_DURATION
+from src.failure_detector import PhiAccrualFailureDetector, PHI_THRESHOLD
+from src.inbound_pool import InboundWorkerPool, INBOUND_QUEUE_SIZE, DROP_OLDEST_HEARTBEAT
+from src.heartbeat_scheduler import HeartbeatScheduler, HEARTBEAT_INTERVAL, HEARTBEAT_JITTER
 from src.message_dict import MessageDict
+from src.node_registry import NodeRegistry, NodeSet
 from src.pinger import PingMan
-from src.vote_strategy import TimeStrategy, PortStrategy
+from src.selector_loop import SelectorLoop
+from src.node_metrics import MetricsSampler, sample_metrics
+from src.vote_strategy import TimeStrategy, PortStrategy, LoadStrategy, RttStrategy
+
+THREAD_ENGINE = 'threads'
+ASYNCIO_ENGINE = 'asyncio'
+SELECTOR_ENGINE = 'selectors'
+ENGINES = [THREAD_ENGINE, ASYNCIO_ENGINE, SELECTOR_ENGINE]
 
 
 def create_node_manger(address: str, port: int, name=None) -> NodeManger:
@@ -31,29 +44,101 @@ def create_node_manger(address: str, port: int, name=None) -> NodeManger:
 
 def create_node_manger_by_node_info(node_info: NodeInformation,
                                     broadcast_address=DEFAULT_BROADCAST,
-                                    vote_by_port=False, debug=False, human_user=False) -> NodeManger:
+                                    vote_by_port=False, debug=False, human_user=False,
+                                    engine=THREAD_ENGINE,
+                                    heartbeat_interval=HEARTBEAT_INTERVAL,
+                                    heartbeat_jitter=HEARTBEAT_JITTER,
+                                    digest_heartbeats=False,
+                                    phi_threshold=PHI_THRESHOLD,
+                                    gossip=False,
+                                    inbound_queue_size=INBOUND_QUEUE_SIZE,
+                                    overload_policy=DROP_OLDEST_HEARTBEAT,
+                                    election_window=ELECTION_WINDOW,
+                                    election_max_delay=ELECTION_MAX_DELAY,
+                                    lease_duration=LEASE_DURATION,
+                                    vote_by_load=False, vote_by_rtt=False) -> NodeManger:
     """
     Help method to create instance of NodeManger with observed instance of VoteStrategy and PingMan
     :param node_info: Info used for creation of instance
     :param broadcast_address: Broadcast Address for entering instances and making Handshake
     :param vote_by_port: Flag decides if master is calculated by PORT or birthtime of node
+    :param engine: THREAD_ENGINE for one send thread per connected node, ASYNCIO_ENGINE
+    for one event loop which handles all connections or SELECTOR_ENGINE for one thread
+    which reads all incoming connections and broadcasts
+    :param heartbeat_interval: seconds between two heartbeats to same node
+    :param heartbeat_jitter: maximal random seconds added or subtracted from interval
+    :param digest_heartbeats: Flag decides if unchanged information is send as digest
+    :param phi_threshold: suspicion level of failure detector at which a node is lost
+    :param gossip: Flag decides if few random nodes are probed per interval and membership
+    is spread by gossip instead of sending heartbeats to every node
+    :param inbound_queue_size: maximal number of received frames waiting to be handled
+    :param overload_policy: decides which heartbeat is dropped if inbound queue is full
+    :param election_window: seconds without changes after which requested election runs
+    :param election_max_delay: maximal seconds between first request and election
+    :param lease_duration: seconds a majority grants leader lease to master
+    :param vote_by_load: Flag decides if master is calculated by advertised load of node,
+    overrides vote_by_port
+    :param vote_by_rtt: Flag decides if master is calculated by advertised round trip times
+    of node to its peers, overrides vote_by_load and vote_by_port
     :return: created NodeManger
     """
-    message_dict = MessageDict(node_info)
-    connected_set = synchronized_set.SynchronizedSet(set())
-    handshake = Handshake(own_information=node_info, broadcast_address=broadcast_address)
-    ping_man = PingMan(own_information=node_info,
-                       message_dict=message_dict,
-                       connected=connected_set)
+    message_dict = MessageDict(node_info, send_digests=digest_heartbeats)
+    registry = NodeRegistry()
+    connected_set = NodeSet(registry)
+    scheduler = HeartbeatScheduler(interval=heartbeat_interval, jitter=heartbeat_jitter)
+    inbound_pool = InboundWorkerPool(max_queue=inbound_queue_size, policy=overload_policy)
+    membership = None
+    if gossip:
+        membership = GossipMembership(node_info, probe_interval=heartbeat_interval)
+        message_dict.set_piggyback(membership.updates_to_piggyback)
+        failure_detector = membership
+    else:
+        failure_detector = PhiAccrualFailureDetector(threshold=phi_threshold,
+                                                     first_heartbeat_estimate=heartbeat_interval)
+    if engine == ASYNCIO_ENGINE:
+        async_engine = AsyncEngine()
+        handshake = AsyncHandshake(own_information=node_info, engine=async_engine,
+                                   broadcast_address=broadcast_address)
+        ping_man = AsyncPingMan(own_information=node_info,
+                                message_dict=message_dict,
+                                connected=connected_set,
+                                engine=async_engine,
+                                scheduler=scheduler,
+                                failure_detector=failure_detector,
+                                membership=membership,
+                                inbound_pool=inbound_pool)
+    else:
+        selector_loop = SelectorLoop() if engine == SELECTOR_ENGINE else None
+        handshake = Handshake(own_information=node_info, broadcast_address=broadcast_address,
+                              selector_loop=selector_loop)
+        ping_man = PingMan(own_information=node_info,
+                           message_dict=message_dict,
+                           connected=connected_set,
+                           scheduler=scheduler,
+                           failure_detector=failure_detector,
+                           membership=membership,
+                           inbound_pool=inbound_pool,
+                           selector_loop=selector_loop)
 
-    if vote_by_port:
-        vote_strategy = PortStrategy(node_info, message_dict)
+    metrics_sampler = None
+    if vote_by_rtt or vote_by_load:
+        if vote_by_rtt:
+            vote_strategy = RttStrategy(node_info, message_dict, registry)
+        else:
+            vote_strategy = LoadStrategy(node_info, message_dict, registry)
+        metrics_sampler = MetricsSampler(lambda: sample_metrics(inbound_pool, ping_man.rtt),
+                                         vote_strategy.publish_metrics)
+    elif vote_by_port:
+        vote_strategy = PortStrategy(node_info, message_dict, registry)
     else:
-        vote_strategy = TimeStrategy(node_info, message_dict)
+        vote_strategy = TimeStrategy(node_info, message_dict, registry)
 
     manager = NodeManger(message_dict=message_dict, own_information=node_info,
                          connected=connected_set, ping_man=ping_man, handshaker=handshake,
-                         vote_strategy=vote_strategy)
+                         vote_strategy=vote_strategy, membership=membership,
+                         registry=registry, election_window=election_window,
+                         election_max_delay=election_max_delay,
+                         lease_duration=lease_duration, metrics_sampler=metrics_sampler)
     vote_strategy.node_manager = manager
     vote_strategy.attach(manager)
     handshake.attach(manager)
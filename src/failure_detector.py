@@ -0,0 +1,172 @@
+"""
+Provides adaptive failure detector which decides based on arrival times of heartbeats
+if a node should be suspected as lost.
+"""
+import math
+import time
+from collections import deque
+from threading import Lock
+
+PHI_THRESHOLD = 8.0
+WINDOW_SIZE = 100
+MIN_STD_DEVIATION = 0.1
+ACCEPTABLE_HEARTBEAT_PAUSE = 1.0
+FIRST_HEARTBEAT_ESTIMATE = 0.5
+MAX_EXPONENT = 700.0
+
+
+class ArrivalWindow:
+    """
+    Keeps last intervals between heartbeats of one node with running sum and
+    sum of squares, so mean and variance are calculated in O(1).
+    """
+
+    def __init__(self, first_arrival, window_size=WINDOW_SIZE,
+                 first_heartbeat_estimate=FIRST_HEARTBEAT_ESTIMATE):
+        self.intervals = deque()
+        self.window_size = window_size
+        self.interval_sum = 0.0
+        self.squared_interval_sum = 0.0
+        self.last_arrival = first_arrival
+        deviation = first_heartbeat_estimate / 4
+        self.add_interval(first_heartbeat_estimate - deviation)
+        self.add_interval(first_heartbeat_estimate + deviation)
+
+    def add_interval(self, interval):
+        """
+        Add interval and drop oldest interval if window is full.
+        :param interval: seconds between two heartbeats
+        :return: None
+        """
+        self.intervals.append(interval)
+        self.interval_sum += interval
+        self.squared_interval_sum += interval ** 2
+        if len(self.intervals) > self.window_size:
+            dropped = self.intervals.popleft()
+            self.interval_sum -= dropped
+            self.squared_interval_sum -= dropped ** 2
+
+    def add_arrival(self, arrival):
+        """
+        Add interval between last and this arrival.
+        :param arrival: time of heartbeat
+        :return: None
+        """
+        self.add_interval(arrival - self.last_arrival)
+        self.last_arrival = arrival
+
+    def mean(self):
+        """
+        :return: mean of intervals in window
+        """
+        return self.interval_sum / len(self.intervals)
+
+    def std_deviation(self):
+        """
+        :return: standard deviation of intervals in window
+        """
+        variance = self.squared_interval_sum / len(self.intervals) - self.mean() ** 2
+        return math.sqrt(max(0.0, variance))
+
+
+class PhiAccrualFailureDetector:
+    """
+    Phi accrual failure detector. Phi of a node expresses how unlikely it is that the
+    next heartbeat of node still arrives, based on normal distribution of last intervals.
+    Phi of 8 means that the node is wrongly suspected with probability of 10^-8.
+    """
+
+    def __init__(self, threshold=PHI_THRESHOLD, window_size=WINDOW_SIZE,
+                 min_std_deviation=MIN_STD_DEVIATION,
+                 acceptable_heartbeat_pause=ACCEPTABLE_HEARTBEAT_PAUSE,
+                 first_heartbeat_estimate=FIRST_HEARTBEAT_ESTIMATE,
+                 clock=time.monotonic):
+        self.threshold = threshold
+        self.window_size = window_size
+        self.min_std_deviation = min_std_deviation
+        self.acceptable_heartbeat_pause = acceptable_heartbeat_pause
+        self.first_heartbeat_estimate = first_heartbeat_estimate
+        self.clock = clock
+        self.windows = dict()
+        self.lock = Lock()
+
+    def heartbeat(self, node):
+        """
+        Record arrival of heartbeat from node.
+        :param node: node which sent heartbeat
+        :return: None
+        """
+        with self.lock:
+            self.__add_arrival(node, self.clock())
+
+    def phi(self, node) -> float:
+        """
+        Suspicion level of node. Zero if node is not watched.
+        :param node: node to check
+        :return: phi of node
+        """
+        with self.lock:
+            return self.__phi(node, self.clock())
+
+    def is_available(self, node) -> bool:
+        """
+        :param node: node to check
+        :return: True if phi of node is below threshold
+        """
+        return self.phi(node) < self.threshold
+
+    def suspicion(self) -> dict:
+        """
+        Phi of all watched nodes for instrumentation.
+        :return: dict which maps node to his phi
+        """
+        with self.lock:
+            now = self.clock()
+            return {node: self.__phi(node, now) for node in self.windows}
+
+    def suspects(self, nodes) -> list:
+        """
+        Start watching nodes which are not watched yet as if they had sent a heartbeat
+        now and stop watching nodes which are not in nodes.
+        :param nodes: currently connected nodes
+        :return: nodes whose phi crossed threshold
+        """
+        with self.lock:
+            nodes = set(nodes)
+            for node in set(self.windows) - nodes:
+                self.windows.pop(node)
+            now = self.clock()
+            for node in nodes:
+                if node not in self.windows:
+                    self.__add_arrival(node, now)
+            return [node for node in nodes if self.__phi(node, now) >= self.threshold]
+
+    def remove(self, node):
+        """
+        Stop watching node.
+        :param node: node which is lost or dispatched
+        :return: None
+        """
+        with self.lock:
+            self.windows.pop(node, None)
+
+    def __add_arrival(self, node, now):
+        window = self.windows.get(node)
+        if window is None:
+            self.windows[node] = ArrivalWindow(now, self.window_size,
+                                               self.first_heartbeat_estimate)
+        else:
+            window.add_arrival(now)
+
+    def __phi(self, node, now) -> float:
+        window = self.windows.get(node)
+        if window is None:
+            return 0.0
+        mean = window.mean() + self.acceptable_heartbeat_pause
+        std_deviation = max(window.std_deviation(), self.min_std_deviation)
+        y = (now - window.last_arrival - mean) / std_deviation
+        exponent = -y * (1.5976 + 0.070566 * y * y)
+        e = math.exp(min(MAX_EXPONENT, max(-MAX_EXPONENT, exponent)))
+        if now - window.last_arrival > mean:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
@@ -0,0 +1,213 @@
+"""
+Provides SWIM like gossip membership. Instead of sending heartbeats to every node, each
+node probes a few random nodes per interval and spreads changes of membership by
+piggybacking them on messages.
+"""
+import math
+import random
+import time
+from threading import Lock
+
+from src.beans import NodeInformation, Message
+from src.message_dict import MEMBER_ALIVE, MEMBER_SUSPECT, MEMBER_CONFIRM, MEMBER_LEFT
+
+PROBE_FANOUT = 3
+PROBE_INTERVAL = 0.5
+PROBE_TIMEOUT = 1.5
+SUSPICION_TIMEOUT = 3.0
+RETRANSMIT_MULTIPLIER = 3
+MAX_PIGGYBACK = 6
+
+
+class GossipMembership:
+    """
+    Membership of one node. Each round PROBE_FANOUT nodes are probed in a random round
+    robin order. A probed node which does not answer within PROBE_TIMEOUT is suspected,
+    a suspected node which does not refute within SUSPICION_TIMEOUT is confirmed as lost.
+    Updates are piggybacked about RETRANSMIT_MULTIPLIER * log(n) times. Can be used as
+    failure detector of PingMan.
+    """
+
+    def __init__(self, own_information: NodeInformation, fanout=PROBE_FANOUT,
+                 probe_interval=PROBE_INTERVAL, probe_timeout=PROBE_TIMEOUT,
+                 suspicion_timeout=SUSPICION_TIMEOUT,
+                 retransmit_multiplier=RETRANSMIT_MULTIPLIER, clock=time.monotonic):
+        self.own_information = own_information
+        self.fanout = fanout
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.suspicion_timeout = suspicion_timeout
+        self.retransmit_multiplier = retransmit_multiplier
+        self.clock = clock
+        self.incarnation = 0
+        self.members = dict()
+        self.probes = dict()
+        self.suspected_since = dict()
+        self.pending = dict()
+        self.probe_order = []
+        self.probe_targets_of_round = set()
+        self.round_end = 0.0
+        self.lock = Lock()
+
+    def probe_targets(self, connected) -> set:
+        """
+        Nodes which are probed in current round. A new round starts every probe interval.
+        :param connected: currently connected nodes
+        :return: nodes which get a heartbeat
+        """
+        with self.lock:
+            now = self.clock()
+            if now >= self.round_end:
+                self.round_end = now + self.probe_interval
+                self.probe_targets_of_round = self.__next_probe_targets(connected)
+                for target in self.probe_targets_of_round:
+                    self.probes.setdefault(target, now + self.probe_timeout)
+            return {target for target in self.probe_targets_of_round if target in connected}
+
+    def heartbeat(self, node: NodeInformation):
+        """
+        Node answered or sent a message, so it is neither probed nor suspected any longer.
+        :param node: node which sent a message
+        :return: None
+        """
+        with self.lock:
+            self.probes.pop(node, None)
+            if self.suspected_since.pop(node, None) is not None:
+                self.members[node] = [MEMBER_ALIVE, self.members[node][1]]
+
+    def suspects(self, nodes) -> list:
+        """
+        Suspect nodes which did not answer to probe and return nodes which did not
+        refute suspicion in time. They are confirmed as lost by remove.
+        :param nodes: currently connected nodes
+        :return: nodes which are suspected longer than suspicion timeout
+        """
+        with self.lock:
+            nodes = set(nodes)
+            now = self.clock()
+            for node, deadline in list(self.probes.items()):
+                if node not in nodes:
+                    self.probes.pop(node)
+                elif now >= deadline:
+                    self.probes.pop(node)
+                    self.__change(node, MEMBER_SUSPECT, self.__incarnation_of(node))
+            expired = []
+            for node, since in list(self.suspected_since.items()):
+                if node not in nodes:
+                    self.suspected_since.pop(node)
+                elif now - since >= self.suspicion_timeout:
+                    expired.append(node)
+            return expired
+
+    def remove(self, node: NodeInformation):
+        """
+        Stop probing node and spread that it is confirmed as lost.
+        :param node: node which is lost
+        :return: None
+        """
+        with self.lock:
+            self.probes.pop(node, None)
+            self.__change(node, MEMBER_CONFIRM, self.__incarnation_of(node))
+
+    def suspicion(self) -> dict:
+        """
+        Seconds since each suspected node is suspected for instrumentation.
+        :return: dict which maps node to seconds
+        """
+        with self.lock:
+            now = self.clock()
+            return {node: now - since for node, since in self.suspected_since.items()}
+
+    def left(self, node: NodeInformation):
+        """
+        Spread that node dispatched.
+        :param node: dispatched node
+        :return: None
+        """
+        with self.lock:
+            self.probes.pop(node, None)
+            self.suspected_since.pop(node, None)
+            self.__change(node, MEMBER_LEFT, self.__incarnation_of(node))
+
+    def apply(self, update: Message) -> bool:
+        """
+        Apply received update if it is newer than known state. Suspicion of own node is
+        refuted by spreading own node as alive with higher incarnation.
+        :param update: membership update with member as node_info and incarnation as version
+        :return: True if update changed known state of member
+        """
+        node, incarnation = update.node_info, update.version
+        with self.lock:
+            if node == self.own_information:
+                if update.subject in (MEMBER_SUSPECT, MEMBER_CONFIRM) \
+                        and incarnation >= self.incarnation:
+                    self.incarnation = incarnation + 1
+                    self.__enqueue(Message(MEMBER_ALIVE, self.own_information,
+                                           version=self.incarnation))
+                return False
+            if not self.__is_newer(node, update.subject, incarnation):
+                return False
+            self.__change(node, update.subject, incarnation)
+            return True
+
+    def updates_to_piggyback(self) -> list:
+        """
+        Take up to MAX_PIGGYBACK updates which were not transmitted often enough.
+        :return: list of updates
+        """
+        with self.lock:
+            updates = sorted(self.pending, key=lambda key: -self.pending[key][1])[:MAX_PIGGYBACK]
+            result = []
+            for key in updates:
+                update, remaining = self.pending[key]
+                result.append(update)
+                if remaining <= 1:
+                    self.pending.pop(key)
+                else:
+                    self.pending[key] = (update, remaining - 1)
+            return result
+
+    def __next_probe_targets(self, connected) -> set:
+        targets = set()
+        connected = set(connected)
+        refilled = False
+        while len(targets) < min(self.fanout, len(connected)):
+            if not self.probe_order:
+                if refilled:
+                    break
+                self.probe_order = list(connected)
+                random.shuffle(self.probe_order)
+                refilled = True
+            target = self.probe_order.pop()
+            if target in connected:
+                targets.add(target)
+        return targets
+
+    def __incarnation_of(self, node) -> int:
+        return self.members.get(node, [MEMBER_ALIVE, 0])[1]
+
+    def __is_newer(self, node, subject, incarnation) -> bool:
+        if node not in self.members:
+            return True
+        state, known_incarnation = self.members[node]
+        if subject == MEMBER_ALIVE:
+            return incarnation > known_incarnation
+        if subject == MEMBER_SUSPECT:
+            return (state == MEMBER_ALIVE and incarnation >= known_incarnation) \
+                   or incarnation > known_incarnation
+        if subject == MEMBER_CONFIRM:
+            return state not in (MEMBER_CONFIRM, MEMBER_LEFT) or incarnation > known_incarnation
+        return state != MEMBER_LEFT
+
+    def __change(self, node, subject, incarnation):
+        self.members[node] = [subject, incarnation]
+        if subject == MEMBER_SUSPECT:
+            self.suspected_since.setdefault(node, self.clock())
+        else:
+            self.suspected_since.pop(node, None)
+        self.__enqueue(Message(subject, node, version=incarnation))
+
+    def __enqueue(self, update: Message):
+        transmissions = max(1, math.ceil(self.retransmit_multiplier
+                                         * math.log10(len(self.members) + 2)))
+        self.pending[update.node_info] = (update, transmissions)
@@ -9,7 +9,10 @@ from socket import socket, AF_INET, SOCK_DGRAM, IPPROTO_UDP, SO_BROADCAST, \
     SOL_SOCKET, SO_REUSEPORT, SHUT_RDWR, error
 from observer import Observable
 
-from src.beans import NetAddress, NodeInformation, node_information_from_json, UpdateValue
+from src.beans import NetAddress, NodeInformation, UpdateValue, \
+    node_information_from_discovery_json
+from src.inbound_pool import InboundWorkerPool
+from src.selector_loop import SelectorLoop
 
 DEFAULT_BROADCAST = NetAddress(host="<broadcast>", port=5555)
 MESSAGE_LENGTH = 500
@@ -21,12 +24,15 @@ NEW_ENTERING_NODE = 'HANDSHAKE_WITH_ENTERING_NODE'
 class Handshake(Observable):
     """
     Class responsible for send message per broadcast and listen to incoming messages.
-    Notify observers about incoming.
+    Notify observers about incoming. Received broadcasts are handled by bounded inbound
+    pool, so a burst of broadcasts never starts a thread per datagram.
     """
 
     def __init__(self,
                  own_information: NodeInformation,
-                 broadcast_address: NetAddress = DEFAULT_BROADCAST):
+                 broadcast_address: NetAddress = DEFAULT_BROADCAST,
+                 selector_loop: SelectorLoop = None,
+                 inbound_pool: InboundWorkerPool = None):
         super(Handshake, self).__init__()
         self.own_information = own_information
         self.broadcast_address = broadcast_address
@@ -35,13 +41,23 @@ class Handshake(Observable):
         self.running = False
         self.introduce_socket = None
         self.response_socket = None
+        self.selector_loop = selector_loop
+        self.inbound_pool = InboundWorkerPool() if inbound_pool is None else inbound_pool
 
     def start(self):
         """
-        Start listing for incoming messages and send thread.
+        Start listing for incoming messages and send thread. If selector loop is used
+        broadcast socket is read by its thread.
         """
         self.running = True
-        self.collect_thread.start()
+        self.inbound_pool.start(self.__add_node_info_and_send_own)
+        if self.selector_loop is None:
+            self.collect_thread.start()
+        else:
+            self.selector_loop.acquire()
+            self.response_socket = self.__bind_response_socket()
+            self.response_socket.setblocking(False)
+            self.selector_loop.register(self.response_socket, self.__receive_datagram)
         time.sleep(1)
         self.broadcast_thread.start()
 
@@ -51,8 +67,12 @@ class Handshake(Observable):
         :return: None
         """
         self.running = False
+        self.inbound_pool.stop()
         if self.broadcast_thread.is_alive():
             self.broadcast_thread.join()
+        if self.selector_loop is not None and self.response_socket is not None:
+            self.selector_loop.unregister(self.response_socket)
+            self.selector_loop.release()
         if self.response_socket is not None:
             try:
                 self.response_socket.shutdown(SHUT_RDWR)
@@ -71,7 +91,7 @@ class Handshake(Observable):
         self.introduce_socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
         self.introduce_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
         self.introduce_socket.settimeout(TIMEOUT_BROADCAST)
-        message = self.own_information.to_json()
+        message = self.own_information.to_discovery_json()
         self.introduce_socket.sendto(bytes(message, encoding=ENCODE_UTF_8),
                                      (self.broadcast_address.host, self.broadcast_address.port))
         self.introduce_socket.close()
@@ -82,22 +102,42 @@ class Handshake(Observable):
         node manger if new send information
         :return: None
         """
-        self.response_socket = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
-        self.response_socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
-        self.response_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-        self.response_socket.bind(('', self.broadcast_address.port))
+        self.response_socket = self.__bind_response_socket()
         while self.running:
             data, _ = self.response_socket.recvfrom(MESSAGE_LENGTH)
             if data != b'':
-                threading.Thread(target=self.__add_node_info_and_send_own, args=(data,)).start()
+                self.inbound_pool.submit(data)
         self.response_socket.close()
 
+    def __bind_response_socket(self) -> socket:
+        """
+        :return: socket which listens on port of broadcast address
+        """
+        response_socket = socket(AF_INET, SOCK_DGRAM, IPPROTO_UDP)
+        response_socket.setsockopt(SOL_SOCKET, SO_REUSEPORT, 1)
+        response_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+        response_socket.bind(('', self.broadcast_address.port))
+        return response_socket
+
+    def __receive_datagram(self, response_socket: socket):
+        """
+        Read broadcast in thread of selector loop and pass it to inbound pool.
+        :param response_socket: readable broadcast socket
+        :return: None
+        """
+        try:
+            data, _ = response_socket.recvfrom(MESSAGE_LENGTH)
+        except (BlockingIOError, OSError):
+            return
+        if data != b'' and self.running:
+            self.inbound_pool.submit(data)
+
     def __add_node_info_and_send_own(self, data):
         """
-        Help Method to notify observer in own Thread
+        Help Method to notify observer in worker of inbound pool
         :param data: data from socket who send information
         :return: None
         """
         data = data.decode(encoding=ENCODE_UTF_8)
-        node_information = node_information_from_json(data)
+        node_information = node_information_from_discovery_json(data)
         self.notify(UpdateValue(NEW_ENTERING_NODE, node_information))
@@ -0,0 +1,126 @@
+"""
+Provides scheduler which decides when next heartbeat has to be send to a node.
+"""
+import heapq
+import itertools
+import random
+import time
+from threading import Lock
+
+HEARTBEAT_INTERVAL = 0.5
+HEARTBEAT_JITTER = 0.1
+
+
+class HeartbeatScheduler:
+    """
+    Each target has an own due time. Due times are kept in a heap, so next due target
+    is found in O(log n). Targets can be expedited if an urgent message is queued for them.
+    Heap entries of rescheduled or removed targets are dropped lazily. Popped targets
+    stay in flight until they are scheduled again, so a slow send is not repeated by sync.
+    """
+
+    def __init__(self, interval=HEARTBEAT_INTERVAL, jitter=HEARTBEAT_JITTER,
+                 clock=time.monotonic):
+        self.interval = interval
+        self.jitter = jitter
+        self.clock = clock
+        self.heap = []
+        self.due = dict()
+        self.in_flight = set()
+        self.counter = itertools.count()
+        self.listeners = []
+        self.lock = Lock()
+
+    def add_listener(self, listener):
+        """
+        Register callable which is called without arguments when a target is expedited.
+        :param listener: callable to wake up sender
+        :return: None
+        """
+        self.listeners.append(listener)
+
+    def schedule(self, target, delay=None):
+        """
+        Schedule next heartbeat of target after interval with random jitter.
+        :param target: node which get heartbeat
+        :param delay: optional delay instead of interval with jitter
+        :return: None
+        """
+        if delay is None:
+            delay = max(0.0, self.interval + random.uniform(-self.jitter, self.jitter))
+        with self.lock:
+            self.in_flight.discard(target)
+            self.__push(target, self.clock() + delay)
+
+    def expedite(self, target):
+        """
+        Make target due immediately and wake up listeners.
+        :param target: node which has urgent messages
+        :return: None
+        """
+        with self.lock:
+            self.__push(target, self.clock())
+        for listener in self.listeners:
+            listener()
+
+    def remove(self, target):
+        """
+        Remove target from schedule.
+        :param target: node which get no heartbeats any longer
+        :return: None
+        """
+        with self.lock:
+            self.due.pop(target, None)
+            self.in_flight.discard(target)
+
+    def sync(self, targets):
+        """
+        Schedule targets which are neither scheduled nor in flight immediately and
+        remove targets which are not in targets any longer.
+        :param targets: all nodes which should get heartbeats
+        :return: None
+        """
+        with self.lock:
+            targets = set(targets)
+            for target in set(self.due) - targets:
+                self.due.pop(target)
+            self.in_flight &= targets
+            now = self.clock()
+            for target in targets:
+                if target not in self.due and target not in self.in_flight:
+                    self.__push(target, now)
+
+    def pop_due(self) -> list:
+        """
+        Remove all due targets from schedule.
+        :return: list of targets which have to get a heartbeat now
+        """
+        due_targets = []
+        with self.lock:
+            now = self.clock()
+            while self.heap and self.heap[0][0] <= now:
+                due_time, _, target = heapq.heappop(self.heap)
+                if self.due.get(target) == due_time:
+                    self.due.pop(target)
+                    self.in_flight.add(target)
+                    due_targets.append(target)
+        return due_targets
+
+    def time_until_next(self):
+        """
+        Seconds until next target is due. Never more than interval, so new targets
+        are found by sync in time.
+        :return: seconds to wait
+        """
+        with self.lock:
+            while self.heap and self.due.get(self.heap[0][2]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            if not self.heap:
+                return self.interval
+            return min(self.interval, max(0.0, self.heap[0][0] - self.clock()))
+
+    def __push(self, target, due_time):
+        if target in self.due and self.due[target] <= due_time:
+            return
+        self.due[target] = due_time
+        heapq.heappush(self.heap, (due_time, next(self.counter), target))
@@ -0,0 +1,140 @@
+"""
+Provides bounded pool of workers which handle received frames, so a burst of incoming
+frames never creates more threads or a longer backlog than configured.
+"""
+from collections import deque
+from itertools import count
+from threading import Thread, Condition
+
+from src.message_dict import is_heartbeat_frame
+
+INBOUND_WORKERS = 1
+INBOUND_QUEUE_SIZE = 256
+DROP_OLDEST_HEARTBEAT = 'drop_oldest_heartbeat'
+REJECT_NEWEST_HEARTBEAT = 'reject_newest_heartbeat'
+OVERLOAD_POLICIES = [DROP_OLDEST_HEARTBEAT, REJECT_NEWEST_HEARTBEAT]
+
+
+class InboundWorkerPool:
+    """
+    Received frames are queued and handled by a fixed number of workers. If queue is
+    full overload policy decides which heartbeat frame is dropped. Frames with other
+    messages like handshakes or dispatching are never dropped, even if queue is full.
+    With more than one worker frames of same node may be handled out of order.
+    Heartbeats and other frames are queued separately with their arrival number, so
+    a frame is classified once and dropping the oldest heartbeat needs no search.
+    """
+
+    def __init__(self, workers=INBOUND_WORKERS, max_queue=INBOUND_QUEUE_SIZE,
+                 policy=DROP_OLDEST_HEARTBEAT):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError('Unknown overload policy {}'.format(policy))
+        self.workers = workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self.heartbeats = deque()
+        self.others = deque()
+        self.arrivals = count()
+        self.condition = Condition()
+        self.handle = None
+        self.threads = []
+        self.running = False
+        self.processed = 0
+        self.rejected = 0
+        self.max_depth = 0
+
+    def start(self, handle):
+        """
+        Start workers.
+        :param handle: callable which is called with each frame
+        :return: None
+        """
+        self.handle = handle
+        self.running = True
+        self.threads = [Thread(target=self.__work, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop workers after their current frame. Queued frames are discarded.
+        :return: None
+        """
+        with self.condition:
+            self.running = False
+            self.heartbeats.clear()
+            self.others.clear()
+            self.condition.notify_all()
+
+    def submit(self, frame) -> bool:
+        """
+        Queue frame for workers. If queue is full overload policy is applied.
+        :param frame: received bytes
+        :return: False if frame was rejected
+        """
+        heartbeat = is_heartbeat_frame(frame)
+        with self.condition:
+            if self.__depth() >= self.max_queue and not self.__make_room(heartbeat):
+                self.rejected += 1
+                return False
+            queue = self.heartbeats if heartbeat else self.others
+            queue.append((next(self.arrivals), frame))
+            self.max_depth = max(self.max_depth, self.__depth())
+            self.condition.notify()
+            return True
+
+    def queued_frames(self) -> list:
+        """
+        :return: queued frames in order of arrival
+        """
+        with self.condition:
+            return [frame for _, frame in sorted(self.heartbeats + self.others)]
+
+    def metrics(self) -> dict:
+        """
+        Current queue depth and counters, so size of queue can be tuned.
+        :return: dict with queue_depth, max_queue_depth, processed and rejected frames
+        """
+        with self.condition:
+            return {'queue_depth': self.__depth(), 'max_queue_depth': self.max_depth,
+                    'processed': self.processed, 'rejected': self.rejected}
+
+    def __depth(self) -> int:
+        return len(self.heartbeats) + len(self.others)
+
+    def __make_room(self, heartbeat: bool) -> bool:
+        """
+        Drop oldest queued heartbeat if policy allows it. Frames which are not
+        heartbeats are accepted anyway. Lock must be held.
+        :param heartbeat: True if frame that should be queued is a heartbeat
+        :return: True if frame can be queued
+        """
+        if self.policy == DROP_OLDEST_HEARTBEAT and self.heartbeats:
+            self.heartbeats.popleft()
+            self.rejected += 1
+            return True
+        return not heartbeat
+
+    def __next_frame(self):
+        """
+        Take frame which arrived first. Lock must be held and a frame queued.
+        :return: frame
+        """
+        if not self.others or (self.heartbeats and self.heartbeats[0][0] < self.others[0][0]):
+            return self.heartbeats.popleft()[1]
+        return self.others.popleft()[1]
+
+    def __work(self):
+        while True:
+            with self.condition:
+                while self.running and not self.__depth():
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame = self.__next_frame()
+            try:
+                self.handle(frame)
+            except Exception as error:
+                print('Could not handle frame: {}'.format(error))
+            with self.condition:
+                self.processed += 1
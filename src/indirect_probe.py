@@ -0,0 +1,125 @@
+"""
+Provides indirect probing, so a node is only reported as lost if other nodes are also
+not able to reach it. Avoids re-elections caused by one broken link.
+"""
+import random
+import time
+from threading import Lock
+
+from src.beans import NodeInformation, Message
+from src.node_registry import find_by_key
+from src.message_dict import MessageDict, DEFAULT_MESSAGE, PING_REQUEST_MESSAGE, \
+    INDIRECT_ACK_MESSAGE
+
+INDIRECT_PROBE_FANOUT = 3
+INDIRECT_PROBE_TIMEOUT = 1.5
+
+
+class IndirectProbe:
+    """
+    Before a suspected node is reported as lost, up to fanout other nodes are asked
+    to probe it. Each of them answers with an indirect acknowledge as soon as it
+    received a message from suspected node. If no acknowledge arrives within timeout
+    suspected node is reported as lost. Also relays probes which were requested by
+    other nodes.
+    """
+
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 fanout=INDIRECT_PROBE_FANOUT, timeout=INDIRECT_PROBE_TIMEOUT,
+                 clock=time.monotonic):
+        self.own_information = own_information
+        self.message_dict = message_dict
+        self.fanout = fanout
+        self.timeout = timeout
+        self.clock = clock
+        self.pending = dict()
+        self.relays = dict()
+        self.lock = Lock()
+
+    def confirm(self, suspects, connected) -> list:
+        """
+        Ask other nodes to probe new suspects. Probes of nodes which are not suspected
+        any longer are dropped.
+        :param suspects: nodes which are suspected by failure detector
+        :param connected: currently connected nodes
+        :return: suspects which are not reachable by any asked node within timeout or
+        which could not be probed indirectly, because no other node understands requests
+        """
+        suspects = set(suspects)
+        lost = []
+        requests = []
+        with self.lock:
+            now = self.clock()
+            for target in set(self.pending) - suspects:
+                self.pending.pop(target)
+            for target in suspects:
+                if target in self.pending:
+                    if now >= self.pending[target]:
+                        self.pending.pop(target)
+                        lost.append(target)
+                    continue
+                helpers = self.__choose_helpers(target, connected)
+                if not helpers:
+                    lost.append(target)
+                    continue
+                self.pending[target] = now + self.timeout
+                requests.extend((helper, target) for helper in helpers)
+        for helper, target in requests:
+            self.message_dict.add_message_for_node(
+                Message(PING_REQUEST_MESSAGE, self.own_information, node_key=target.node_key),
+                helper)
+        return lost
+
+    def acknowledge(self, target_key):
+        """
+        Another node reached suspected node, so probe is finished.
+        :param target_key: node key of suspected node
+        :return: suspected node or None if it is not probed
+        """
+        with self.lock:
+            for target in self.pending:
+                if target.node_key == target_key:
+                    self.pending.pop(target)
+                    return target
+        return None
+
+    def request(self, requester: NodeInformation, target_key, connected):
+        """
+        Probe target for requester. Requester gets an acknowledge as soon as target
+        sent a message.
+        :param requester: node which suspects target
+        :param target_key: node key of suspected node
+        :param connected: currently connected nodes
+        :return: None
+        """
+        target = find_by_key(connected, target_key)
+        if target is None:
+            return
+        with self.lock:
+            now = self.clock()
+            for node, (_, deadline) in list(self.relays.items()):
+                if now >= deadline:
+                    self.relays.pop(node)
+            requesters, _ = self.relays.get(target, (set(), None))
+            requesters.add(requester)
+            self.relays[target] = (requesters, now + self.timeout)
+        self.message_dict.add_message_for_node(Message(DEFAULT_MESSAGE, self.own_information),
+                                               target)
+
+    def heard_from(self, node: NodeInformation):
+        """
+        Acknowledge node to all nodes which requested a probe of it.
+        :param node: node which sent a message
+        :return: None
+        """
+        with self.lock:
+            requesters, _ = self.relays.pop(node, (set(), None))
+        for requester in requesters:
+            self.message_dict.add_message_for_node(
+                Message(INDIRECT_ACK_MESSAGE, self.own_information, node_key=node.node_key),
+                requester)
+
+    def __choose_helpers(self, target, connected) -> list:
+        candidates = [node for node in connected
+                      if node != target and self.message_dict.understands_binary(node)]
+        return random.sample(candidates, min(self.fanout, len(candidates)))
@@ -0,0 +1,197 @@
+"""
+Provides leader lease which lets the master answer if it is master without asking
+other nodes, e.g. before it runs work which must not run twice in the network.
+"""
+import time
+from threading import Lock
+
+from src.beans import NodeInformation, Message
+from src.message_dict import LEASE_MESSAGE
+
+LEASE_DURATION = 2.0
+CLOCK_DRIFT = 0.05
+RENEW_FRACTION = 0.3
+NO_STAMP = 0.0
+
+
+class LeaderLease:
+    """
+    Lease messages are appended to binary frames and carry a timestamp of sender, the
+    last timestamp received from target as echo, how long echo was held and a grant if
+    sender votes for target as master. Master sends a new timestamp to every node each
+    renew interval, other nodes once per duration. A lease message is only sent if a
+    timestamp is due, a received timestamp was not echoed yet or grant to target
+    changed. Echoes measure round trip times as by-product.
+    A node grants to one node at a time and promises to grant to no other node
+    until duration passed since it received the echoed timestamp. Master holds lease
+    while a majority of own, connected and lost nodes granted in its term, so a master
+    which lost nodes by a partition does not hold lease with a minority. Lease is valid
+    until duration, shortened by clock drift, after the timestamp a majority echoed.
+    Node without connected and lost nodes is its own majority for one duration.
+    Timestamps are only compared with the clock which created them, so clocks of nodes
+    need no synchronisation. Term of lease is the fencing token, it increases whenever
+    another node could become master and a lease of an older term is not valid. Lease
+    is recalculated when messages arrive, so holds only compares the clock with a
+    stored deadline until it passed.
+    """
+
+    def __init__(self, own_information: NodeInformation, connected, lost=frozenset(),
+                 duration=LEASE_DURATION, drift=CLOCK_DRIFT, clock=time.monotonic):
+        self.own_information = own_information
+        self.connected = connected
+        self.lost = lost
+        self.duration = duration
+        self.renew_interval = duration * RENEW_FRACTION
+        self.drift = drift
+        self.clock = clock
+        self.master = None
+        self.received = dict()
+        self.unechoed = set()
+        self.stamped = dict()
+        self.sent_grants = dict()
+        self.last_echoes = dict()
+        self.grants = dict()
+        self.granted_to = None
+        self.promised_until = NO_STAMP
+        self.until = None
+        self.token = None
+        self.lock = Lock()
+
+    def message(self, target: NodeInformation):
+        """
+        Create lease message for next frame to target if a timestamp is due, a received
+        timestamp has to be echoed or grant changed. Grant is only given if own vote is
+        target and no promise to another node is valid.
+        :param target: node which receives frame
+        :return: lease message or None
+        """
+        with self.lock:
+            now = self.clock()
+            echo, received_at = self.received.get(target, (NO_STAMP, NO_STAMP))
+            grant = echo != NO_STAMP and target != self.own_information \
+                    and self.own_information.wish_master == target \
+                    and (self.granted_to == target or self.promised_until <= now)
+            interval = self.renew_interval if self.master == self.own_information \
+                else self.duration
+            stamp_due = now - self.stamped.get(target, -interval) >= interval
+            if not stamp_due and target not in self.unechoed \
+                    and grant == self.sent_grants.get(target, False):
+                return None
+            if grant:
+                self.granted_to = target
+                self.promised_until = max(self.promised_until, received_at + self.duration)
+                self.__renew()
+            stamp = NO_STAMP
+            if stamp_due:
+                stamp = now
+                self.stamped[target] = now
+            self.unechoed.discard(target)
+            self.sent_grants[target] = grant
+            held = 0.0 if echo == NO_STAMP else now - received_at
+            return Message(LEASE_MESSAGE, self.own_information,
+                           node_key=self.own_information.node_key,
+                           term=self.own_information.term, stamp=stamp, echo=echo,
+                           held=held, grant=grant)
+
+    def receive(self, sender: NodeInformation, message: Message):
+        """
+        Remember new timestamp of sender for echo and store his grant.
+        :param sender: node which sent lease message
+        :param message: received lease message
+        :return: round trip time to sender in seconds or None if message echoed no new
+        timestamp
+        """
+        with self.lock:
+            now = self.clock()
+            if message.stamp != NO_STAMP:
+                self.received[sender] = (message.stamp, now)
+                self.unechoed.add(sender)
+            if message.grant:
+                self.grants[sender] = (message.term, message.echo)
+            else:
+                self.grants.pop(sender, None)
+            self.__renew()
+            if message.echo <= self.last_echoes.get(sender, NO_STAMP):
+                return None
+            self.last_echoes[sender] = message.echo
+        return max(now - message.echo - message.held, 0.0)
+
+    def set_master(self, master: NodeInformation):
+        """
+        Only the master holds a lease.
+        :param master: master decided by election
+        :return: None
+        """
+        with self.lock:
+            self.master = master
+            self.__renew()
+
+    def forget(self, node_info: NodeInformation):
+        """
+        Drop timestamps and grant of node, because it is lost or dispatched.
+        :param node_info: node to forget
+        :return: None
+        """
+        with self.lock:
+            for values in (self.received, self.stamped, self.sent_grants,
+                           self.last_echoes, self.grants):
+                values.pop(node_info, None)
+            self.unechoed.discard(node_info)
+            self.__renew()
+
+    def renew(self):
+        """
+        Calculate lease again, because connected nodes changed.
+        :return: None
+        """
+        with self.lock:
+            self.__renew()
+
+    def holds(self) -> bool:
+        """
+        :return: True if own node is master and its lease is valid now
+        """
+        if self.__valid():
+            return True
+        with self.lock:
+            self.__renew()
+            return self.__valid()
+
+    def status(self) -> tuple:
+        """
+        :return: tuple of time of clock until lease is valid and fencing token or
+        None and None if own node does not hold lease now
+        """
+        with self.lock:
+            if not self.__valid():
+                self.__renew()
+            if not self.__valid():
+                return None, None
+            return self.until, self.token
+
+    def __valid(self) -> bool:
+        until = self.until
+        return until is not None and self.token == self.own_information.term \
+               and self.clock() < until
+
+    def __renew(self):
+        """
+        Calculate deadline of lease from grants of current term. Lock must be held.
+        Majority is counted over connected and lost nodes.
+        :return: None
+        """
+        self.until = None
+        now = self.clock()
+        if self.master != self.own_information or self.promised_until > now:
+            return
+        term = self.own_information.term
+        echoes = sorted((echo for node, (granted_term, echo) in self.grants.items()
+                         if granted_term == term and node in self.connected), reverse=True)
+        needed = (len(self.connected) + len(self.lost) + 1) // 2
+        if len(echoes) < needed:
+            return
+        if needed == 0:
+            self.until = now + self.duration * (1 - self.drift)
+        else:
+            self.until = echoes[needed - 1] + self.duration * (1 - self.drift)
+        self.token = term
@@ -3,31 +3,326 @@ Module provided a dataclass which is used as an dictionary to know what messages
 send during next ping.
 """
 
-import time
 import threading
-import queue
+import struct
+from concurrent.futures import Future
 import synchronized_set
 
-from src.beans import NodeInformation
+from src.beans import NodeInformation, Message, InternTable, node_information_from_json, \
+    node_information_to_bytes, node_information_from_bytes
+from src.delivery import DeliveryTracker, UNSEQUENCED
+from src.priority_lanes import PriorityLanes, CONTROL_LANE, MEMBERSHIP_LANE, BULK_LANE, \
+    LANES, FRAME_BUDGET
 
 DEFAULT_MESSAGE = 'OK'
 DISPATCH_MESSAGE = 'BYE'
 HANDSHAKE_MESSAGE = 'HANDSHAKE'
+DIGEST_MESSAGE = 'DIGEST'
+STATE_REQUEST_MESSAGE = 'STATE_REQUEST'
+ACK_MESSAGE = 'ACK'
+MEMBER_ALIVE = 'MEMBER_ALIVE'
+MEMBER_SUSPECT = 'MEMBER_SUSPECT'
+MEMBER_CONFIRM = 'MEMBER_CONFIRM'
+MEMBER_LEFT = 'MEMBER_LEFT'
+MEMBERSHIP_SUBJECTS = {MEMBER_ALIVE, MEMBER_SUSPECT, MEMBER_CONFIRM, MEMBER_LEFT}
+PING_REQUEST_MESSAGE = 'PING_REQUEST'
+INDIRECT_ACK_MESSAGE = 'INDIRECT_ACK'
+INDIRECT_PROBE_SUBJECTS = {PING_REQUEST_MESSAGE, INDIRECT_ACK_MESSAGE}
+CONTROL_ACK_MESSAGE = 'CONTROL_ACK'
+LEASE_MESSAGE = 'LEASE'
+HANDSHAKE_RETRANSMISSIONS = 4
+CONTROL_SUBJECTS = {HANDSHAKE_MESSAGE, DISPATCH_MESSAGE}
+SEQUENCED_SUBJECTS = CONTROL_SUBJECTS | {CONTROL_ACK_MESSAGE}
+MEMBERSHIP_LANE_SUBJECTS = MEMBERSHIP_SUBJECTS | INDIRECT_PROBE_SUBJECTS \
+                           | {ACK_MESSAGE, STATE_REQUEST_MESSAGE}
+KEYED_SUBJECTS = INDIRECT_PROBE_SUBJECTS | SEQUENCED_SUBJECTS | {LEASE_MESSAGE}
+HEARTBEAT_SUBJECTS = {DEFAULT_MESSAGE, DIGEST_MESSAGE, ACK_MESSAGE, LEASE_MESSAGE} \
+                     | MEMBERSHIP_SUBJECTS
 JSON_SEPARATOR = ':_:'
 MESSAGE_SEPARATOR = '--__--'
+UTF_8 = 'utf8'
+JSON_MESSAGE_ENCODING = 'json_message'
+BINARY_MESSAGE_ENCODING = 'binary_message'
+
+WIRE_MAGIC = 0xB1
+WIRE_VERSION = 7
+BINARY_WIRE_TAG = 'BINARY_WIRE_{}'.format(WIRE_VERSION)
+FRAME_HEADER_STRUCT = struct.Struct('>BBH')
+MESSAGE_HEADER_STRUCT = struct.Struct('>BI')
+VERSION_STRUCT = struct.Struct('>I')
+DIGEST_STRUCT = struct.Struct('>QI')
+NODE_KEY_STRUCT = struct.Struct('>Q')
+SEQ_STRUCT = struct.Struct('>I')
+LEASE_STRUCT = struct.Struct('>QidddB')
+SUBJECT_TO_TYPE = {DEFAULT_MESSAGE: 1, DISPATCH_MESSAGE: 2, HANDSHAKE_MESSAGE: 3,
+                   DIGEST_MESSAGE: 4, STATE_REQUEST_MESSAGE: 5, ACK_MESSAGE: 6,
+                   MEMBER_ALIVE: 7, MEMBER_SUSPECT: 8, MEMBER_CONFIRM: 9, MEMBER_LEFT: 10,
+                   PING_REQUEST_MESSAGE: 11, INDIRECT_ACK_MESSAGE: 12,
+                   CONTROL_ACK_MESSAGE: 13, LEASE_MESSAGE: 14}
+TYPE_TO_SUBJECT = {value: key for key, value in SUBJECT_TO_TYPE.items()}
+HANDSHAKE_TYPE = SUBJECT_TO_TYPE[HANDSHAKE_MESSAGE]
+
+
+def message_to_string(message) -> str:
+    """
+    Serialize message to json format with JSON_SEPARATOR. Handshakes announce that
+    binary wire format is understood. Nodes which only know json ignore announcement.
+    Serialized message is cached by node information of message.
+    :param message: instance of Message or already serialized string
+    :return: serialized message
+    """
+    if isinstance(message, str):
+        return message
+    return message.node_info.cached_encoding((JSON_MESSAGE_ENCODING, message.subject),
+                                             lambda: _encode_string(message))
+
+
+def _encode_string(message) -> str:
+    serialized = message.subject + JSON_SEPARATOR + message.node_info.to_json()
+    if message.subject == HANDSHAKE_MESSAGE:
+        serialized += JSON_SEPARATOR + BINARY_WIRE_TAG
+    return serialized
+
+
+def message_from_string(serialized: str, intern_table: InternTable = None) -> Message:
+    """
+    Deserialize message in json format. Only first JSON_SEPARATOR and announcement of
+    handshake separate parts, so json may contain JSON_SEPARATOR.
+    :param serialized: subject and json separated by JSON_SEPARATOR
+    :param intern_table: table which resolves nodes to shared instances or None
+    :return: deserialized Message
+    """
+    subject, _, json = serialized.partition(JSON_SEPARATOR)
+    announcement = JSON_SEPARATOR + BINARY_WIRE_TAG
+    if json.endswith(announcement):
+        json = json[:-len(announcement)]
+    return Message(subject, node_information_from_json(
+        json, intern_table, update=subject not in MEMBERSHIP_SUBJECTS))
+
+
+def message_lane(message) -> str:
+    """
+    Choose priority lane of message. Handshakes, dispatching and their acknowledges
+    are control messages. Membership updates and probes belong to membership lane and
+    all other messages to bulk lane.
+    :param message: instance of Message or string in json format
+    :return: one of LANES
+    """
+    if isinstance(message, str):
+        subject = message.partition(JSON_SEPARATOR)[0]
+    else:
+        subject = message.subject
+    if subject in SEQUENCED_SUBJECTS:
+        return CONTROL_LANE
+    if subject in MEMBERSHIP_LANE_SUBJECTS:
+        return MEMBERSHIP_LANE
+    return BULK_LANE
+
+
+def message_to_bytes(message) -> bytes:
+    """
+    Serialize message to binary format with type tag and length of body. Body contains
+    version of message or node information and binary record of node. Digest contain
+    only key and version of node. Indirect probes start with key of probed node and
+    control messages with their sequence number. Lease messages contain only key and
+    term of node, timestamps, time echo was held and grant. Messages which depend only on node
+    information are encoded once and shared by all targets until information changes.
+    :param message: instance of Message or string in json format
+    :return: serialized message
+    """
+    if isinstance(message, str):
+        message = message_from_string(message)
+    if message.version is None and message.subject not in KEYED_SUBJECTS:
+        return message.node_info.cached_encoding((BINARY_MESSAGE_ENCODING, message.subject),
+                                                 lambda: _encode_bytes(message))
+    return _encode_bytes(message)
+
+
+def _encode_bytes(message) -> bytes:
+    if message.subject == DIGEST_MESSAGE:
+        body = DIGEST_STRUCT.pack(message.node_info.node_key, message.node_info.version)
+    elif message.subject == LEASE_MESSAGE:
+        body = LEASE_STRUCT.pack(message.node_key, message.term, message.stamp, message.echo,
+                                 message.held, message.grant)
+    else:
+        version = message.node_info.version if message.version is None else message.version
+        body = VERSION_STRUCT.pack(version) + node_information_to_bytes(message.node_info)
+        if message.subject in INDIRECT_PROBE_SUBJECTS:
+            body = NODE_KEY_STRUCT.pack(message.node_key) + body
+        elif message.subject in SEQUENCED_SUBJECTS:
+            seq = UNSEQUENCED if message.seq is None else message.seq
+            body = SEQ_STRUCT.pack(seq) + body
+    return MESSAGE_HEADER_STRUCT.pack(SUBJECT_TO_TYPE[message.subject], len(body)) + body
+
+
+def messages_to_frame(messages) -> bytes:
+    """
+    Serialize messages to binary frame with number of messages in header.
+    :param messages: instances of Message or strings in json format
+    :return: encoded frame
+    """
+    return encoded_to_frame([message_to_bytes(message) for message in messages])
+
+
+def encoded_to_frame(encoded) -> bytes:
+    """
+    Join messages which are already serialized by message_to_bytes to binary frame.
+    :param encoded: list of serialized messages
+    :return: encoded frame
+    """
+    return FRAME_HEADER_STRUCT.pack(WIRE_MAGIC, WIRE_VERSION, len(encoded)) + b''.join(encoded)
+
+
+def iter_frame(frame):
+    """
+    Iterate over messages of binary frame by their length prefixes without decoding
+    them.
+    :param frame: received bytes in binary format
+    :return: generator of type tag, start and end of body of each message
+    """
+    _, version, count = FRAME_HEADER_STRUCT.unpack_from(frame, 0)
+    if version != WIRE_VERSION:
+        raise ValueError('Unsupported wire version {}'.format(version))
+    offset = FRAME_HEADER_STRUCT.size
+    for _ in range(count):
+        message_type, length = MESSAGE_HEADER_STRUCT.unpack_from(frame, offset)
+        offset += MESSAGE_HEADER_STRUCT.size
+        if offset + length > len(frame):
+            raise ValueError('Message exceeds frame')
+        yield message_type, offset, offset + length
+        offset += length
+
+
+def _decode_body(subject, frame, offset, intern_table=None) -> Message:
+    """
+    Deserialize body of message in binary format. Membership updates contain records
+    of other nodes, so they don't change wish master of shared instances.
+    :param subject: subject of message
+    :param frame: received bytes
+    :param offset: start of body
+    :param intern_table: table which resolves nodes to shared instances or None
+    :return: deserialized Message
+    """
+    if subject == DIGEST_MESSAGE:
+        node_key, version = DIGEST_STRUCT.unpack_from(frame, offset)
+        return Message(subject, None, version=version, node_key=node_key)
+    if subject == LEASE_MESSAGE:
+        node_key, term, stamp, echo, held, grant = LEASE_STRUCT.unpack_from(frame, offset)
+        return Message(subject, None, node_key=node_key, term=term, stamp=stamp, echo=echo,
+                       held=held, grant=bool(grant))
+    node_key = None
+    seq = None
+    if subject in INDIRECT_PROBE_SUBJECTS:
+        node_key = NODE_KEY_STRUCT.unpack_from(frame, offset)[0]
+        offset += NODE_KEY_STRUCT.size
+    elif subject in SEQUENCED_SUBJECTS:
+        seq = SEQ_STRUCT.unpack_from(frame, offset)[0]
+        offset += SEQ_STRUCT.size
+    version = VERSION_STRUCT.unpack_from(frame, offset)[0]
+    node_info, _ = node_information_from_bytes(frame, offset + VERSION_STRUCT.size,
+                                               intern_table,
+                                               update=subject not in MEMBERSHIP_SUBJECTS)
+    return Message(subject, node_info, version=version,
+                   node_key=node_info.node_key if node_key is None else node_key, seq=seq)
+
+
+def is_binary_frame(frame) -> bool:
+    """
+    Check if frame has binary wire format.
+    :param frame: received bytes
+    :return: True if frame starts with WIRE_MAGIC
+    """
+    return len(frame) > 0 and frame[0] == WIRE_MAGIC
+
+
+def announces_binary(frame) -> bool:
+    """
+    Check if sender of frame understands binary wire format.
+    :param frame: received bytes
+    :return: True if frame is binary or contains handshake with BINARY_WIRE_TAG
+    """
+    return is_binary_frame(frame) or BINARY_WIRE_TAG.encode(UTF_8) in frame
+
+
+def decode_frame(frame, intern_table: InternTable = None) -> [Message]:
+    """
+    Deserialize all messages of frame in binary or json format. Handshakes are
+    returned first, so sender is known before his other messages are handled. Binary
+    messages with unknown type tag are skipped.
+    :param frame: received bytes
+    :param intern_table: table which resolves nodes to shared instances or None
+    :return: list of messages
+    """
+    if not is_binary_frame(frame):
+        messages = [message_from_string(message, intern_table)
+                    for message in str(frame, UTF_8).split(MESSAGE_SEPARATOR)]
+        return [message for message in messages if message.subject == HANDSHAKE_MESSAGE] \
+               + [message for message in messages if message.subject != HANDSHAKE_MESSAGE]
+    entries = list(iter_frame(frame))
+    ordered = [entry for entry in entries if entry[0] == HANDSHAKE_TYPE] \
+              + [entry for entry in entries if entry[0] != HANDSHAKE_TYPE]
+    return [_decode_body(TYPE_TO_SUBJECT[message_type], frame, start, intern_table)
+            for message_type, start, _ in ordered if message_type in TYPE_TO_SUBJECT]
+
+
+def is_heartbeat_frame(frame) -> bool:
+    """
+    Check if frame contains only heartbeats and piggybacked membership updates, which
+    are repeated anyway and can be dropped under load. Frames which can't be decoded
+    count as heartbeats. Binary frames are checked by type tags and json frames by
+    subjects in front of JSON_SEPARATOR, so node information is not decoded.
+    :param frame: received bytes
+    :return: True if frame can be dropped
+    """
+    try:
+        if is_binary_frame(frame):
+            return all(TYPE_TO_SUBJECT.get(message_type) in HEARTBEAT_SUBJECTS
+                       for message_type, _, _ in iter_frame(frame))
+        return all(message.partition(JSON_SEPARATOR)[0] in HEARTBEAT_SUBJECTS
+                   for message in str(frame, UTF_8).split(MESSAGE_SEPARATOR))
+    except (ValueError, KeyError, IndexError, struct.error):
+        return True
 
 
 class MessageDict:
     """
     Dataclass is used as dictionary to know what messages will be send during next ping.
-    As an underlying data structure a dict which maps NodeInformation to a Queue of Strings is used
-    As format for node information json is used.
+    As an underlying data structure a dict which maps NodeInformation to PriorityLanes of
+    Messages is used. Each frame takes messages up to frame_budget bytes, control
+    messages first. As format for node information json is used until node announced that he
+    understands the binary wire format. If send_digests is set, default message to such
+    node contains only key and version of own information, as long as last default
+    message already contained current version. Control messages to nodes which understand
+    binary wire format are acknowledged and retransmitted until they are. Handshakes are
+    tracked to every node, because they negotiate the format. Json carries no sequence
+    number, so a handshake to a node which did not announce binary wire format yet is
+    retransmitted at most HANDSHAKE_RETRANSMISSIONS times, which covers the round trip
+    until node announces it. Nodes which only know json never acknowledge.
     """
 
-    def __init__(self, own_info : NodeInformation):
+    def __init__(self, own_info : NodeInformation, send_digests=False,
+                 frame_budget=FRAME_BUDGET):
         self.dict = dict()
+        self.frame_budget = frame_budget
         self.lock = threading.Lock()
         self.own_info = own_info
+        self.listeners = []
+        self.binary_nodes = set()
+        self.send_digests = send_digests
+        self.sent_versions = dict()
+        self.piggyback = None
+        self.lease = None
+        self.delivery = DeliveryTracker()
+        self.json_retransmissions = dict()
+
+    def add_listener(self, listener):
+        """
+        Register callable which is called with target node whenever a message was queued
+        for it. Used to flush urgent messages without waiting for next heartbeat.
+        :param listener: callable with target node as argument
+        :return: None
+        """
+        self.listeners.append(listener)
 
     def get_next_message(self, node_information: NodeInformation) -> str:
         """
@@ -36,28 +331,142 @@ class MessageDict:
         :param node_information: node to which messages will be send
         :return: concatenated messages separated by MESSAGE_SEPARATOR or default string
         """
-        if node_information in self.dict.keys():
-            if self.dict[node_information].empty():
-                return DEFAULT_MESSAGE + JSON_SEPARATOR + self.own_info.to_json()
-            copy = list(self.dict[node_information].queue)
-            with self.dict[node_information].mutex:
-                self.dict[node_information].queue.clear()
-            return MESSAGE_SEPARATOR.join(copy)
-        return DEFAULT_MESSAGE + JSON_SEPARATOR + self.own_info.to_json()
+        return MESSAGE_SEPARATOR.join(
+            encoded for _, encoded in self.__take_messages(node_information, message_to_string))
+
+    def get_next_frame(self, node_information: NodeInformation) -> bytes:
+        """
+        Return messages in Queue or default message as bytes. Format is binary if
+        node announced binary wire format otherwise json.
+        :param node_information: node to which messages will be send
+        :return: encoded frame
+        """
+        if node_information not in self.binary_nodes:
+            return self.get_next_message(node_information).encode(UTF_8)
+        taken = self.__take_messages(node_information, message_to_bytes)
+        encoded = [encoding for _, encoding in taken]
+        extra = []
+        if self.send_digests and [message for message, _ in taken] \
+                == [Message(DEFAULT_MESSAGE, self.own_info)]:
+            if self.sent_versions.get(node_information) == self.own_info.version:
+                encoded = []
+                extra.append(Message(DIGEST_MESSAGE, self.own_info))
+            else:
+                self.sent_versions[node_information] = self.own_info.version
+        if self.piggyback is not None:
+            extra.extend(self.piggyback())
+        if self.lease is not None:
+            lease_message = self.lease.message(node_information)
+            if lease_message is not None:
+                extra.append(lease_message)
+        return encoded_to_frame(encoded + [message_to_bytes(message) for message in extra])
 
-    def add_message_for_node(self, message: str, target: NodeInformation):
+    def set_piggyback(self, piggyback):
+        """
+        Register callable which returns list of messages that are appended to every
+        binary frame, e.g. membership updates.
+        :param piggyback: callable without arguments
+        :return: None
+        """
+        self.piggyback = piggyback
+
+    def set_lease(self, lease):
+        """
+        Register leader lease which adds a lease message for target to binary frames
+        whenever lease has to tell target something.
+        :param lease: instance of LeaderLease
+        :return: None
+        """
+        self.lease = lease
+
+    def nodes_with_messages(self) -> set:
+        """
+        :return: all nodes with at least one queued message
+        """
+        with self.lock:
+            return {node for node, lanes in self.dict.items() if not lanes.empty()}
+
+    def lane_depths(self) -> dict:
+        """
+        Number of queued messages per lane summed over all nodes, for monitoring.
+        :return: dict which maps each lane to queue depth
+        """
+        depths = dict.fromkeys(LANES, 0)
+        with self.lock:
+            for lanes in self.dict.values():
+                for lane, depth in lanes.depths().items():
+                    depths[lane] += depth
+        return depths
+
+    def enable_binary(self, node_information: NodeInformation):
+        """
+        Use binary wire format for all following messages to node.
+        :param node_information: node which announced binary wire format
+        :return: None
+        """
+        self.binary_nodes.add(node_information)
+
+    def understands_binary(self, node_information: NodeInformation) -> bool:
+        """
+        :param node_information: node to check
+        :return: True if node announced binary wire format
+        """
+        return node_information in self.binary_nodes
+
+    def forget_sent_version(self, node_information: NodeInformation):
+        """
+        Send full own information with next default message to node, because node
+        requested it.
+        :param node_information: node which has outdated information
+        :return: None
+        """
+        self.sent_versions.pop(node_information, None)
+
+    def add_state_request(self, own: NodeInformation, target: NodeInformation):
+        """
+        Ask target to send his full information, because received digest was outdated.
+        :param own: own node information that will be send in request
+        :param target: node which sent unknown digest
+        :return: None
+        """
+        self.add_message_for_node(Message(STATE_REQUEST_MESSAGE, own), target)
+
+    def __take_messages(self, node_information: NodeInformation, encode) -> list:
+        """
+        Remove messages of next frame from lanes of node. If lanes of node are empty
+        default message with own information is returned.
+        :param node_information: node to which messages will be send
+        :param encode: message_to_bytes or message_to_string
+        :return: list of tuples with message and its encoding
+        """
+        lanes = self.dict.get(node_information)
+        if lanes is not None and not lanes.empty():
+            taken = lanes.take(encode)
+            if node_information not in self.binary_nodes:
+                self.delivery.taken(node_information, [message for message, _ in taken])
+            return taken
+        default = Message(DEFAULT_MESSAGE, self.own_info)
+        return [(default, encode(default))]
+
+    def add_message_for_node(self, message, target: NodeInformation):
         """
         Add message to queue. If entry for node doesn't exists.
         Method is thread safe.
-        :param message: string that will be appended to queue
+        :param message: Message or string that will be appended to queue
         :param target: node which should receive message
         :return: None
         """
+        if isinstance(message, Message) and message.subject in CONTROL_SUBJECTS \
+                and message.seq is None \
+                and (target in self.binary_nodes or message.subject == HANDSHAKE_MESSAGE):
+            self.delivery.track(message, target)
         self.lock.acquire()
         if target not in self.dict.keys():
-            self.dict[target] = queue.Queue()
-        self.dict[target].put(message)
+            self.dict[target] = PriorityLanes(self.frame_budget)
+        self.dict[target].put(message_lane(message), message)
         self.lock.release()
+        for listener in self.listeners:
+            listener(target)
 
     def add_message_for_all_nodes(self, message: str):
         """
@@ -76,7 +485,7 @@ class MessageDict:
         """
         self.lock.acquire()
         if node not in self.dict.keys():
-            self.dict[node] = queue.Queue()
+            self.dict[node] = PriorityLanes(self.frame_budget)
         self.lock.release()
 
     def add_handshake_message(self, own: NodeInformation, target: NodeInformation):
@@ -86,42 +495,73 @@ class MessageDict:
         :param target: node which going to receive message
         :return: None
         """
-        self.add_message_for_node(HANDSHAKE_MESSAGE + JSON_SEPARATOR + own.to_json(), target)
+        self.add_message_for_node(Message(HANDSHAKE_MESSAGE, own), target)
+
+    def add_ack_message(self, own: NodeInformation, target: NodeInformation):
+        """
+        Answer probe of target.
+        :param own: own node information that will be send in answer
+        :param target: node which sent probe
+        :return: None
+        """
+        self.add_message_for_node(Message(ACK_MESSAGE, own), target)
 
     def add_dispatch_message(self, own_information: NodeInformation,
-                             node_information: synchronized_set.SynchronizedSet):
+                             node_information: synchronized_set.SynchronizedSet) -> Future:
         """
         Add dispatch message for target node in dictionary.
         :param own: own node information that will be send in dispatch message
         :param node_information: nodes which going to receive message
-        :return: None
+        :return: future which resolves if every node acknowledged dispatch message or
+        took it from queue if node does not acknowledge
         """
+        waiting = dict()
         for target in node_information:
-            self.add_message_for_node(
-                DISPATCH_MESSAGE + JSON_SEPARATOR + own_information.to_json(),
-                target)
+            message = Message(DISPATCH_MESSAGE, own_information)
+            self.add_message_for_node(message, target)
+            waiting[target] = message if message.seq is None else message.seq
+        return self.delivery.completion(waiting)
 
-    def wait_until_everybody_received(self, message):
+    def receive_control(self, message: Message) -> bool:
         """
-        Will stuck in a loop as long as the message is in at least one queue.
-        :param message: message that have to be send
+        Acknowledge sequenced control message and decide if it is handled. Duplicates
+        and messages after a gap are acknowledged but not handled.
+        :param message: received handshake or dispatch message
+        :return: True if message has to be handled
         """
-        while not self.check_if_all_get_message(message):
-            time.sleep(1)
-        time.sleep(3)
+        seq = UNSEQUENCED if message.seq is None else message.seq
+        accepted = self.delivery.accept(message.node_info, seq)
+        if seq != UNSEQUENCED:
+            self.add_message_for_node(
+                Message(CONTROL_ACK_MESSAGE, self.own_info,
+                        seq=self.delivery.handled(message.node_info)), message.node_info)
+        return accepted
 
-    def check_if_all_get_message(self, message):
+    def acknowledge(self, message: Message):
         """
-        Help method for wait_until_everybody_received
-        :param message: message that have to be send
-        :return: True if received else false
+        Mark control messages as delivered which are acknowledged by sender of message.
+        :param message: received acknowledge
+        :return: None
         """
-        all_get_message = True
-        for node in self.dict:
-            if message in self.dict[node].queue:
-                all_get_message = False
+        self.delivery.acknowledge(message.node_info, message.seq)
 
-        return all_get_message
+    def retransmit(self):
+        """
+        Queue control messages again whose acknowledge is overdue, unless they are
+        still queued and were not sent yet.
+        :return: None
+        """
+        for target, message in self.delivery.due_retransmissions():
+            lanes = self.dict.get(target)
+            if lanes is not None and lanes.holds_sequenced(message.subject, message.seq):
+                continue
+            if target not in self.binary_nodes:
+                retransmissions = self.json_retransmissions.get(target, 0)
+                if retransmissions >= HANDSHAKE_RETRANSMISSIONS:
+                    self.delivery.untrack(target, message.seq)
+                    continue
+                self.json_retransmissions[target] = retransmissions + 1
+            self.add_message_for_node(message, target)
 
     def delete_message_for_node(self, node_info: NodeInformation):
         """
@@ -131,8 +571,12 @@ class MessageDict:
         """
         self.lock.acquire()
         if node_info in self.dict.keys():
-            self.dict[node_info].queue.clear()
+            self.dict[node_info].clear()
+        self.binary_nodes.discard(node_info)
+        self.sent_versions.pop(node_info, None)
+        self.json_retransmissions.pop(node_info, None)
         self.lock.release()
+        self.delivery.forget(node_info)
 
     def clear(self):
         """
@@ -140,3 +584,6 @@ class MessageDict:
         :return: None
         """
         self.dict.clear()
+        self.binary_nodes.clear()
+        self.sent_versions.clear()
+        self.json_retransmissions.clear()
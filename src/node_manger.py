@@ -2,15 +2,24 @@
 Provides NodeManger which is responsible for events in network
 """
 import time
+from concurrent import futures
+from threading import Thread
 
 from synchronized_set import SynchronizedSet
 from observer import Observer
 
 from src.message_dict import MessageDict, DEFAULT_MESSAGE, DISPATCH_MESSAGE, \
-    JSON_SEPARATOR, HANDSHAKE_MESSAGE, MESSAGE_SEPARATOR
-from src.pinger import INCOMING_MESSAGE, CONNECTION_LOST, PingMan
+    HANDSHAKE_MESSAGE, DIGEST_MESSAGE, STATE_REQUEST_MESSAGE, ACK_MESSAGE, MEMBER_ALIVE, \
+    MEMBER_CONFIRM, MEMBER_LEFT, MEMBERSHIP_SUBJECTS, PING_REQUEST_MESSAGE, INDIRECT_ACK_MESSAGE, \
+    CONTROL_ACK_MESSAGE, CONTROL_SUBJECTS, LEASE_MESSAGE, decode_frame, announces_binary
+from src.pinger import INCOMING_MESSAGE, CONNECTION_LOST, TIME_TO_SEND_DISPATCH_MESSAGE, PingMan
 from src.handshake import NEW_ENTERING_NODE, Handshake
-from src.beans import NodeInformation, node_information_from_json
+from src.beans import NodeInformation, Message, UpdateValue, InternTable
+from src.gossip import GossipMembership
+from src.election_coalescer import ElectionCoalescer, ELECTION_WINDOW, ELECTION_MAX_DELAY
+from src.leader_lease import LeaderLease, LEASE_DURATION
+from src.node_metrics import MetricsSampler
+from src.node_registry import NodeRegistry, NodeSet, find_by_key
 from src.vote_strategy import VoteStrategy, NEW_MASTER, NO_MAJORITY_SHUTDOWN
 
 TIME_BETWEEN_HANDSHAKE = 2
@@ -19,6 +28,8 @@ TIME_BETWEEN_HANDSHAKE = 2
 class NodeManger(Observer):
     """
     Handel any kind of events lost node, dispatching, reentering or dispatching
+    Events and changed votes only request an election, which is coalesced with other
+    requests of a short window. Lease tells without network calls if own node is master.
     """
 
     def __init__(self, own_information: NodeInformation,
@@ -26,18 +37,32 @@ class NodeManger(Observer):
                  handshaker: Handshake,
                  message_dict: MessageDict,
                  connected: SynchronizedSet,
-                 vote_strategy: VoteStrategy):
+                 vote_strategy: VoteStrategy,
+                 membership: GossipMembership = None,
+                 registry: NodeRegistry = None,
+                 election_window=ELECTION_WINDOW,
+                 election_max_delay=ELECTION_MAX_DELAY,
+                 lease_duration=LEASE_DURATION,
+                 metrics_sampler: MetricsSampler = None):
         super(NodeManger, self).__init__()
         self.own_information = own_information
         self.ping_man = ping_man
         self.handshaker = handshaker
         self.message_dict = message_dict
         self.connected = connected
-        self.dispatched = SynchronizedSet(set())
-        self.lost = SynchronizedSet(set())
+        self.registry = registry if registry is not None else NodeRegistry()
+        self.dispatched = NodeSet(self.registry)
+        self.lost = NodeSet(self.registry)
+        self.peer_states = dict()
+        self.intern_table = InternTable(own_information)
+        self.membership = membership
         self.vote_strategy = vote_strategy
         self.master = None
         self.running = False
+        self.election = ElectionCoalescer(self.__elect, election_window, election_max_delay)
+        self.lease = LeaderLease(own_information, connected, self.lost, lease_duration)
+        self.message_dict.set_lease(self.lease)
+        self.metrics_sampler = metrics_sampler
 
     def start(self):
 
@@ -46,7 +71,10 @@ class NodeManger(Observer):
         After that will start pingman and handshaker
         :return: None
         """
+        if self.metrics_sampler is not None:
+            self.metrics_sampler.start()
         self.vote_strategy.calc_new_master(self.connected, self.dispatched, self.lost)
+        self.election.start()
         try:
             self.running = True
             time.sleep(TIME_BETWEEN_HANDSHAKE)
@@ -63,23 +91,48 @@ class NodeManger(Observer):
         """
         self.ping_man.kill()
         self.handshaker.kill()
+        self.election.stop()
+        self.__stop_sampler()
         self.running = False
 
     def dispatch(self):
         """
-        Will first end Handshake, then wait unit everybody received dispatch message
+        Will first end Handshake, then wait until everybody acknowledged dispatch message
         and then end pingman to ensure that everybody know that shutdown was wanted.
+        Waits at most TIME_TO_SEND_DISPATCH_MESSAGE seconds for acknowledges.
         :return: None
         """
         self.running = False
         self.handshaker.kill()
-        self.message_dict.add_dispatch_message(self.own_information, self.connected)
-        self.message_dict.wait_until_everybody_received(self.__own_dispatch_message())
+        self.election.stop()
+        self.__stop_sampler()
+        delivered = self.message_dict.add_dispatch_message(self.own_information, self.connected)
+        try:
+            delivered.result(TIME_TO_SEND_DISPATCH_MESSAGE)
+        except futures.TimeoutError:
+            print('{} not every node acknowledged dispatching'.format(self.own_information.name))
         self.connected.clear()
         self.ping_man.kill()
 
-    def __own_dispatch_message(self):
-        return DISPATCH_MESSAGE + JSON_SEPARATOR + self.own_information.to_json()
+    def __stop_sampler(self):
+        if self.metrics_sampler is not None:
+            self.metrics_sampler.stop()
+
+    def __elect(self):
+        """
+        Calculate master once for all changes since last election.
+        :return: None
+        """
+        self.vote_strategy.calc_new_master(self.connected, self.dispatched, self.lost)
+        self.lease.renew()
+
+    def __dispatch_in_background(self):
+        """
+        Dispatch in own thread, because handling of received frames has to go on
+        while dispatch waits for acknowledges.
+        :return: None
+        """
+        Thread(target=self.dispatch).start()
 
     def update(self, update_value):
         """
@@ -99,19 +152,23 @@ class NodeManger(Observer):
         elif event == NEW_MASTER:
             old_master, new_master = update_value.value
             self.master = new_master
+            self.lease.set_master(new_master)
         elif event == NO_MAJORITY_SHUTDOWN:
-            self.dispatch()
+            self.__dispatch_in_background()
 
     def __handle_connection_lost(self, new_value):
         """
         React to lost connection by remove from connected if not dispatched and
         add to lost. If more lost than connect will init dispatching process.
-        Otherwise will init start of new master calculation
+        Otherwise will request new master calculation
         :param new_value:
         :return:
         """
         lost_node = new_value.value
         self.message_dict.delete_message_for_node(lost_node)
+        self.peer_states.pop(lost_node.node_key, None)
+        self.lease.forget(lost_node)
+        self.ping_man.rtt.forget(lost_node)
         if lost_node in self.connected and lost_node not in self.dispatched:
             self.connected.remove(lost_node)
             self.lost.add(lost_node)
@@ -120,49 +177,131 @@ class NodeManger(Observer):
             print('{} dispatching because more lost than connected'.format(
                 self.own_information.name))
             if self.running:
-                self.dispatch()
+                self.__dispatch_in_background()
         else:
-            self.vote_strategy.calc_new_master(self.connected,
-                                               self.dispatched,
-                                               self.lost)
+            self.election.request()
 
     def __handle_messages(self, new_value):
         """
-        Will sort that handshakes will be handheld first to avoid missing
-        information. Each message will be handled by __handle_message.
-        :param new_value:
-        :return:
+        Will decode frame in binary or json format. Handshakes are decoded first
+        to avoid missing information. Senders are resolved to shared instances by intern
+        table. Each message will be handled
+        by __handle_message. If sender understands binary wire format it will be used
+        for messages to him.
+        :param new_value: update with received frame
+        :return: None
         """
-        messages = str(new_value.value).split(MESSAGE_SEPARATOR)
-        messages.sort(key=lambda x: x.startswith(HANDSHAKE_MESSAGE))
+        frame = new_value.value
+        messages = decode_frame(frame, self.intern_table)
+        if announces_binary(frame):
+            for message in messages:
+                if message.node_info is not None and message.subject not in MEMBERSHIP_SUBJECTS:
+                    self.message_dict.enable_binary(message.node_info)
         for message in messages:
             self.__handle_message(message)
 
-    def __handle_message(self, msg):
+    def __handle_message(self, message: Message):
         """
-        React to different type of messages.
-        :param msg: incoming messages
+        React to different type of messages. Digests are resolved by cached
+        information of sender. Each message counts as heartbeat of sender and answers
+        probes other nodes requested for sender. Control messages are acknowledged and
+        duplicates are dropped. Acknowledge of dispatch is send before sender is
+        removed. With gossip membership heartbeats are answered and membership updates
+        are applied. Lease messages are passed to lease and round trip times they
+        measured to rtt of PingMan.
+        :param message: incoming message
         :return: None
         """
-        subject = msg.split(JSON_SEPARATOR)[0]
-        if subject == DEFAULT_MESSAGE:
-            json = msg.split(JSON_SEPARATOR)[1]
-            node_info = node_information_from_json(json)
-            self.vote_strategy.vote_for(node_info, self.connected,
-                                        self.dispatched, self.lost)
-
-        json = msg.split(JSON_SEPARATOR)[1]
-        node_info = node_information_from_json(json)
-        if subject == DISPATCH_MESSAGE:
+        subject = message.subject
+        if subject in MEMBERSHIP_SUBJECTS:
+            self.__handle_membership_update(message)
+            return
+        if subject in CONTROL_SUBJECTS and not self.message_dict.receive_control(message):
+            return
+        if subject == LEASE_MESSAGE:
+            sender = find_by_key(self.connected, message.node_key)
+            if sender is not None:
+                rtt = self.lease.receive(sender, message)
+                if rtt is not None:
+                    self.ping_man.rtt.sample(sender, rtt)
+            return
+        if subject == DIGEST_MESSAGE:
+            node_info = self.__resolve_digest(message)
+            if node_info is None:
+                return
+            subject = DEFAULT_MESSAGE
+        else:
+            node_info = message.node_info
+            if message.version is not None:
+                self.peer_states[node_info.node_key] = (message.version, node_info)
+        self.ping_man.failure_detector.heartbeat(node_info)
+        self.ping_man.indirect_probe.heard_from(node_info)
+        if subject == DEFAULT_MESSAGE and self.membership is not None:
+            self.message_dict.add_ack_message(self.own_information, node_info)
+        if subject in (DEFAULT_MESSAGE, ACK_MESSAGE):
+            if self.vote_strategy.record_vote(node_info):
+                self.election.request()
+        elif subject == STATE_REQUEST_MESSAGE:
+            self.message_dict.forget_sent_version(node_info)
+        elif subject == PING_REQUEST_MESSAGE:
+            self.ping_man.indirect_probe.request(node_info, message.node_key,
+                                                 self.connected.copy())
+        elif subject == INDIRECT_ACK_MESSAGE:
+            target = self.ping_man.indirect_probe.acknowledge(message.node_key)
+            if target is not None:
+                self.ping_man.failure_detector.heartbeat(target)
+        elif subject == CONTROL_ACK_MESSAGE:
+            self.message_dict.acknowledge(message)
+        elif subject == DISPATCH_MESSAGE:
+            self.ping_man.flush(node_info)
             self.__handle_dispatch_msg(node_info)
             self.message_dict.delete_message_for_node(node_info)
+            self.peer_states.pop(node_info.node_key, None)
+            self.lease.forget(node_info)
+            self.ping_man.rtt.forget(node_info)
         elif subject == HANDSHAKE_MESSAGE:
             self.__handle_handshake_message(node_info)
 
+    def __handle_membership_update(self, update: Message):
+        """
+        Apply update of gossip membership and map it to connected, lost and dispatched.
+        Alive unknown nodes are added like by handshake, confirmed nodes are lost and
+        left nodes are dispatched.
+        :param update: update with member and incarnation
+        :return: None
+        """
+        if self.membership is None or not self.membership.apply(update):
+            return
+        node_info = update.node_info
+        if update.subject == MEMBER_ALIVE:
+            if node_info not in self.connected and node_info != self.own_information:
+                self.__handle_handshake_message(node_info)
+        elif update.subject == MEMBER_CONFIRM:
+            if node_info in self.connected:
+                self.__handle_connection_lost(UpdateValue(CONNECTION_LOST, node_info))
+        elif update.subject == MEMBER_LEFT:
+            if node_info in self.connected or node_info in self.lost:
+                self.__handle_dispatch_msg(node_info)
+
+    def __resolve_digest(self, message: Message):
+        """
+        Return cached information of sender if version of digest is known. Otherwise
+        sender is asked for his full information.
+        :param message: digest with key and version of sender
+        :return: cached information or None if outdated
+        """
+        cached = self.peer_states.get(message.node_key)
+        if cached is not None and cached[0] == message.version:
+            return cached[1]
+        node_info = find_by_key(self.connected, message.node_key)
+        if node_info is not None:
+            self.message_dict.add_state_request(self.own_information, node_info)
+        return None
+
     def __handle_handshake_message(self, node_info):
         """
         Add Node to connected and remove old node form dispatched if
-        new node has same name. After this will initiate calc of new master.
+        new node has same name. After this will request calc of new master.
         :param node_info: new node
         :return: None
         """
@@ -177,17 +316,17 @@ class NodeManger(Observer):
             self.dispatched.remove(node_info)
         if node_info in self.lost:
             self.lost.remove(node_info)
-        self.vote_strategy.calc_new_master(self.connected,
-                                           self.dispatched,
-                                           self.lost)
+        self.election.request()
 
     def __handle_dispatch_msg(self, node_info):
         """
-        Remove node from lost or connected and add to dispatch. Will also initiate calculation of new master
+        Remove node from lost or connected and add to dispatch. Will also request calculation of new master
         :param node_info: dispatching node
         :return: None
         """
         print('{} Dispatched from {}'.format(self.own_information.name, node_info.name))
+        if self.membership is not None:
+            self.membership.left(node_info)
         if node_info in self.connected:
             self.connected.remove(node_info)
         if node_info in self.lost:
@@ -197,11 +336,9 @@ class NodeManger(Observer):
             print('{} dispatching because more lost than connected'.format(
                 self.own_information.name))
             if self.running:
-                self.dispatch()
+                self.__dispatch_in_background()
         else:
-            self.vote_strategy.calc_new_master(self.connected,
-                                               self.dispatched,
-                                               self.lost)
+            self.election.request()
 
     def __remove_node_from_dispatch_if_same_name(self, node_info):
         """
@@ -217,15 +354,13 @@ class NodeManger(Observer):
     def __handle_entering_node(self, new_value):
         """
         Will add new node to connected, add handshake in message dict for new node and
-        initiate calculation of new master
+        request calculation of new master
         :param new_value: update with node
         :return: None
         """
-        node_info = new_value.value
+        node_info = self.intern_table.intern(new_value.value)
         if node_info != self.own_information:
             self.message_dict.add_handshake_message(own=self.own_information, target=node_info)
             self.__remove_node_from_dispatch_if_same_name(node_info)
             self.connected.add(node_info)
-            self.vote_strategy.calc_new_master(self.connected,
-                                               self.dispatched,
-                                               self.lost)
+            self.election.request()
@@ -0,0 +1,83 @@
+"""
+Provides sampling of own load and round trip times, which are advertised in heartbeats
+to elect the node with most headroom or closest to its peers as master.
+"""
+import os
+from threading import Thread, Event
+
+from src.beans import NodeMetrics, NO_RTT
+from src.rtt import RttTracker
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+METRICS_INTERVAL = 1.0
+PROC_STATM = '/proc/self/statm'
+
+
+def sample_metrics(inbound_pool=None, rtt: RttTracker = None) -> NodeMetrics:
+    """
+    Sample load average per cpu, resident memory, depth of inbound queue and summary
+    of round trip times. Values which can't be read on this platform are 0.
+    :param inbound_pool: InboundWorkerPool of node or None
+    :param rtt: RttTracker of node or None
+    :return: sampled metrics
+    """
+    try:
+        load_average = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        load_average = 0.0
+    queue_depth = 0 if inbound_pool is None else inbound_pool.metrics()['queue_depth']
+    rtt_median, rtt_p95 = (NO_RTT, NO_RTT) if rtt is None else rtt.summary()
+    return NodeMetrics(load_average, resident_memory(), queue_depth, rtt_median, rtt_p95)
+
+
+def resident_memory() -> int:
+    """
+    :return: resident memory of process in bytes, peak resident memory if current one
+    is unknown or 0
+    """
+    try:
+        with open(PROC_STATM, encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MetricsSampler:
+    """
+    Samples metrics in own thread every interval and passes them to publish.
+    """
+
+    def __init__(self, sample, publish, interval=METRICS_INTERVAL):
+        self.sample = sample
+        self.publish = publish
+        self.interval = interval
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Publish first sample and start thread.
+        :return: None
+        """
+        self.publish(self.sample())
+        self.stopped.clear()
+        self.thread = Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop thread after current sample.
+        :return: None
+        """
+        self.stopped.set()
+
+    def __run(self):
+        while not self.stopped.wait(self.interval):
+            self.publish(self.sample())
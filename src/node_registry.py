@@ -0,0 +1,286 @@
+"""
+Provides registry which assigns compact integer ids to nodes and synchronized sets of
+nodes which keep a bitmask of these ids, so membership tables and vote tallies can be
+compared and combined as integers instead of hashing every node.
+"""
+import heapq
+from threading import Lock
+
+from synchronized_set import SynchronizedSet
+
+from src.beans import NodeInformation
+
+MAX_NODES = 4096
+
+
+class NodeRegistry:
+    """
+    Assigns next free id to a node the first time it is seen, usually at handshake.
+    Ids are never reused, so a bitmask never refers to another node than the one it was
+    built for. Because of that registry is bounded: at most max_nodes different nodes are
+    registered during lifetime of a node and a restarted node counts again, because its
+    birthtime changed. Registering further nodes raises ValueError, so their frames are
+    dropped by inbound pool. Bitmasks and registry stay below max_nodes bits and entries.
+    Nodes can also be found by their node key, which identifies them on the wire.
+    Registering is thread safe, lookups are lock free.
+    """
+
+    def __init__(self, max_nodes=MAX_NODES):
+        self.max_nodes = max_nodes
+        self.ids = dict()
+        self.nodes = []
+        self.keys = dict()
+        self.lock = Lock()
+
+    def register(self, node_info: NodeInformation) -> int:
+        """
+        Return id of node and assign one if node is unknown.
+        :param node_info: node to register
+        :return: id of node
+        :raises ValueError: if node is unknown and max_nodes nodes are registered
+        """
+        node_id = self.ids.get(node_info)
+        if node_id is None:
+            with self.lock:
+                node_id = self.ids.get(node_info)
+                if node_id is None:
+                    node_id = len(self.nodes)
+                    if node_id >= self.max_nodes:
+                        raise ValueError('Registry is full with {} nodes, {} is not '
+                                         'registered'.format(self.max_nodes, node_info.name))
+                    self.nodes.append(node_info)
+                    self.keys[node_info.node_key] = node_info
+                    self.ids[node_info] = node_id
+        return node_id
+
+    def node(self, node_id) -> NodeInformation:
+        """
+        :param node_id: id assigned by registry
+        :return: node with id
+        """
+        return self.nodes[node_id]
+
+    def by_key(self, node_key) -> NodeInformation:
+        """
+        :param node_key: node key received in a message
+        :return: registered node with key or None if key is unknown
+        """
+        return self.keys.get(node_key)
+
+    def bit(self, node_info: NodeInformation) -> int:
+        """
+        :param node_info: node to register
+        :return: bitmask which contains only node
+        """
+        return 1 << self.register(node_info)
+
+    def mask_of(self, nodes) -> int:
+        """
+        :param nodes: NodeSet of this registry or any iterable of nodes
+        :return: bitmask of all nodes
+        """
+        if isinstance(nodes, NodeSet) and nodes.registry is self:
+            return nodes.mask
+        mask = 0
+        for node in nodes:
+            mask |= self.bit(node)
+        return mask
+
+    def nodes_of(self, mask) -> list:
+        """
+        :param mask: bitmask of ids
+        :return: nodes in mask ordered by id
+        """
+        return [self.nodes[node_id] for node_id in ids_of(mask)]
+
+
+class NodeIndex:
+    """
+    Min heap of nodes ordered by sort key and id with lazy deletion. Nodes are pushed
+    when they join and only dropped from live mask when they leave. Entries of left
+    nodes and outdated keys are popped when they reach top, so best node is found in
+    amortized constant time and joins and key updates take O(log n). Heap is rebuilt
+    if it holds more outdated entries than live ones. Methods are thread safe.
+    """
+
+    def __init__(self, registry: NodeRegistry, sort_key):
+        self.registry = registry
+        self.sort_key = sort_key
+        self.heap = []
+        self.keys = dict()
+        self.mask = 0
+        self.lock = Lock()
+
+    def sync(self, mask):
+        """
+        Index exactly the nodes in mask. Only nodes which joined or left since last sync
+        are touched.
+        :param mask: bitmask of live nodes
+        :return: None
+        """
+        with self.lock:
+            for node_id in ids_of(mask & ~self.mask):
+                self.__push(node_id)
+            for node_id in ids_of(self.mask & ~mask):
+                self.keys.pop(node_id)
+            self.mask = mask
+
+    def update(self, node_info: NodeInformation) -> bool:
+        """
+        Sort node again if its sort key changed.
+        :param node_info: indexed node
+        :return: True if node is indexed and its sort key changed
+        """
+        node_id = self.registry.register(node_info)
+        with self.lock:
+            if self.mask >> node_id & 1 and self.keys[node_id] != self.sort_key(node_info):
+                self.__push(node_id)
+                return True
+            return False
+
+    def best(self) -> NodeInformation:
+        """
+        :return: live node with lowest sort key or None if no node is indexed
+        """
+        with self.lock:
+            while self.heap:
+                key, node_id = self.heap[0]
+                if node_id in self.keys and self.keys[node_id] == key:
+                    return self.registry.node(node_id)
+                heapq.heappop(self.heap)
+            return None
+
+    def __push(self, node_id):
+        key = self.sort_key(self.registry.node(node_id))
+        self.keys[node_id] = key
+        heapq.heappush(self.heap, (key, node_id))
+        if len(self.heap) > 2 * len(self.keys) + 16:
+            self.heap = [(key, node_id) for node_id, key in self.keys.items()]
+            heapq.heapify(self.heap)
+
+
+def ids_of(mask):
+    """
+    :param mask: bitmask of ids
+    :return: generator of ids in mask in ascending order
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def count_nodes(mask) -> int:
+    """
+    :param mask: bitmask of ids
+    :return: number of nodes in mask
+    """
+    return bin(mask).count('1')
+
+
+def find_by_key(nodes, node_key):
+    """
+    Find node with node key in nodes. NodeSet resolves key by its registry, other
+    iterables are searched.
+    :param nodes: NodeSet or any iterable of nodes
+    :param node_key: node key received in a message
+    :return: node or None if no node in nodes has key
+    """
+    if isinstance(nodes, NodeSet):
+        node = nodes.registry.by_key(node_key)
+        return node if node is not None and node in nodes else None
+    return next((node for node in nodes if node.node_key == node_key), None)
+
+
+class NodeSet(SynchronizedSet):
+    """
+    SynchronizedSet of nodes which keeps bitmask of ids of its nodes in registry.
+    Mask is changed under same lock as set, so both always contain same nodes.
+    """
+
+    def __init__(self, registry: NodeRegistry, nodes=()):
+        nodes = list(nodes)
+        super().__init__(nodes)
+        self.registry = registry
+        self.mask = registry.mask_of(nodes)
+
+    def add(self, t: NodeInformation):
+        bit = self.registry.bit(t)
+        with self._lock:
+            set.add(self, t)
+            self.mask |= bit
+
+    def discard(self, t: NodeInformation):
+        with self._lock:
+            if set.__contains__(self, t):
+                set.discard(self, t)
+                self.mask &= ~self.registry.bit(t)
+
+    def remove(self, t: NodeInformation):
+        with self._lock:
+            set.remove(self, t)
+            self.mask &= ~self.registry.bit(t)
+
+    def pop(self) -> NodeInformation:
+        with self._lock:
+            node_info = set.pop(self)
+            self.mask &= ~self.registry.bit(node_info)
+            return node_info
+
+    def clear(self):
+        with self._lock:
+            set.clear(self)
+            self.mask = 0
+
+    def copy(self):
+        copy = NodeSet(self.registry)
+        with self._lock:
+            set.update(copy, self)
+            copy.mask = self.mask
+        return copy
+
+    def union(self, *others):
+        with self._lock:
+            nodes = set.union(self, *others)
+        return NodeSet(self.registry, nodes)
+
+    def symmetric_difference(self, ts):
+        with self._lock:
+            nodes = set.symmetric_difference(self, ts)
+        return NodeSet(self.registry, nodes)
+
+    def update(self, *others):
+        self.__change(set.update, *others)
+
+    def difference_update(self, *others):
+        self.__change(set.difference_update, *others)
+
+    def intersection_update(self, *others):
+        self.__change(set.intersection_update, *others)
+
+    def symmetric_difference_update(self, ts):
+        self.__change(set.symmetric_difference_update, ts)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+    def __change(self, change, *others):
+        with self._lock:
+            change(self, *others)
+            mask = 0
+            for node_info in set.__iter__(self):
+                mask |= self.registry.bit(node_info)
+            self.mask = mask
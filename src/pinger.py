@@ -1,13 +1,20 @@
 """
 Provides class responsible for send messages and check if target is still in network.
 """
-import struct
 import time
-from threading import Thread
+from threading import Thread, Event
 from socket import AF_INET, SOCK_STREAM, IPPROTO_TCP, SOMAXCONN, SHUT_RDWR, SO_REUSEADDR, \
-    socket, timeout, SOL_SOCKET
+    socket, SOL_SOCKET
 from synchronized_set import SynchronizedSet
 from observer import Observable
+from src.connection_pool import ConnectionPool, FrameReader
+from src.failure_detector import PhiAccrualFailureDetector
+from src.gossip import GossipMembership
+from src.heartbeat_scheduler import HeartbeatScheduler
+from src.inbound_pool import InboundWorkerPool
+from src.selector_loop import SelectorLoop
+from src.indirect_probe import IndirectProbe
+from src.rtt import RttTracker
 from src.message_dict import MessageDict
 from src.beans import NodeInformation, UpdateValue
 
@@ -21,39 +28,176 @@ SECOND_INTERVAL_PING_TRY = 0.1
 UTF_8 = 'utf8'
 
 
-def _read_number_of_bytes(sock, num_bytes_to_read):
-    data = bytearray()
-    while len(data) < num_bytes_to_read:
-        packet = sock.recv(num_bytes_to_read - len(data))
-        if not packet:
-            return None
-        data.extend(packet)
-    return data
+class PeerPipeline:
+    """
+    Sends messages to one node in an own thread. So a slow or dead node only
+    delays his own heartbeats and never heartbeats of other nodes.
+    """
+
+    def __init__(self, target: NodeInformation, send):
+        self.target = target
+        self.send = send
+        self.running = True
+        self.event = Event()
+        self.thread = Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def trigger(self):
+        """
+        Send next message to target as soon as last send is finished.
+        :return: None
+        """
+        self.event.set()
+
+    def stop(self):
+        """
+        End thread of pipeline after current send.
+        :return: None
+        """
+        self.running = False
+        self.event.set()
+
+    def is_alive(self) -> bool:
+        """
+        :return: True if pipeline is able to send further messages
+        """
+        return self.running and self.thread.is_alive()
 
+    def __run(self):
+        while True:
+            self.event.wait()
+            self.event.clear()
+            if not self.running:
+                break
+            self.send(self.target)
 
-class PingMan(Observable):
+
+class HeartbeatSender(Observable):
     """
-    Responsible for send messages and check if target is still in network.
+    Base class of PingMan and AsyncPingMan, which selects targets of heartbeats and
+    handles failed sends. Engines only differ in how they send, receive and wait.
+    Round trip times to targets are kept by rtt.
     """
 
     def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
-                 connected: SynchronizedSet):
+                 connected: SynchronizedSet, scheduler: HeartbeatScheduler = None,
+                 failure_detector: PhiAccrualFailureDetector = None,
+                 membership: GossipMembership = None,
+                 inbound_pool: InboundWorkerPool = None,
+                 rtt: RttTracker = None):
         super().__init__()
         self.own_information = own_information
         self.message_dict = message_dict
         self.connected = connected
-        self.server_socket_thread = Thread(target=self.__set_up_server_socket)
-        self.ping_thread = Thread(target=self.__send_ping_to_all)
+        self.scheduler = HeartbeatScheduler() if scheduler is None else scheduler
+        self.failure_detector = PhiAccrualFailureDetector() if failure_detector is None \
+            else failure_detector
+        self.membership = membership
+        self.indirect_probe = IndirectProbe(own_information, message_dict)
+        self.inbound_pool = InboundWorkerPool() if inbound_pool is None else inbound_pool
+        self.rtt = RttTracker() if rtt is None else rtt
+        self.message_dict.add_listener(self.scheduler.expedite)
         self.running = False
+        self.pipelines = dict()
+
+    def notify_connection_lost(self, target: NodeInformation):
+        """
+        Notify observers that target is lost without blocking sends.
+        :param target: lost node
+        :return: None
+        """
+        raise NotImplementedError("Warning: Used abstract class HeartbeatSender")
+
+    def due_targets(self) -> tuple:
+        """
+        Will retransmit unacknowledged control messages and notify Observer about nodes
+        which are suspected by failure detector and not reached by indirect probes of
+        other nodes. Syncs scheduler with nodes which get heartbeats.
+        :return: tuple of connected nodes and nodes whose heartbeat is due
+        """
+        copy = self.connected.copy()
+        self.message_dict.retransmit()
+        suspects = self.failure_detector.suspects(copy)
+        for target in self.indirect_probe.confirm(suspects, copy):
+            self.failure_detector.remove(target)
+            print('{} suspects {} as lost'.format(self.own_information.name, target.name))
+            self.notify_connection_lost(target)
+        self.scheduler.sync(self.__heartbeat_targets(copy))
+        return copy, self.scheduler.pop_due()
+
+    def keeps_trying(self, target: NodeInformation, ping_counter) -> bool:
+        """
+        :param target: target of send messages/ping
+        :param ping_counter: number of failed tries
+        :return: True if another try to send to target should be made
+        """
+        return self.running and target in self.connected and ping_counter < MAX_PING_TRY
+
+    def finish_send(self, target: NodeInformation, ping_counter) -> bool:
+        """
+        Schedule next heartbeat of target in any case, because lost nodes are detected
+        by failure detector.
+        :param target: target of send messages/ping
+        :param ping_counter: number of failed tries
+        :return: True if all tries failed and connection to target should be closed
+        """
+        gave_up = ping_counter == MAX_PING_TRY and target in self.connected
+        if gave_up:
+            print('{} could not send message to {}'.format(self.own_information.name,
+                                                           target.name))
+        if self.running and target in self.connected:
+            self.scheduler.schedule(target)
+        return gave_up
+
+    def __heartbeat_targets(self, connected) -> set:
+        """
+        All connected nodes get heartbeats. With gossip membership only probed nodes and
+        nodes with queued messages get one.
+        :param connected: currently connected nodes
+        :return: nodes which get heartbeats
+        """
+        if self.membership is None:
+            return connected
+        return self.membership.probe_targets(connected) \
+               | (self.message_dict.nodes_with_messages() & connected)
+
+
+class PingMan(HeartbeatSender):
+    """
+    Responsible for send messages and check if target is still in network. Server socket
+    and connections of other nodes are read by thread of selector loop, which is shared
+    with Handshake or owned by PingMan, so no thread is started per connection.
+    """
+
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 connected: SynchronizedSet, scheduler: HeartbeatScheduler = None,
+                 failure_detector: PhiAccrualFailureDetector = None,
+                 membership: GossipMembership = None,
+                 inbound_pool: InboundWorkerPool = None,
+                 selector_loop: SelectorLoop = None,
+                 rtt: RttTracker = None):
+        super().__init__(own_information, message_dict, connected, scheduler,
+                         failure_detector, membership, inbound_pool, rtt)
+        self.wake_event = Event()
+        self.scheduler.add_listener(self.wake_event.set)
+        self.ping_thread = Thread(target=self.__send_ping_to_all)
         self.server_socket = None
+        self.connection_pool = ConnectionPool()
+        self.in_sockets = SynchronizedSet(set())
+        self.selector_loop = SelectorLoop() if selector_loop is None else selector_loop
 
     def start(self):
         """
-        Start socket thread in which messages form other nodes are received
+        Register server socket at selector loop, in whose thread messages form other
+        nodes are received, and start send thread.
         :return: None
         """
         self.running = True
-        self.server_socket_thread.start()
+        self.inbound_pool.start(self.__notify_incoming_message)
+        self.selector_loop.acquire()
+        self.server_socket = self.__bind_server_socket()
+        self.server_socket.setblocking(False)
+        self.selector_loop.register(self.server_socket, self.__accept)
         self.ping_thread.start()
 
     def kill(self):
@@ -62,124 +206,135 @@ class PingMan(Observable):
         :return: None
         """
         self.running = False
+        self.wake_event.set()
+        self.inbound_pool.stop()
         if self.server_socket is not None:
+            self.selector_loop.unregister(self.server_socket)
+            for in_socket in self.in_sockets.copy():
+                self.selector_loop.unregister(in_socket)
+                in_socket.close()
+            self.selector_loop.release()
             try:
                 self.server_socket.shutdown(SHUT_RDWR)
             except OSError:
                 pass
             self.server_socket.close()
+        self.connection_pool.close_all()
 
-        if self.server_socket_thread.is_alive():
-            self.server_socket_thread.join()
+    def __bind_server_socket(self) -> socket:
+        """
+        :return: server socket which listens on own address
+        """
+        server_socket = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP)
+        server_socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        server_socket.bind(self.own_information.net_address.to_tuple())
+        server_socket.listen(SOMAXCONN)
+        return server_socket
 
-    def __set_up_server_socket(self):
+    def __accept(self, server_socket: socket):
         """
-        Bind server socket and wait for incoming connection from other node.
+        Accept incoming connection in thread of selector loop and watch it for frames.
+        :param server_socket: readable server socket
         :return: None
         """
         try:
-            self.server_socket = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP)
-            self.server_socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            self.server_socket.bind(self.own_information.net_address.to_tuple())
-            self.server_socket.listen(SOMAXCONN)
-
-            while self.running:
-                self.__recive_message()
-        finally:
-            self.server_socket.close()
+            in_socket, _ = server_socket.accept()
+        except (BlockingIOError, OSError):
+            return
+        in_socket.setblocking(False)
+        self.in_sockets.add(in_socket)
+        reader = FrameReader(in_socket)
+        self.selector_loop.register(in_socket, lambda sock: self.__read_available(sock, reader))
 
-    # TODO: Check if thread for update is more stable
-    def __recive_message(self):
+    def __read_available(self, in_socket: socket, reader: FrameReader):
         """
-        Accept incoming connection, read header with length and message.
-        Then will notify Observer about new message
+        Receive available bytes of readable connection in thread of selector loop and
+        pass all completed frames to inbound pool. Incomplete frames are kept by reader
+        until rest arrives.
+        :param in_socket: readable connection of other node
+        :param reader: reader of connection
         :return: None
         """
         try:
-            in_socket, _ = self.server_socket.accept()
-            Thread(target=self.__bla, args=(in_socket,)).start()
-        except timeout:
-            pass
+            open_connection = reader.receive()
         except OSError:
-            pass
-
-    def __bla(self, in_socket):
-        raw_msglen = _read_number_of_bytes(in_socket, 4)
-        if raw_msglen:
-            msg_len = struct.unpack('>I', raw_msglen)[0]
-            msg = _read_number_of_bytes(in_socket, msg_len)
-            if msg is not None:
-                msg = msg.decode(UTF_8)
-                if msg != '':
-                    self.notify(UpdateValue(INCOMING_MESSAGE, msg))
-        if in_socket is not None:
+            open_connection = False
+        frame = reader.next_frame()
+        while frame is not None:
+            if frame:
+                self.inbound_pool.submit(bytes(frame))
+            frame = reader.next_frame()
+        if not open_connection:
+            self.selector_loop.unregister(in_socket)
+            self.in_sockets.discard(in_socket)
             in_socket.close()
 
-    def __update_message(self, in_socket: socket):
-        """
-        Read length of message and then based on length bytes
-        rest of message
-        :param in_socket: socket of connection to other node
-        :return: None
-        """
-        raw_msglen = _read_number_of_bytes(in_socket, 4)
-        if raw_msglen:
-            msg_len = struct.unpack('>I', raw_msglen)[0]
-            msg = _read_number_of_bytes(in_socket, msg_len)
-            if msg is not None:
-                msg = msg.decode(UTF_8)
-                self.notify(UpdateValue(INCOMING_MESSAGE, msg))
-        in_socket.close()
-
     def __send_ping_to_target(self, target: NodeInformation):
         """
-        Take message from message dict and will make MAX_PING_TRY connection to
-        target node. If message could not be send, Observer will be notified by using
+        Take message from message dict and will make MAX_PING_TRY tries to send it
+        over the pooled connection to target node. Connection is reestablished by pool
+        after each failed try. Each try is bounded by connect and send timeout of pool.
         :param target: target of send messages/ping
         :return: None
         """
         target_address = target.net_address
         ping_counter = 0
-        suc_connected = False
-        message = self.message_dict.get_next_message(target)
-        message_with_header = struct.pack('>I', len(message)) + message.encode(UTF_8)
-        client_socket = None
-        while not suc_connected \
-                and self.running \
-                and target in self.connected \
-                and ping_counter < MAX_PING_TRY:
-
+        message = self.message_dict.get_next_frame(target)
+        while self.keeps_trying(target, ping_counter):
             try:
-                client_socket = socket(AF_INET, SOCK_STREAM, IPPROTO_TCP)
-                client_socket.connect(target_address.to_tuple())
-                client_socket.sendall(message_with_header)
-                suc_connected = True
-            except:
+                self.connection_pool.send(target_address, message)
+                break
+            except OSError:
                 ping_counter += 1
                 time.sleep(SECOND_INTERVAL_PING_TRY)
-            finally:
-                if client_socket is not None:
-                    client_socket.close()
 
-        if ping_counter == MAX_PING_TRY and target in self.connected:
-            print('{} could not send \n {}  \n to send to {}'.format(
-                self.own_information.name, message, target.name))
-            ping_thread = Thread(target=self.notify, args=(UpdateValue(CONNECTION_LOST, target),))
-            ping_thread.start()
+        if self.finish_send(target, ping_counter):
+            self.connection_pool.close(target_address)
+
+    def flush(self, target: NodeInformation):
+        """
+        Send queued messages to target immediately, even if target is not connected
+        any longer. Used to acknowledge dispatch message of target.
+        :param target: node with queued messages
+        :return: None
+        """
+        if self.running and target in self.message_dict.nodes_with_messages():
+            try:
+                self.connection_pool.send(target.net_address,
+                                          self.message_dict.get_next_frame(target))
+            except OSError:
+                pass
+
+    def __notify_incoming_message(self, frame: bytes):
+        self.notify(UpdateValue(INCOMING_MESSAGE, frame))
+
+    def notify_connection_lost(self, target: NodeInformation):
+        Thread(target=self.notify, args=(UpdateValue(CONNECTION_LOST, target),)).start()
 
     def __send_ping_to_all(self):
         """
-        Will send message/ping to all currently connected Nodes in Network.
-        Ping will be send for every Node in another Thread.
+        Will retransmit unacknowledged control messages and notify Observer about nodes
+        which are suspected by failure detector and not reached by indirect probes of
+        other nodes. Also trigger pipelines of all currently connected Nodes in Network whose
+        heartbeat is due by scheduler. Each connected Node keeps an own pipeline, so this
+        thread never waits for a send, and it is only stopped after node disconnected.
+        Sleeps until next heartbeat is due or an urgent message was queued.
         :return: None
         """
         while self.running:
-            copy = self.connected.copy()
-            ping_threads = []
-            for target in copy:
-                target_ping_thread = Thread(target=self.__send_ping_to_target, args=(target,))
-                ping_threads.append(target_ping_thread)
-                target_ping_thread.start()
-
-            for target_ping_thread in ping_threads:
-                target_ping_thread.join()
+            connected, due = self.due_targets()
+            for target in list(self.pipelines):
+                if target not in connected:
+                    self.pipelines.pop(target).stop()
+            for target in due:
+                pipeline = self.pipelines.get(target)
+                if pipeline is None or not pipeline.is_alive():
+                    pipeline = PeerPipeline(target, self.__send_ping_to_target)
+                    self.pipelines[target] = pipeline
+                pipeline.trigger()
+            self.wake_event.wait(self.scheduler.time_until_next())
+            self.wake_event.clear()
+
+        for pipeline in list(self.pipelines.values()):
+            pipeline.stop()
+        self.connection_pool.close_all()
@@ -0,0 +1,92 @@
+"""
+Provides queue of outgoing messages to one node with lanes of different priority, so
+urgent messages like handshakes and dispatching never wait behind a backlog of less
+important messages.
+"""
+from collections import deque
+from threading import Lock
+
+CONTROL_LANE = 'control'
+MEMBERSHIP_LANE = 'membership'
+BULK_LANE = 'bulk'
+LANES = [CONTROL_LANE, MEMBERSHIP_LANE, BULK_LANE]
+FRAME_BUDGET = 16 * 1024
+
+
+class PriorityLanes:
+    """
+    Messages are taken lane by lane in order of LANES until byte budget of one frame is
+    used. Every lane which is not empty gives at least its oldest message to each frame,
+    so lower lanes are not starved by higher ones and a message larger than budget is
+    sent anyway. Messages of one lane keep their order. Messages are encoded while they
+    are sized, so frame is built from the same encoding. Methods are thread safe.
+    """
+
+    def __init__(self, budget=FRAME_BUDGET):
+        self.budget = budget
+        self.lanes = {lane: deque() for lane in LANES}
+        self.lock = Lock()
+
+    def put(self, lane, message):
+        """
+        Append message to lane.
+        :param lane: one of LANES
+        :param message: message to queue
+        :return: None
+        """
+        with self.lock:
+            self.lanes[lane].append(message)
+
+    def take(self, encode) -> list:
+        """
+        Remove messages for next frame.
+        :param encode: callable which returns message encoded as bytes or string
+        :return: list of tuples with message and its encoding, higher lanes first
+        """
+        taken = []
+        remaining = self.budget
+        with self.lock:
+            for lane in LANES:
+                queued = self.lanes[lane]
+                first = True
+                while queued:
+                    encoded = encode(queued[0])
+                    if not first and len(encoded) > remaining:
+                        break
+                    taken.append((queued.popleft(), encoded))
+                    remaining -= len(encoded)
+                    first = False
+        return taken
+
+    def empty(self) -> bool:
+        """
+        :return: True if no lane contains a message
+        """
+        with self.lock:
+            return not any(self.lanes.values())
+
+    def depths(self) -> dict:
+        """
+        :return: dict which maps each lane to number of queued messages
+        """
+        with self.lock:
+            return {lane: len(queued) for lane, queued in self.lanes.items()}
+
+    def clear(self):
+        """
+        Drop all queued messages.
+        :return: None
+        """
+        with self.lock:
+            for queued in self.lanes.values():
+                queued.clear()
+
+    def holds_sequenced(self, subject, seq) -> bool:
+        """
+        :param subject: subject of control message
+        :param seq: sequence number of control message
+        :return: True if message with subject and sequence number is queued
+        """
+        with self.lock:
+            return any(message.subject == subject and message.seq == seq
+                       for queued in self.lanes.values() for message in queued)
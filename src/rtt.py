@@ -0,0 +1,75 @@
+"""
+Provides tracking of round trip times to peers, which are measured by echoed
+timestamps of lease messages.
+"""
+from collections import deque
+from threading import Lock
+
+from src.beans import NodeInformation, NO_RTT
+
+RTT_WINDOW = 16
+
+
+class RttTracker:
+    """
+    Keeps last window round trip times per peer. Round trip time of a peer is median of
+    its samples, so single delayed frames do not count. Summary over peers is advertised
+    in heartbeats. Methods are thread safe.
+    """
+
+    def __init__(self, window=RTT_WINDOW):
+        self.window = window
+        self.samples = dict()
+        self.lock = Lock()
+
+    def sample(self, node_info: NodeInformation, rtt):
+        """
+        Store measured round trip time.
+        :param node_info: peer
+        :param rtt: round trip time in seconds
+        :return: None
+        """
+        with self.lock:
+            samples = self.samples.get(node_info)
+            if samples is None:
+                samples = self.samples[node_info] = deque(maxlen=self.window)
+            samples.append(rtt)
+
+    def rtt_of(self, node_info: NodeInformation):
+        """
+        :param node_info: peer
+        :return: median round trip time to peer or None if it was not measured
+        """
+        with self.lock:
+            samples = self.samples.get(node_info)
+            return None if not samples else percentile(samples, 0.5)
+
+    def forget(self, node_info: NodeInformation):
+        """
+        Drop samples of peer, because it is lost or dispatched.
+        :param node_info: peer
+        :return: None
+        """
+        with self.lock:
+            self.samples.pop(node_info, None)
+
+    def summary(self) -> tuple:
+        """
+        :return: tuple of median and 95th percentile of round trip times of all peers or
+        NO_RTT twice if no peer was measured
+        """
+        with self.lock:
+            rtts = [percentile(samples, 0.5) for samples in self.samples.values() if samples]
+        if not rtts:
+            return NO_RTT, NO_RTT
+        return percentile(rtts, 0.5), percentile(rtts, 0.95)
+
+
+def percentile(values, fraction):
+    """
+    :param values: non empty iterable of numbers
+    :param fraction: percentile between 0 and 1
+    :return: value at percentile by nearest rank, for median the upper one
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
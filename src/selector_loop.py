@@ -0,0 +1,98 @@
+"""
+Provides loop which waits in one thread for all readable sockets of a node with
+selectors, which uses epoll on linux, instead of one blocking thread per socket.
+"""
+import selectors
+from socket import socketpair
+from threading import Thread, Lock, current_thread
+
+SELECT_TIMEOUT = 0.5
+SECONDS_WAIT_FOR_LOOP = 5
+
+
+class SelectorLoop:
+    """
+    Shared by PingMan and Handshake, so listening socket, connections of other nodes
+    and broadcast socket are served by one thread. Callbacks are called in loop thread
+    and must not block. Loop is stopped when last user released it.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.wake_reader, self.wake_writer = socketpair()
+        self.wake_reader.setblocking(False)
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, self.__clear_wake_up)
+        self.thread = Thread(target=self.__run, daemon=True)
+        self.lock = Lock()
+        self.users = 0
+        self.running = False
+
+    def acquire(self):
+        """
+        Register user of loop and start loop thread if not running.
+        :return: None
+        """
+        with self.lock:
+            self.users += 1
+            if not self.running:
+                self.running = True
+                self.thread.start()
+
+    def release(self):
+        """
+        Unregister user of loop. Last user stops the loop and closes selector.
+        :return: None
+        """
+        with self.lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            self.running = False
+        self.__wake_up()
+        if self.thread is not current_thread():
+            self.thread.join(SECONDS_WAIT_FOR_LOOP)
+
+    def register(self, sock, callback):
+        """
+        Call callback with sock whenever sock is readable. Sock should be non blocking.
+        :param sock: socket to watch
+        :param callback: callable with socket as argument
+        :return: None
+        """
+        self.selector.register(sock, selectors.EVENT_READ, callback)
+        self.__wake_up()
+
+    def unregister(self, sock):
+        """
+        Stop watching sock. Sock is not closed.
+        :param sock: watched socket
+        :return: None
+        """
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def __wake_up(self):
+        try:
+            self.wake_writer.send(b'\0')
+        except OSError:
+            pass
+
+    def __clear_wake_up(self, sock):
+        try:
+            while sock.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __run(self):
+        try:
+            while self.running:
+                for key, _ in self.selector.select(SELECT_TIMEOUT):
+                    if key.fileobj in self.selector.get_map():
+                        key.data(key.fileobj)
+        finally:
+            self.selector.close()
+            self.wake_reader.close()
+            self.wake_writer.close()
@@ -1,58 +1,180 @@
 """
-Provides abstract template Strategy and two implementations for
+Provides abstract template Strategy and implementations for
 handling incoming votes and calculate new master.
 """
-from collections import Counter
+import time
 from synchronized_set import SynchronizedSet
 from threading import Lock
 from observer import Observable
-from src.beans import NodeInformation, UpdateValue
+from src.beans import NodeInformation, NodeMetrics, UpdateValue, NO_TERM, NO_RTT
 from src.message_dict import MessageDict
+from src.node_registry import NodeRegistry, NodeIndex, count_nodes, ids_of
 
 NEW_MASTER = 'NEW_MASTER'
 VOTE_FOR = 'VOTE_FOR'
 NO_MAJORITY_SHUTDOWN = 'NO_MAJORITY_SHUTDOWN'
 SECONDS_WAIT_FOR_VOTES = 5
+NO_VOTE = -1
+LOAD_STEP = 0.25
+HYSTERESIS_STEPS = 2
+QUEUE_WEIGHT = 0.05
+RSS_PER_LOAD = 1024 ** 3
+UNKNOWN_LEVEL = 1 << 31
+RTT_STEP = 0.002
+RTT_MEDIAN = 'median'
+RTT_P95 = 'p95'
+
+
+class VoteTally:
+    """
+    Counts votes per candidate incrementally. Candidates are kept in buckets by their
+    number of votes, so changing one vote and finding the leader take constant time.
+    Of candidates with equal votes the one which reached that number first leads.
+    Version is increased by every change, so callers can skip unchanged tallies.
+    """
+
+    def __init__(self):
+        self.votes = dict()
+        self.counts = dict()
+        self.buckets = dict()
+        self.max_count = 0
+        self.version = 0
+
+    def set_vote(self, voter, candidate) -> bool:
+        """
+        :param voter: id of voting node
+        :param candidate: id of voted node or NO_VOTE
+        :return: True if vote changed
+        """
+        if voter in self.votes:
+            if self.votes[voter] == candidate:
+                return False
+            self.__decrement(self.votes[voter])
+        self.votes[voter] = candidate
+        self.__increment(candidate)
+        self.version += 1
+        return True
+
+    def remove_vote(self, voter):
+        """
+        :param voter: id of node whose vote is dropped
+        :return: None
+        """
+        if voter in self.votes:
+            self.__decrement(self.votes.pop(voter))
+            self.version += 1
+
+    def vote_of(self, voter):
+        """
+        :param voter: id of voting node
+        :return: id of candidate, NO_VOTE or None if node did not vote
+        """
+        return self.votes.get(voter)
+
+    def leader(self) -> tuple:
+        """
+        :return: tuple of id of candidate with most votes and his votes or None and 0
+        """
+        if self.max_count == 0:
+            return None, 0
+        return next(iter(self.buckets[self.max_count])), self.max_count
+
+    def margin(self) -> int:
+        """
+        :return: votes of leader minus votes of runner-up
+        """
+        if self.max_count == 0 or len(self.buckets[self.max_count]) > 1:
+            return 0
+        return self.max_count - max((count for count in self.buckets
+                                     if count < self.max_count), default=0)
+
+    def __increment(self, candidate):
+        count = self.counts.get(candidate, 0)
+        if count:
+            self.__leave_bucket(candidate, count)
+        self.counts[candidate] = count + 1
+        self.buckets.setdefault(count + 1, dict())[candidate] = None
+        self.max_count = max(self.max_count, count + 1)
+
+    def __decrement(self, candidate):
+        count = self.counts[candidate]
+        self.__leave_bucket(candidate, count)
+        if count == self.max_count and count not in self.buckets:
+            self.max_count = count - 1
+        if count > 1:
+            self.counts[candidate] = count - 1
+            self.buckets.setdefault(count - 1, dict())[candidate] = None
+        else:
+            self.counts.pop(candidate)
+
+    def __leave_bucket(self, candidate, count):
+        bucket = self.buckets[count]
+        bucket.pop(candidate)
+        if not bucket:
+            self.buckets.pop(count)
 
 
 class VoteStrategy(Observable):
     """
     Abstract class which provides the template for calculate wish
     master and new master based on votes from all Nodes of Network.
-    Also notify observer (NodeManger) about changes
+    Also notify observer (NodeManger) about changes.
+    Votes map id of voter to id of his wish master in registry and nodes which voted
+    are kept as bitmask, so checking if every connected node voted compares integers.
+    Votes are tallied incrementally and master is only evaluated again if a vote or
+    connected nodes changed, so an unchanged heartbeat costs constant time.
+    Own and connected nodes are kept in an index ordered by sort_key of strategy, so
+    best node is found without sorting all nodes.
+    Votes are cast in terms. A node changes its own vote only by starting next term and
+    votes at most once per term. Votes of an older term are discarded and a vote of a
+    newer term makes node join that term, drop all older votes and cast its vote again.
+    So master is only evaluated on votes of the same view and is notified at most once
+    per term, which stats of current term make measurable.
     """
 
-    def __init__(self, own_information: NodeInformation, message_dict: MessageDict):
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 registry: NodeRegistry = None, clock=time.monotonic):
         super().__init__()
         self.own_information = own_information
         self.message_dict = message_dict
+        self.registry = registry if registry is not None else NodeRegistry()
         self.node_manager = None
-        self.voting_dict = dict()
+        self.index = NodeIndex(self.registry, self.sort_key)
+        self.tally = VoteTally()
+        self.voters = 0
+        self.best_for = None
+        self.evaluated = None
+        self.clock = clock
+        self.term = 0
+        self.term_started = clock()
+        self.convergence = None
+        self.transitions = 0
+        self.stale_votes = 0
+        self.master = None
         self.lock = Lock()
 
     def calc_new_master(self, connected: SynchronizedSet, lost: SynchronizedSet,
                         dispatched: SynchronizedSet):
         """
         calculate new master by using template method. Then will add
-        wish master to voting dict and set votes to own information so
+        wish master to votes and set votes to own information so
         other nodes will get info during default message
         :param connected: set of currently connected nodes
         :param lost: set of currently lost node
         :param dispatched: set of currently dispatched nodes
         :return: None
         """
-        all_nodes = SynchronizedSet({self.own_information}).union(connected)
-        voted_for = self.get_best_node(all_nodes)
+        connected_mask = self.registry.mask_of(connected)
+        voted_for = self.best_node(connected_mask)
         self.lock.acquire()
-        self.voting_dict[self.own_information] = voted_for
-        self.own_information.wish_master = voted_for
+        self.__cast_own_vote(voted_for, connected_mask)
         self.lock.release()
         self.__remove_dead_votes_and_eval(connected, dispatched, lost)
 
     def vote_for(self, send_information, connected: SynchronizedSet, lost: SynchronizedSet,
                  dispatched: SynchronizedSet):
         """
-        Handle incoming vote by adding vote to voting dict and calculate master
+        Handle incoming vote by adding vote to votes and calculate master
         and add own wish to dict.
         :param send_information: Node who send vote
         :param voted_node: Node which was voted
@@ -61,16 +183,136 @@ class VoteStrategy(Observable):
         :param dispatched: Set of Nodes which are dispatched
         :return: None
         """
-        his_wish_master = send_information.wish_master
-
         self.lock.acquire()
-        self.voting_dict[send_information] = his_wish_master
+        self.__accept_vote(send_information)
         self.lock.release()
         self.__remove_dead_votes_and_eval(connected, dispatched, lost)
 
-    def get_best_node(self, nodes: [NodeInformation]) -> NodeInformation:
+    def record_vote(self, send_information) -> bool:
+        """
+        Store incoming vote without calculating master, so elections can be coalesced.
+        Sender is sorted again if information he sent changed his sort key.
+        :param send_information: Node who send vote
+        :return: True if votes or sort key of sender changed
+        """
+        self.lock.acquire()
+        version = self.tally.version
+        self.__accept_vote(send_information)
+        changed = version != self.tally.version
+        self.lock.release()
+        return self.index.update(send_information) or changed
+
+    def election_stats(self) -> dict:
+        """
+        :return: dict with current term, seconds from start of term until master was
+        decided or None, number of master changes in term and discarded votes
+        """
+        with self.lock:
+            return {'term': self.term, 'convergence': self.convergence,
+                    'transitions': self.transitions, 'stale_votes': self.stale_votes}
+
+    def sort_key(self, node: NodeInformation):
+        """
+        Key by which nodes are ordered, node with lowest key is best node. Strategies
+        implement it to reuse index of live nodes. Keys of senders of votes are checked
+        by record_vote, if key of node changes otherwise strategy has to call
+        index.update with node.
+        :param node: node to order
+        :return: comparable key
+        """
         raise NotImplementedError("Warning: Used abstract class VoteStrategy")
 
+    def get_best_node(self, nodes: [NodeInformation]) -> NodeInformation:
+        """
+        Select node with lowest sort key.
+        :param nodes: all nodes in network
+        :return: best node
+        """
+        return min(nodes, key=self.sort_key)
+
+    def best_node(self, connected_mask) -> NodeInformation:
+        """
+        Select best node of own and connected nodes by index. Strategies which override
+        get_best_node instead of sort_key are asked with all nodes.
+        :param connected_mask: bitmask of connected nodes
+        :return: best node
+        """
+        all_mask = connected_mask | self.registry.bit(self.own_information)
+        if type(self).get_best_node is not VoteStrategy.get_best_node:
+            return self.get_best_node(self.registry.nodes_of(all_mask))
+        self.index.sync(all_mask)
+        return self.index.best()
+
+    def __add_vote(self, voter: NodeInformation, wish_master: NodeInformation) -> int:
+        """
+        Store vote by ids. Lock must be held.
+        :param voter: node which voted
+        :param wish_master: node which was voted or None
+        :return: id of wish master or NO_VOTE
+        """
+        voter_id = self.registry.register(voter)
+        vote = self.__vote_id(wish_master)
+        self.tally.set_vote(voter_id, vote)
+        self.voters |= 1 << voter_id
+        return vote
+
+    def __accept_vote(self, voter: NodeInformation):
+        """
+        Store vote of other node if it belongs to current term. Lock must be held.
+        Votes of nodes which do not know terms always count for current term.
+        :param voter: node which voted
+        :return: None
+        """
+        term = voter.term
+        voter_id = self.registry.register(voter)
+        if term != NO_TERM:
+            if term < self.term:
+                self.stale_votes += 1
+                return
+            if term > self.term:
+                self.__start_term(term)
+                if self.best_for is not None:
+                    self.__add_vote(self.own_information, self.own_information.wish_master)
+                    self.own_information.term = term
+            elif self.voters >> voter_id & 1 \
+                    and self.tally.vote_of(voter_id) != self.__vote_id(voter.wish_master):
+                self.stale_votes += 1
+                return
+        self.__add_vote(voter, voter.wish_master)
+
+    def __cast_own_vote(self, voted_for: NodeInformation, connected_mask):
+        """
+        Store own vote for view of connected nodes. A changed vote starts next term.
+        Lock must be held.
+        :param voted_for: best node of view
+        :param connected_mask: bitmask of connected nodes
+        :return: None
+        """
+        own_id = self.registry.register(self.own_information)
+        if self.voters >> own_id & 1 and self.tally.vote_of(own_id) != self.__vote_id(voted_for):
+            self.__start_term(self.term + 1)
+        self.__add_vote(self.own_information, voted_for)
+        self.best_for = connected_mask
+        self.own_information.term = self.term
+        self.own_information.wish_master = voted_for
+
+    def __start_term(self, term):
+        """
+        Drop all votes of previous term. Lock must be held.
+        :param term: new term
+        :return: None
+        """
+        self.term = term
+        self.term_started = self.clock()
+        self.convergence = None
+        self.transitions = 0
+        for node_id in ids_of(self.voters):
+            self.tally.remove_vote(node_id)
+        self.voters = 0
+
+    def __vote_id(self, wish_master: NodeInformation) -> int:
+        return NO_VOTE if wish_master is None else self.registry.register(wish_master)
+
     def __remove_dead_votes_and_eval(self, connected: SynchronizedSet,
                                      dispatched: SynchronizedSet,
                                      lost: SynchronizedSet):
@@ -82,17 +324,17 @@ class VoteStrategy(Observable):
         :param dispatched: Set of Nodes which are dispatched
         :return:
         """
-        for node in lost:
-            if node in self.voting_dict:
-                self.voting_dict.pop(node)
-        for node in dispatched:
-            if node in self.voting_dict:
-                self.voting_dict.pop(node)
+        self.lock.acquire()
+        dead = (self.registry.mask_of(lost) | self.registry.mask_of(dispatched)) & self.voters
+        self.voters &= ~dead
+        for node_id in ids_of(dead):
+            self.tally.remove_vote(node_id)
+        self.lock.release()
         self.check_if_enough_votes_and_calc_master(connected)
 
     def check_if_enough_votes_and_calc_master(self, connected):
         """
-        First check if votes from all connected nodes are in dict and
+        First check if votes of current term from all connected nodes are known and
         will then calculate the majority. If majority is not absolute,
         observer get a shutdown notification if in minority. Else
         will notify observer about new master
@@ -100,35 +342,61 @@ class VoteStrategy(Observable):
         :return: None
         """
 
-        if SynchronizedSet(list(self.voting_dict)).issuperset(connected):
+        connected_mask = self.registry.mask_of(connected)
+        if connected_mask & ~self.voters == 0:
 
-            all_nodes = SynchronizedSet({self.own_information}).union(connected)
-            voted_for = self.get_best_node(all_nodes)
+            view_changed = connected_mask != self.best_for
+            if view_changed:
+                voted_for = self.best_node(connected_mask)
             self.lock.acquire()
-            self.voting_dict[self.own_information] = voted_for
+            if view_changed:
+                self.__cast_own_vote(voted_for, connected_mask)
+            state = (self.term, connected_mask, self.tally.version)
+            unchanged = state == self.evaluated or connected_mask & ~self.voters != 0
+            self.evaluated = state
+            own_vote = self.tally.vote_of(self.registry.register(self.own_information))
+            most_voted_id, vote_count = self.tally.leader()
             self.lock.release()
+            if unchanged:
+                return
 
-            occurrence_count = Counter(list(self.voting_dict.values()))
-            most_voted = occurrence_count.most_common(1)[0][0]
-            vote_count = occurrence_count.most_common(1)[0][1]
+            most_voted = None if most_voted_id == NO_VOTE else self.registry.node(most_voted_id)
+            all_mask = connected_mask | self.registry.bit(self.own_information)
 
-            if vote_count < len(all_nodes) / 2:
+            if vote_count < count_nodes(all_mask) / 2:
 
-                if self.voting_dict[self.own_information] != most_voted:
+                if own_vote != most_voted_id:
                     self.notify(UpdateValue(NO_MAJORITY_SHUTDOWN))
                 else:
                     self.notify_vote(most_voted)
             else:
                 self.notify_vote(most_voted)
+                nodes = count_nodes(all_mask)
+                if nodes > 1 and vote_count > nodes / 2 and most_voted is not None:
+                    self.agreed(most_voted)
+
+    def agreed(self, master):
+        """
+        Called after an absolute majority of more than one node decided master in
+        current term. Strategies which prefer the incumbent in later terms override it.
+        :param master: master decided by majority
+        :return: None
+        """
 
     def notify_vote(self, most_voted):
         """
         Send update to observer with lock to avoid multiple executions of python scripts.
+        Observer is only notified if winner differs from last notified master.
         :param most_voted: winner of election
         :return: None
         """
         self.lock.acquire()
-        self.notify(UpdateValue(NEW_MASTER, (self.node_manager.master, most_voted)))
+        if self.convergence is None:
+            self.convergence = self.clock() - self.term_started
+        if most_voted != self.master:
+            self.master = most_voted
+            self.transitions += 1
+            self.notify(UpdateValue(NEW_MASTER, (self.node_manager.master, most_voted)))
         self.lock.release()
 
 
@@ -137,13 +405,13 @@ class PortStrategy(VoteStrategy):
     Implementation of abstract class.
     """
 
-    def get_best_node(self, nodes: [NodeInformation]) -> NodeInformation:
+    def sort_key(self, node: NodeInformation):
         """
         Select new wish_master by lowest number of PORT
-        :param nodes: all nodes in network
-        :return: None
+        :param node: node to order
+        :return: port of node
         """
-        return sorted(nodes, key=lambda node: node.net_address.port)[0]
+        return node.net_address.port
 
 
 class TimeStrategy(VoteStrategy):
@@ -151,10 +419,137 @@ class TimeStrategy(VoteStrategy):
     Implementation of abstract class.
     """
 
-    def get_best_node(self, nodes: [NodeInformation]) -> NodeInformation:
+    def sort_key(self, node: NodeInformation):
         """
         Select new wish_master by earliest time of initialisation
-        :param nodes: all nodes in network
+        :param node: node to order
+        :return: birthtime of node
+        """
+        return node.birthtime
+
+
+class MetricsStrategy(VoteStrategy):
+    """
+    Abstract class for strategies which select node by metrics advertised in heartbeats.
+    Subclasses quantize metrics to a level, so small fluctuations neither change the
+    vote nor the advertised information. Incumbent is ranked HYSTERESIS_STEPS levels
+    better, so it is only replaced by a clearly better node. Incumbent is the master an
+    absolute majority of several nodes agreed on in a completed term, so every node
+    prefers the same node and a node which elected itself while alone prefers nobody.
+    Earliest time of initialisation and port decide between nodes of equal level, so
+    every node which knows same metrics selects same node. Nodes which advertise no
+    metrics are not eligible as long as another node is.
+    """
+
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 registry: NodeRegistry = None, clock=time.monotonic):
+        super().__init__(own_information, message_dict, registry, clock)
+        self.incumbent = None
+
+    def level(self, metrics: NodeMetrics) -> int:
+        """
+        Quantize metrics of node, higher level means worse master.
+        :param metrics: advertised metrics or None
+        :return: level or UNKNOWN_LEVEL if metrics are unknown
+        """
+        raise NotImplementedError("Warning: Used abstract class MetricsStrategy")
+
+    def sort_key(self, node: NodeInformation):
+        """
+        Select new wish_master by lowest level of metrics.
+        :param node: node to order
+        :return: tuple of level, birthtime and port of node
+        """
+        level = self.level(node.metrics)
+        if node == self.incumbent:
+            level -= HYSTERESIS_STEPS
+        return level, node.birthtime, node.net_address.port
+
+    def publish_metrics(self, metrics: NodeMetrics) -> bool:
+        """
+        Advertise own metrics in heartbeats if their level changed and request
+        election, because own node may no longer be best node.
+        :param metrics: sampled own metrics
+        :return: True if advertised metrics changed
+        """
+        if self.own_information.metrics is not None \
+                and self.level(metrics) == self.level(self.own_information.metrics):
+            return False
+        self.own_information.metrics = metrics
+        if self.index.update(self.own_information) and self.node_manager is not None:
+            self.node_manager.election.request()
+        return True
+
+    def agreed(self, master):
+        """
+        Make master incumbent and sort old and new incumbent again, because hysteresis
+        depends on incumbent.
+        :param master: master decided by majority
         :return: None
         """
-        return sorted(nodes, key=lambda node: node.birthtime)[0]
+        old_incumbent = self.incumbent
+        self.incumbent = master
+        if master != old_incumbent:
+            for node in (old_incumbent, master):
+                if node is not None:
+                    self.index.update(node)
+
+
+class LoadStrategy(MetricsStrategy):
+    """
+    Implementation of abstract class which selects node with most headroom. Load of a
+    node is scored by load average, queue depth and memory in steps of LOAD_STEP.
+    """
+
+    def level(self, metrics: NodeMetrics) -> int:
+        """
+        :param metrics: advertised metrics or None
+        :return: load level
+        """
+        return load_level(metrics)
+
+
+class RttStrategy(MetricsStrategy):
+    """
+    Implementation of abstract class which selects node closest to the rest of the
+    network. Every node advertises median and p95 of round trip times to its peers,
+    which are compared in steps of RTT_STEP.
+    """
+
+    def __init__(self, own_information: NodeInformation, message_dict: MessageDict,
+                 registry: NodeRegistry = None, statistic=RTT_MEDIAN, clock=time.monotonic):
+        super().__init__(own_information, message_dict, registry, clock)
+        self.statistic = statistic
+
+    def level(self, metrics: NodeMetrics) -> int:
+        """
+        :param metrics: advertised metrics or None
+        :return: rtt level
+        """
+        return rtt_level(metrics, self.statistic)
+
+
+def load_level(metrics: NodeMetrics) -> int:
+    """
+    Quantize load of node, higher level means less headroom.
+    :param metrics: advertised metrics or None
+    :return: load level or UNKNOWN_LEVEL if node advertised no metrics
+    """
+    if metrics is None:
+        return UNKNOWN_LEVEL
+    score = metrics.load_average + metrics.queue_depth * QUEUE_WEIGHT \
+            + metrics.rss / RSS_PER_LOAD
+    return int(score / LOAD_STEP)
+
+
+def rtt_level(metrics: NodeMetrics, statistic=RTT_MEDIAN) -> int:
+    """
+    Quantize round trip times of node to its peers, higher level means farther away.
+    :param metrics: advertised metrics or None
+    :param statistic: RTT_MEDIAN or RTT_P95
+    :return: rtt level or UNKNOWN_LEVEL if node advertised no round trip times
+    """
+    if metrics is None or metrics.rtt_median == NO_RTT:
+        return UNKNOWN_LEVEL
+    rtt = metrics.rtt_p95 if statistic == RTT_P95 else metrics.rtt_median
+    return int(rtt / RTT_STEP)
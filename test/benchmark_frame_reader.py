@@ -0,0 +1,95 @@
+"""
+Benchmark which compares memory allocated per received frame by FrameReader with
+reading by repeated recv and extend like before. Buffer of FrameReader is allocated
+once and spread over all frames.
+
+python -m test.benchmark_frame_reader
+"""
+import socket
+import struct
+import threading
+import time
+import tracemalloc
+
+from src.beans import NodeInformation, NetAddress, Message
+from src.connection_pool import FrameReader, add_header, HEADER_FORMAT, HEADER_LENGTH
+from src.message_dict import DEFAULT_MESSAGE, messages_to_frame, decode_frame
+
+NUMBER_OF_FRAMES = 20000
+
+
+def _read_number_of_bytes(sock, num_bytes_to_read):
+    data = bytearray()
+    while len(data) < num_bytes_to_read:
+        packet = sock.recv(num_bytes_to_read - len(data))
+        if not packet:
+            return None
+        data.extend(packet)
+    return data
+
+
+def read_by_extend(sock):
+    """
+    Read frame like PingMan did before FrameReader.
+    :param sock: receiving socket
+    :return: payload of frame or None if connection was closed
+    """
+    raw_msglen = _read_number_of_bytes(sock, HEADER_LENGTH)
+    if not raw_msglen:
+        return None
+    return _read_number_of_bytes(sock, struct.unpack(HEADER_FORMAT, raw_msglen)[0])
+
+
+def create_frame() -> bytes:
+    """
+    :return: binary heartbeat frame with header
+    """
+    alice = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+    alice.wish_master = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+    return add_header(messages_to_frame([Message(DEFAULT_MESSAGE, alice)]))
+
+
+def measure(name, read_frame):
+    """
+    Send NUMBER_OF_FRAMES frames over socket pair and print time and average bytes
+    which were allocated temporary while one frame was read and decoded.
+    :param name: name of reader
+    :param read_frame: callable which reads next frame from socket
+    :return: None
+    """
+    sender, receiver = socket.socketpair()
+    frame = create_frame()
+    threading.Thread(target=lambda: (sender.sendall(frame * NUMBER_OF_FRAMES),
+                                     sender.close()), daemon=True).start()
+    read_allocated = 0
+    decode_allocated = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(NUMBER_OF_FRAMES):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        received = read_frame(receiver)
+        current, peak = tracemalloc.get_traced_memory()
+        read_allocated += peak - before
+        tracemalloc.reset_peak()
+        decode_frame(received)
+        decode_allocated += tracemalloc.get_traced_memory()[1] - current
+    duration = time.perf_counter() - start
+    tracemalloc.stop()
+    receiver.close()
+    print('{}: {:.1f} us per frame, allocated bytes per frame {:.0f} by reading and '
+          '{:.0f} by decoding'.format(name, duration / NUMBER_OF_FRAMES * 1e6,
+                                      read_allocated / NUMBER_OF_FRAMES,
+                                      decode_allocated / NUMBER_OF_FRAMES))
+
+
+if __name__ == '__main__':
+    measure('recv and extend', read_by_extend)
+    READERS = dict()
+
+    def read_by_frame_reader(sock):
+        if sock not in READERS:
+            READERS[sock] = FrameReader(sock)
+        return READERS[sock].read_frame()
+
+    measure('FrameReader', read_by_frame_reader)
@@ -0,0 +1,15 @@
+"""
+Contains helpers which are shared by testcases.
+"""
+
+
+class FakeClock:
+    """
+    Clock which only moves if test wants.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
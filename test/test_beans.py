@@ -1,6 +1,7 @@
 """
 Simple test for serialization and deserialization of data class.
 """
+import json
 import time
 import unittest
 
@@ -30,6 +31,146 @@ class BeanCase(unittest.TestCase):
         self.assertEqual(node.net_address.port, deserialized_node.net_address.port)
         self.assertEqual(node.wish_master, deserialized_node)
 
+    def test_binary_serialization_deserialization(self):
+        """
+        Checks if a instance of NodeInformation can be serialized to binary record and
+        record can be deserialized. Checks if each value and wish master stays same
+        :return: None
+        """
+        master = NodeInformation(NetAddress(host='1.1.1.2', port=7543), time.time(), name='Bob')
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=7542), time.time(), name='Till')
+        node.wish_master = master
+        record = beans.node_information_to_bytes(node)
+        deserialized_node, offset = beans.node_information_from_bytes(record)
+        self.assertEqual(offset, len(record))
+        self.assertEqual(node, deserialized_node)
+        self.assertEqual(node.birthtime, deserialized_node.birthtime)
+        self.assertEqual(node.net_address.host, deserialized_node.net_address.host)
+        self.assertEqual(master, deserialized_node.wish_master)
+        self.assertIsNone(deserialized_node.wish_master.wish_master)
+        self.assertLess(len(record) * 5, len(node.to_json()))
+
+    def test_term_is_serialized(self):
+        """
+        Checks if term of election survives binary format and json record, which does
+        not contain term, is decoded without term.
+        :return: None
+        """
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=7542), time.time(), name='Till')
+        version = node.version
+        node.term = 3
+        self.assertGreater(node.version, version)
+        self.assertEqual(beans.node_information_from_bytes(
+            beans.node_information_to_bytes(node))[0].term, 3)
+        self.assertEqual(beans.node_information_from_json(node.to_json()).term,
+                         beans.NO_TERM)
+        with_term = node.to_dict()
+        with_term['term'] = 3
+        self.assertEqual(beans.node_information_from_json(json.dumps(with_term)).term, 3)
+
+    def test_metrics_are_serialized(self):
+        """
+        Checks if metrics survive binary format and are omitted for inline wish master
+        and json record.
+        :return: None
+        """
+        metrics = beans.NodeMetrics(0.5, 1024, 3, 0.001, 0.004)
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=7542), time.time(), name='Till')
+        node.wish_master = NodeInformation(NetAddress(host='1.1.1.2', port=7543),
+                                           time.time(), name='Bob', metrics=metrics)
+        version = node.version
+        node.metrics = metrics
+        self.assertGreater(node.version, version)
+        self.assertIsNone(beans.node_information_from_json(node.to_json()).metrics)
+        decoded = beans.node_information_from_bytes(beans.node_information_to_bytes(node))[0]
+        self.assertEqual(decoded.metrics, metrics)
+        self.assertIsNone(decoded.wish_master.metrics)
+
+    def test_json_contains_only_legacy_keys(self):
+        """
+        Checks if json record and broadcast contain only keys which nodes of older
+        versions pass to constructor of NodeInformation.
+        :return: None
+        """
+        metrics = beans.NodeMetrics(0.5, 1024, 3, 0.001, 0.004)
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=7542), time.time(),
+                               name='Till', term=3, metrics=metrics)
+        node.wish_master = node
+        legacy_keys = {'birthtime', 'name', 'net_address', 'wish_master'}
+        node_info_dict = json.loads(node.to_json())
+        self.assertEqual(set(node_info_dict), legacy_keys)
+        self.assertEqual(set(node_info_dict['wish_master']), legacy_keys)
+        self.assertEqual(json.loads(node.to_discovery_json()),
+                         dict(node_info_dict, wish_master=None))
+
+    def test_discovery_contains_only_identity(self):
+        """
+        Checks if broadcast of a node with wish master, term and metrics is as long as
+        broadcast of a fresh node and if full json of a node is accepted as broadcast.
+        :return: None
+        """
+        metrics = beans.NodeMetrics(0.5, 1024, 3, 0.001, 0.004)
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=17542), time.time(),
+                               name='Till', term=12, metrics=metrics)
+        node.wish_master = NodeInformation(NetAddress(host='1.1.1.2', port=17543),
+                                           time.time(), name='Bob', term=12, metrics=metrics)
+        fresh = NodeInformation(node.net_address, node.birthtime, node.name)
+        self.assertEqual(node.to_discovery_json(), fresh.to_discovery_json())
+        for json_string in (node.to_discovery_json(), node.to_json()):
+            decoded = beans.node_information_from_discovery_json(json_string)
+            self.assertEqual(decoded.identity, node.identity)
+            self.assertIsNone(decoded.wish_master)
+            self.assertIsNone(decoded.metrics)
+
+    def test_encoding_is_cached_until_change(self):
+        """
+        Checks if encoded forms are reused and encoded again after wish master or
+        another field changed.
+        :return: None
+        """
+        node = NodeInformation(NetAddress(host='1.1.1.1', port=7542), time.time(), name='Till')
+        record = beans.node_information_to_bytes(node)
+        json_string = node.to_json()
+        self.assertIs(record, beans.node_information_to_bytes(node))
+        self.assertIs(json_string, node.to_json())
+        node.wish_master = NodeInformation(NetAddress(host='1.1.1.2', port=7543), name='Bob')
+        self.assertEqual(beans.node_information_from_bytes(
+            beans.node_information_to_bytes(node))[0].wish_master, node.wish_master)
+        self.assertIn('Bob', node.to_json())
+        with self.assertRaises(AttributeError):
+            node.name = 'Tom'
+
+    def test_intern_table(self):
+        """
+        Checks if repeated records resolve to same instance, wish master is only updated
+        by records node sent about itself and own information is never changed.
+        :return: None
+        """
+        own = NodeInformation(NetAddress(host='1.1.1.1', port=7542), 1.0, name='Till')
+        master = NodeInformation(NetAddress(host='1.1.1.2', port=7543), 2.0, name='Bob')
+        other = NodeInformation(NetAddress(host='1.1.1.3', port=7544), 3.0, name='Tom')
+        intern_table = beans.InternTable(own)
+        other.wish_master = master
+        record = beans.node_information_to_bytes(other)
+        first, _ = beans.node_information_from_bytes(record, intern_table=intern_table)
+        second = beans.node_information_from_json(other.to_json(), intern_table)
+        self.assertIs(first, second)
+        self.assertEqual(master, first.wish_master)
+        self.assertIs(first.wish_master, intern_table.resolve('1.1.1.2', 7543, 2.0, 'Bob'))
+        other.wish_master = own
+        relayed, _ = beans.node_information_from_bytes(beans.node_information_to_bytes(other),
+                                                       intern_table=intern_table, update=False)
+        self.assertIs(relayed, first)
+        self.assertEqual(master, first.wish_master)
+        own.wish_master = own
+        claimed, _ = beans.node_information_from_bytes(beans.node_information_to_bytes(
+            NodeInformation(own.net_address, 1.0, name='Till', wish_master=master)),
+            intern_table=intern_table)
+        self.assertEqual(own, claimed)
+        self.assertIsNot(own, claimed)
+        self.assertIs(own, own.wish_master)
+        self.assertEqual(master, claimed.wish_master)
+
 
 if __name__ == '__main__':
     unittest.main()
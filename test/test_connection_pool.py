@@ -0,0 +1,176 @@
+"""
+Tests for reading length prefixed frames and for persistent connections.
+"""
+import os
+import socket
+import time
+import unittest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from src.beans import NetAddress
+from src.connection_pool import FrameReader, ConnectionPool, add_header, _is_closed_by_peer
+
+HIGH_FD = 1500
+
+
+class FrameReaderCase(unittest.TestCase):
+    """
+    Tests for reading length prefixed frames into reusable buffer.
+    """
+
+    def setUp(self):
+        self.sender, self.receiver = socket.socketpair()
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def test_read_frames_of_one_send(self):
+        """
+        Checks if several frames received at once are returned one after another.
+        :return: None
+        """
+        self.sender.sendall(add_header(b'alice') + add_header(b'') + add_header(b'bob'))
+        self.sender.close()
+        reader = FrameReader(self.receiver)
+        self.assertEqual(bytes(reader.read_frame()), b'alice')
+        self.assertEqual(bytes(reader.read_frame()), b'')
+        self.assertEqual(bytes(reader.read_frame()), b'bob')
+        self.assertIsNone(reader.read_frame())
+
+    def test_frame_larger_than_buffer(self):
+        """
+        Checks if buffer grows for frames which do not fit and unread bytes are kept.
+        :return: None
+        """
+        payload = bytes(range(256)) * 4
+        self.sender.sendall(add_header(b'abc') + add_header(payload) + add_header(b'end'))
+        reader = FrameReader(self.receiver, buffer_size=16)
+        self.assertEqual(bytes(reader.read_frame()), b'abc')
+        self.assertEqual(bytes(reader.read_frame()), payload)
+        self.assertEqual(bytes(reader.read_frame()), b'end')
+
+    def test_incomplete_frame(self):
+        """
+        Checks if connection closed in middle of frame returns None.
+        :return: None
+        """
+        self.sender.sendall(add_header(b'alice')[:6])
+        self.sender.close()
+        self.assertIsNone(FrameReader(self.receiver).read_frame())
+
+    def test_reassemble_partial_frames(self):
+        """
+        Checks if frame which arrives in several parts on non blocking socket is
+        returned after last part.
+        :return: None
+        """
+        self.receiver.setblocking(False)
+        reader = FrameReader(self.receiver, buffer_size=8)
+        frame = add_header(b'alice and bob')
+        self.assertTrue(reader.receive())
+        self.assertIsNone(reader.next_frame())
+        for start in range(0, len(frame), 5):
+            self.assertIsNone(reader.next_frame())
+            self.sender.sendall(frame[start:start + 5])
+            self.assertTrue(reader.receive())
+        self.assertEqual(bytes(reader.next_frame()), b'alice and bob')
+        self.assertIsNone(reader.next_frame())
+
+
+class ConnectionPoolCase(unittest.TestCase):
+    """
+    Tests for reuse and reconnect of persistent connections.
+    """
+
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.server.settimeout(2)
+        self.address = NetAddress(*self.server.getsockname())
+        self.pool = ConnectionPool()
+        self.accepted = []
+
+    def tearDown(self):
+        self.pool.close_all()
+        for connection in self.accepted:
+            connection.close()
+        self.server.close()
+
+    def accept(self) -> FrameReader:
+        """
+        :return: reader of next connection of pool
+        """
+        connection = self.server.accept()[0]
+        connection.settimeout(2)
+        self.accepted.append(connection)
+        return FrameReader(connection)
+
+    def test_connection_is_reused(self):
+        """
+        Checks if several sends to same address use one connection.
+        :return: None
+        """
+        self.pool.send(self.address, b'alice')
+        self.pool.send(self.address, b'bob')
+        reader = self.accept()
+        self.assertEqual(bytes(reader.read_frame()), b'alice')
+        self.assertEqual(bytes(reader.read_frame()), b'bob')
+        self.server.settimeout(0.1)
+        self.assertRaises(socket.timeout, self.server.accept)
+
+    def test_reconnect_after_peer_closed(self):
+        """
+        Checks if connection closed by peer is detected and next send reconnects.
+        :return: None
+        """
+        self.pool.send(self.address, b'alice')
+        reader = self.accept()
+        self.assertEqual(bytes(reader.read_frame()), b'alice')
+        connection = self.pool.connections[self.address]
+        self.assertFalse(_is_closed_by_peer(connection))
+        reader.sock.close()
+        for _ in range(100):
+            if _is_closed_by_peer(connection):
+                break
+            time.sleep(0.01)
+        self.assertTrue(_is_closed_by_peer(connection))
+        self.pool.send(self.address, b'bob')
+        self.assertEqual(bytes(self.accept().read_frame()), b'bob')
+
+    def test_send_to_closed_port_raises(self):
+        """
+        Checks if failed connect raises OSError and leaves no connection behind.
+        :return: None
+        """
+        self.server.close()
+        self.assertRaises(OSError, self.pool.send, self.address, b'alice')
+        self.assertNotIn(self.address, self.pool.connections)
+
+    def test_open_connection_with_large_descriptor(self):
+        """
+        Checks if connection with file descriptor above limit of select is not
+        reported as closed.
+        :return: None
+        """
+        if resource is None or resource.getrlimit(resource.RLIMIT_NOFILE)[0] <= HIGH_FD:
+            self.skipTest('descriptor limit too low')
+        first, second = socket.socketpair()
+        os.dup2(first.fileno(), HIGH_FD)
+        high = socket.socket(fileno=HIGH_FD)
+        try:
+            self.assertFalse(_is_closed_by_peer(high))
+            second.close()
+            self.assertTrue(_is_closed_by_peer(high))
+        finally:
+            high.close()
+            first.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
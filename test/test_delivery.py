@@ -0,0 +1,190 @@
+"""
+Tests for acknowledged delivery of control messages.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress, Message
+from src.delivery import DeliveryTracker
+from src.message_dict import MessageDict, DISPATCH_MESSAGE, CONTROL_ACK_MESSAGE, \
+    HANDSHAKE_MESSAGE, HANDSHAKE_RETRANSMISSIONS, decode_frame
+from test.helpers import FakeClock
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+peter_information = NodeInformation(NetAddress(port=6060), name='peter', birthtime=1)
+
+
+class DeliveryTrackerCase(unittest.TestCase):
+    """
+    Tests for sequence numbers, acknowledges and retransmission.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = DeliveryTracker(retransmit_timeout=1, clock=self.clock)
+
+    def test_retransmit_until_acknowledged(self):
+        """
+        Checks if messages get consecutive sequence numbers and are retransmitted after
+        timeout until cumulative acknowledge covers them.
+        :return: None
+        """
+        first = Message(DISPATCH_MESSAGE, alice_information)
+        second = Message(DISPATCH_MESSAGE, alice_information)
+        self.tracker.track(first, bob_information)
+        self.tracker.track(second, bob_information)
+        self.assertEqual((first.seq, second.seq), (1, 2))
+        self.assertEqual(self.tracker.due_retransmissions(), [])
+        self.clock.now = 1
+        self.assertEqual(len(self.tracker.due_retransmissions()), 2)
+        self.tracker.acknowledge(bob_information, 1)
+        self.clock.now = 2
+        self.assertEqual([message.seq for _, message in self.tracker.due_retransmissions()], [2])
+        self.tracker.acknowledge(bob_information, 2)
+        self.clock.now = 3
+        self.assertEqual(self.tracker.due_retransmissions(), [])
+
+    def test_duplicates_and_gaps_are_not_accepted(self):
+        """
+        Checks if receiver only accepts next message in order.
+        :return: None
+        """
+        self.assertTrue(self.tracker.accept(alice_information, 1))
+        self.assertFalse(self.tracker.accept(alice_information, 1))
+        self.assertFalse(self.tracker.accept(alice_information, 3))
+        self.assertTrue(self.tracker.accept(alice_information, 2))
+        self.assertEqual(self.tracker.handled(alice_information), 2)
+
+    def test_completion_resolves_after_all_acknowledged(self):
+        """
+        Checks if completion resolves when every node acknowledged or was forgotten.
+        :return: None
+        """
+        completion = self.tracker.completion({bob_information: 1, peter_information: 3})
+        self.tracker.acknowledge(bob_information, 2)
+        self.assertFalse(completion.done())
+        self.tracker.forget(peter_information)
+        self.assertTrue(completion.done())
+        self.assertTrue(self.tracker.completion({}).done())
+
+
+class AcknowledgedDispatchCase(unittest.TestCase):
+    """
+    Tests for dispatch messages which are acknowledged between two message dicts.
+    """
+
+    def test_dispatch_is_acknowledged(self):
+        """
+        Checks if dispatch future resolves after other node acknowledged dispatch and
+        duplicate dispatch is acknowledged but not handled again.
+        :return: None
+        """
+        alice_dict = MessageDict(alice_information)
+        bob_dict = MessageDict(bob_information)
+        alice_dict.enable_binary(bob_information)
+        bob_dict.enable_binary(alice_information)
+        delivered = alice_dict.add_dispatch_message(alice_information, [bob_information])
+        dispatch = decode_frame(alice_dict.get_next_frame(bob_information))[0]
+        self.assertEqual(dispatch.seq, 1)
+        self.assertTrue(bob_dict.receive_control(dispatch))
+        self.assertFalse(bob_dict.receive_control(dispatch))
+        acks = decode_frame(bob_dict.get_next_frame(alice_information))
+        self.assertEqual([ack.subject for ack in acks], [CONTROL_ACK_MESSAGE] * 2)
+        self.assertFalse(delivered.done())
+        alice_dict.acknowledge(acks[0])
+        self.assertTrue(delivered.done())
+
+    def test_dispatch_to_json_node_completes_when_taken(self):
+        """
+        Checks if dispatch to node without binary wire format completes when it is
+        taken from queue.
+        :return: None
+        """
+        alice_dict = MessageDict(alice_information)
+        delivered = alice_dict.add_dispatch_message(alice_information, [bob_information])
+        self.assertFalse(delivered.done())
+        alice_dict.get_next_frame(bob_information)
+        self.assertTrue(delivered.done())
+
+
+class AcknowledgedHandshakeCase(unittest.TestCase):
+    """
+    Tests for handshakes which are sent before target announced binary wire format.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.alice_dict = MessageDict(alice_information)
+        self.alice_dict.delivery = DeliveryTracker(retransmit_timeout=1, clock=self.clock)
+
+    def test_handshake_is_acknowledged_after_binary_announced(self):
+        """
+        Checks if handshake sent as json is retransmitted with sequence number once
+        target announced binary wire format and is acknowledged then.
+        :return: None
+        """
+        bob_dict = MessageDict(bob_information)
+        self.alice_dict.add_handshake_message(alice_information, bob_information)
+        self.assertTrue(self.alice_dict.get_next_frame(bob_information)
+                        .startswith(HANDSHAKE_MESSAGE.encode()))
+        self.alice_dict.enable_binary(bob_information)
+        bob_dict.enable_binary(alice_information)
+        self.clock.now = 1
+        self.alice_dict.retransmit()
+        handshake = decode_frame(self.alice_dict.get_next_frame(bob_information))[0]
+        self.assertEqual((handshake.subject, handshake.seq), (HANDSHAKE_MESSAGE, 1))
+        self.assertTrue(bob_dict.receive_control(handshake))
+        self.alice_dict.acknowledge(decode_frame(bob_dict.get_next_frame(alice_information))[0])
+        self.clock.now = 2
+        self.alice_dict.retransmit()
+        self.assertTrue(self.alice_dict.dict[bob_information].empty())
+
+    def test_queued_message_is_not_retransmitted(self):
+        """
+        Checks if overdue message which still waits in queue is not queued twice.
+        :return: None
+        """
+        self.alice_dict.enable_binary(bob_information)
+        self.alice_dict.add_dispatch_message(alice_information, [bob_information])
+        self.clock.now = 1
+        self.alice_dict.retransmit()
+        self.assertEqual(len(decode_frame(self.alice_dict.get_next_frame(bob_information))), 1)
+        self.clock.now = 2
+        self.alice_dict.retransmit()
+        self.assertEqual(decode_frame(self.alice_dict.get_next_frame(bob_information))[0].subject,
+                         DISPATCH_MESSAGE)
+
+    def test_other_queued_message_does_not_suppress_retransmission(self):
+        """
+        Checks if overdue message is retransmitted although an equal message with another
+        sequence number waits in queue.
+        :return: None
+        """
+        self.alice_dict.enable_binary(bob_information)
+        self.alice_dict.add_dispatch_message(alice_information, [bob_information])
+        self.alice_dict.get_next_frame(bob_information)
+        self.alice_dict.add_dispatch_message(alice_information, [bob_information])
+        self.clock.now = 1
+        self.alice_dict.retransmit()
+        frame = decode_frame(self.alice_dict.get_next_frame(bob_information))
+        self.assertEqual(sorted(message.seq for message in frame), [1, 2])
+
+    def test_handshake_to_json_node_is_given_up(self):
+        """
+        Checks if handshake to node which never announces binary wire format is only
+        retransmitted a limited number of times.
+        :return: None
+        """
+        self.alice_dict.add_handshake_message(alice_information, bob_information)
+        sent = 0
+        for now in range(1, HANDSHAKE_RETRANSMISSIONS + 3):
+            if self.alice_dict.get_next_frame(bob_information).startswith(
+                    HANDSHAKE_MESSAGE.encode()):
+                sent += 1
+            self.clock.now = now
+            self.alice_dict.retransmit()
+        self.assertEqual(sent, HANDSHAKE_RETRANSMISSIONS + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
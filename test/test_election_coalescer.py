@@ -0,0 +1,65 @@
+"""
+Tests for coalescing of requested elections.
+"""
+import threading
+import unittest
+
+from src.election_coalescer import ElectionCoalescer
+from test.helpers import FakeClock
+
+
+class ElectionCoalescerCase(unittest.TestCase):
+    """
+    Tests for window and maximal delay of elections.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.elections = []
+        self.coalescer = ElectionCoalescer(lambda: self.elections.append(self.clock.now),
+                                           window=1, max_delay=3, clock=self.clock)
+
+    def test_burst_causes_one_election(self):
+        """
+        Checks if requests within window are merged and election runs after window.
+        :return: None
+        """
+        self.assertFalse(self.coalescer.run_if_due())
+        for now in (0, 0.5, 0.9):
+            self.clock.now = now
+            self.coalescer.request()
+        self.assertEqual(self.coalescer.deadline(), 1.9)
+        self.clock.now = 1.8
+        self.assertFalse(self.coalescer.run_if_due())
+        self.clock.now = 1.9
+        self.assertTrue(self.coalescer.run_if_due())
+        self.assertFalse(self.coalescer.run_if_due())
+        self.assertEqual(self.elections, [1.9])
+
+    def test_election_not_delayed_beyond_maximum(self):
+        """
+        Checks if continuous requests delay election at most max_delay.
+        :return: None
+        """
+        for step in range(10):
+            self.clock.now = step * 0.5
+            self.coalescer.request()
+            self.coalescer.run_if_due()
+        self.assertEqual(self.elections, [3])
+
+    def test_thread_runs_pending_election(self):
+        """
+        Checks if started coalescer runs election in own thread.
+        :return: None
+        """
+        elected = threading.Event()
+        coalescer = ElectionCoalescer(elected.set, window=0.01, max_delay=0.1)
+        coalescer.start()
+        coalescer.request()
+        self.assertTrue(elected.wait(2))
+        coalescer.stop()
+        self.assertEqual(coalescer.elections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
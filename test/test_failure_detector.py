@@ -0,0 +1,62 @@
+"""
+Tests for phi accrual failure detector.
+"""
+import unittest
+
+from src.failure_detector import PhiAccrualFailureDetector
+
+from test.helpers import FakeClock
+
+
+class FailureDetectorCase(unittest.TestCase):
+    """
+    Tests for phi accrual failure detector.
+    """
+
+    def test_regular_heartbeats_are_not_suspected(self):
+        """
+        Checks if node which sends heartbeat every half second is not suspected.
+        :return: None
+        """
+        clock = FakeClock()
+        detector = PhiAccrualFailureDetector(clock=clock)
+        for _ in range(20):
+            detector.heartbeat('alice')
+            clock.now += 0.5
+        self.assertTrue(detector.is_available('alice'))
+        self.assertLess(detector.phi('alice'), 1)
+
+    def test_missing_heartbeats_are_suspected(self):
+        """
+        Checks if phi grows if heartbeats are missing and node is suspected at the end.
+        :return: None
+        """
+        clock = FakeClock()
+        detector = PhiAccrualFailureDetector(clock=clock)
+        for _ in range(20):
+            detector.heartbeat('alice')
+            clock.now += 0.5
+        phi_values = []
+        for _ in range(5):
+            clock.now += 0.5
+            phi_values.append(detector.phi('alice'))
+        self.assertEqual(phi_values, sorted(phi_values))
+        self.assertFalse(detector.is_available('alice'))
+        self.assertEqual(['alice'], detector.suspects(['alice']))
+
+    def test_suspects_watches_new_nodes(self):
+        """
+        Checks if connected node without any heartbeat is watched and suspected later and
+        if nodes which are not connected any longer are forgotten.
+        :return: None
+        """
+        clock = FakeClock()
+        detector = PhiAccrualFailureDetector(clock=clock)
+        self.assertEqual([], detector.suspects(['alice', 'bob']))
+        clock.now += 10
+        self.assertEqual(['bob'], detector.suspects(['bob']))
+        self.assertEqual({'bob'}, set(detector.suspicion()))
+
+
+if __name__ == '__main__':
+    unittest.main()
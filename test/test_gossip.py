@@ -0,0 +1,94 @@
+"""
+Tests for gossip membership.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress, Message
+from src.gossip import GossipMembership
+from src.message_dict import MEMBER_ALIVE, MEMBER_SUSPECT, MEMBER_CONFIRM
+from test.helpers import FakeClock
+
+OWN = NodeInformation(NetAddress('localhost', 5000), name='own', birthtime=1)
+NODES = [NodeInformation(NetAddress('localhost', 5001 + i), name=str(i), birthtime=1)
+         for i in range(6)]
+
+
+class GossipMembershipCase(unittest.TestCase):
+    """
+    Tests for probing, suspicion and refutation of gossip membership.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.membership = GossipMembership(OWN, fanout=2, probe_interval=1,
+                                           probe_timeout=1, suspicion_timeout=2,
+                                           clock=self.clock)
+
+    def test_probes_only_fanout_nodes_per_round(self):
+        """
+        Checks if only fanout nodes are probed per round and every node is probed
+        once in a round robin cycle.
+        :return: None
+        """
+        probed = []
+        for _ in range(3):
+            targets = self.membership.probe_targets(NODES)
+            self.assertEqual(len(targets), 2)
+            probed.extend(targets)
+            self.clock.now += 1
+        self.assertEqual(sorted(probed, key=lambda node: node.name), NODES)
+
+    def test_not_answering_node_is_suspected_and_confirmed(self):
+        """
+        Checks if probed node is suspected after probe timeout, reported after
+        suspicion timeout and confirmed if it is removed.
+        :return: None
+        """
+        node = NODES[0]
+        self.membership.probe_targets([node])
+        self.clock.now = 1
+        self.assertEqual(self.membership.suspects([node]), [])
+        self.assertIn(node, self.membership.suspicion())
+        self.clock.now = 3
+        self.assertEqual(self.membership.suspects([node]), [node])
+        self.membership.remove(node)
+        self.assertNotIn(node, self.membership.suspicion())
+        subjects = [update.subject for update in self.membership.updates_to_piggyback()]
+        self.assertEqual(subjects, [MEMBER_CONFIRM])
+
+    def test_answer_ends_suspicion(self):
+        """
+        Checks if message of suspected node ends suspicion.
+        :return: None
+        """
+        node = NODES[0]
+        self.membership.probe_targets([node])
+        self.clock.now = 1
+        self.membership.suspects([node])
+        self.membership.heartbeat(node)
+        self.clock.now = 5
+        self.assertEqual(self.membership.suspects([node]), [])
+
+    def test_suspicion_of_own_node_is_refuted(self):
+        """
+        Checks if own node spreads higher incarnation if it is suspected.
+        :return: None
+        """
+        self.assertFalse(self.membership.apply(Message(MEMBER_SUSPECT, OWN, version=0)))
+        updates = self.membership.updates_to_piggyback()
+        self.assertEqual(updates, [Message(MEMBER_ALIVE, OWN, version=1)])
+        self.assertEqual(updates[0].version, 1)
+
+    def test_old_incarnation_is_ignored(self):
+        """
+        Checks if suspicion with older incarnation does not override alive state.
+        :return: None
+        """
+        node = NODES[0]
+        self.assertTrue(self.membership.apply(Message(MEMBER_ALIVE, node, version=2)))
+        self.assertFalse(self.membership.apply(Message(MEMBER_SUSPECT, node, version=1)))
+        self.assertTrue(self.membership.apply(Message(MEMBER_SUSPECT, node, version=2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for scheduling of heartbeats.
+"""
+import unittest
+
+from src.heartbeat_scheduler import HeartbeatScheduler
+from test.helpers import FakeClock
+
+
+class HeartbeatSchedulerCase(unittest.TestCase):
+    """
+    Tests for scheduling of heartbeats.
+    """
+
+    def test_new_targets_are_due_immediately(self):
+        """
+        Checks if synced targets are due without waiting.
+        :return: None
+        """
+        scheduler = HeartbeatScheduler(interval=1, jitter=0, clock=FakeClock())
+        scheduler.sync(['alice', 'bob'])
+        self.assertEqual(sorted(scheduler.pop_due()), ['alice', 'bob'])
+        self.assertEqual(scheduler.pop_due(), [])
+
+    def test_target_due_after_interval(self):
+        """
+        Checks if rescheduled target is due after interval and not before.
+        :return: None
+        """
+        clock = FakeClock()
+        scheduler = HeartbeatScheduler(interval=1, jitter=0, clock=clock)
+        scheduler.sync(['alice'])
+        scheduler.pop_due()
+        scheduler.schedule('alice')
+        clock.now = 0.5
+        self.assertEqual(scheduler.pop_due(), [])
+        self.assertAlmostEqual(scheduler.time_until_next(), 0.5)
+        clock.now = 1.0
+        self.assertEqual(scheduler.pop_due(), ['alice'])
+
+    def test_expedite_wakes_up_listener(self):
+        """
+        Checks if expedited target is due immediately and listeners are called.
+        :return: None
+        """
+        woken = []
+        scheduler = HeartbeatScheduler(interval=1, jitter=0, clock=FakeClock())
+        scheduler.add_listener(lambda: woken.append(True))
+        scheduler.schedule('alice')
+        scheduler.expedite('alice')
+        self.assertEqual(woken, [True])
+        self.assertEqual(scheduler.pop_due(), ['alice'])
+        self.assertEqual(scheduler.pop_due(), [])
+
+    def test_sync_removes_old_targets(self):
+        """
+        Checks if targets which are not synced again get no heartbeat any longer.
+        :return: None
+        """
+        scheduler = HeartbeatScheduler(interval=1, jitter=0, clock=FakeClock())
+        scheduler.sync(['alice', 'bob'])
+        scheduler.sync(['bob'])
+        self.assertEqual(scheduler.pop_due(), ['bob'])
+
+    def test_in_flight_target_is_not_synced_again(self):
+        """
+        Checks if target which heartbeat is still being send is not due again by sync.
+        :return: None
+        """
+        scheduler = HeartbeatScheduler(interval=1, jitter=0, clock=FakeClock())
+        scheduler.sync(['alice'])
+        self.assertEqual(scheduler.pop_due(), ['alice'])
+        scheduler.sync(['alice'])
+        self.assertEqual(scheduler.pop_due(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
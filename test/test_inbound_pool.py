@@ -0,0 +1,100 @@
+"""
+Tests for bounded handling of received frames.
+"""
+import threading
+import unittest
+
+from src.beans import NodeInformation, NetAddress, Message
+from src.inbound_pool import InboundWorkerPool, DROP_OLDEST_HEARTBEAT, REJECT_NEWEST_HEARTBEAT
+from src.message_dict import DEFAULT_MESSAGE, HANDSHAKE_MESSAGE, message_to_string, UTF_8
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+OLD_HEARTBEAT = message_to_string(Message(DEFAULT_MESSAGE, bob_information)).encode(UTF_8)
+HEARTBEAT = message_to_string(Message(DEFAULT_MESSAGE, alice_information)).encode(UTF_8)
+HANDSHAKE = message_to_string(Message(HANDSHAKE_MESSAGE, alice_information)).encode(UTF_8)
+
+
+class InboundWorkerPoolCase(unittest.TestCase):
+    """
+    Tests for queue limit and overload policies of inbound pool.
+    """
+
+    def test_oldest_heartbeat_is_dropped(self):
+        """
+        Checks if oldest heartbeat makes room for new frame if queue is full.
+        :return: None
+        """
+        pool = InboundWorkerPool(max_queue=2, policy=DROP_OLDEST_HEARTBEAT)
+        self.assertTrue(pool.submit(HANDSHAKE))
+        self.assertTrue(pool.submit(OLD_HEARTBEAT))
+        self.assertTrue(pool.submit(HEARTBEAT))
+        self.assertEqual(pool.queued_frames(), [HANDSHAKE, HEARTBEAT])
+        self.assertEqual(pool.metrics()['rejected'], 1)
+
+    def test_newest_heartbeat_is_rejected(self):
+        """
+        Checks if new heartbeat is rejected but handshake is queued even if queue is full.
+        :return: None
+        """
+        pool = InboundWorkerPool(max_queue=1, policy=REJECT_NEWEST_HEARTBEAT)
+        self.assertTrue(pool.submit(HEARTBEAT))
+        self.assertFalse(pool.submit(HEARTBEAT))
+        self.assertTrue(pool.submit(HANDSHAKE))
+        self.assertEqual(pool.metrics(), {'queue_depth': 2, 'max_queue_depth': 2,
+                                          'processed': 0, 'rejected': 1})
+
+    def test_workers_handle_frames(self):
+        """
+        Checks if started workers handle queued frames in order.
+        :return: None
+        """
+        handled = []
+        done = threading.Event()
+
+        def handle(frame):
+            handled.append(frame)
+            if len(handled) == 2:
+                done.set()
+
+        pool = InboundWorkerPool()
+        pool.start(handle)
+        pool.submit(HANDSHAKE)
+        pool.submit(HEARTBEAT)
+        self.assertTrue(done.wait(5))
+        pool.stop()
+        self.assertEqual(handled, [HANDSHAKE, HEARTBEAT])
+
+    def test_queued_frames_keep_arrival_order(self):
+        """
+        Checks if heartbeats and other frames are handled in order of arrival.
+        :return: None
+        """
+        handled = []
+        done = threading.Event()
+
+        def handle(frame):
+            handled.append(frame)
+            if len(handled) == 3:
+                done.set()
+
+        pool = InboundWorkerPool()
+        pool.submit(HEARTBEAT)
+        pool.submit(HANDSHAKE)
+        pool.submit(OLD_HEARTBEAT)
+        pool.start(handle)
+        self.assertTrue(done.wait(5))
+        pool.stop()
+        self.assertEqual(handled, [HEARTBEAT, HANDSHAKE, OLD_HEARTBEAT])
+
+    def test_unknown_policy(self):
+        """
+        Checks if unknown overload policy is refused.
+        :return: None
+        """
+        with self.assertRaises(ValueError):
+            InboundWorkerPool(policy='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests for indirect probing of suspected nodes.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress
+from src.indirect_probe import IndirectProbe
+from src.message_dict import MessageDict, PING_REQUEST_MESSAGE, INDIRECT_ACK_MESSAGE, \
+    decode_frame
+from test.helpers import FakeClock
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+peter_information = NodeInformation(NetAddress(port=6060), name='peter', birthtime=1)
+
+
+class IndirectProbeCase(unittest.TestCase):
+    """
+    Tests for indirect probing of suspected nodes.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.message_dict = MessageDict(alice_information)
+        self.probe = IndirectProbe(alice_information, self.message_dict, timeout=1,
+                                   clock=self.clock)
+        self.connected = [bob_information, peter_information]
+
+    def test_suspect_without_helpers_is_lost(self):
+        """
+        Checks if suspect is reported immediately if no other node understands requests.
+        :return: None
+        """
+        self.assertEqual(self.probe.confirm([bob_information], self.connected),
+                         [bob_information])
+
+    def test_suspect_is_lost_after_timeout(self):
+        """
+        Checks if helper is asked to probe suspect and suspect is reported after
+        timeout without acknowledge.
+        :return: None
+        """
+        self.message_dict.enable_binary(peter_information)
+        self.assertEqual(self.probe.confirm([bob_information], self.connected), [])
+        request = decode_frame(self.message_dict.get_next_frame(peter_information))[0]
+        self.assertEqual(request.subject, PING_REQUEST_MESSAGE)
+        self.assertEqual(request.node_info, alice_information)
+        self.assertEqual(request.node_key, bob_information.node_key)
+        self.clock.now = 1
+        self.assertEqual(self.probe.confirm([bob_information], self.connected),
+                         [bob_information])
+
+    def test_acknowledge_ends_probe(self):
+        """
+        Checks if acknowledged suspect is not reported.
+        :return: None
+        """
+        self.message_dict.enable_binary(peter_information)
+        self.probe.confirm([bob_information], self.connected)
+        self.assertEqual(self.probe.acknowledge(bob_information.node_key), bob_information)
+        self.clock.now = 1
+        self.assertEqual(self.probe.confirm([], self.connected), [])
+
+    def test_relay_acknowledges_requester(self):
+        """
+        Checks if requester gets acknowledge after target sent a message.
+        :return: None
+        """
+        self.message_dict.enable_binary(peter_information)
+        self.probe.request(peter_information, bob_information.node_key, self.connected)
+        self.probe.heard_from(bob_information)
+        ack = decode_frame(self.message_dict.get_next_frame(peter_information))[0]
+        self.assertEqual(ack.subject, INDIRECT_ACK_MESSAGE)
+        self.assertEqual(ack.node_key, bob_information.node_key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Tests for leader lease which is granted by a majority.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress
+from src.leader_lease import LeaderLease
+from src.message_dict import MessageDict, messages_to_frame, decode_frame, LEASE_MESSAGE, \
+    DEFAULT_MESSAGE, DIGEST_MESSAGE
+from test.helpers import FakeClock
+
+
+class LeaderLeaseCase(unittest.TestCase):
+    """
+    Tests for grants, deadline and fencing token of lease between three nodes.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.clock.now = 1
+        self.alice = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+        self.bob = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+        self.peter = NodeInformation(NetAddress(port=6060), name='peter', birthtime=1)
+        for node in (self.alice, self.bob, self.peter):
+            node.term = 2
+            node.wish_master = self.alice
+        self.alice_lease = LeaderLease(self.alice, {self.bob, self.peter}, duration=2,
+                                       drift=0.5, clock=self.clock)
+        self.bob_lease = LeaderLease(self.bob, {self.alice, self.peter}, duration=2,
+                                     drift=0.5, clock=self.clock)
+
+    def exchange(self, sender_lease, receiver_lease, sender):
+        """
+        Send lease message through binary frame.
+        :return: received lease message
+        """
+        message = sender_lease.message(receiver_lease.own_information)
+        received = decode_frame(messages_to_frame([message]))[0]
+        receiver_lease.receive(sender, received)
+        return received
+
+    def test_majority_grants_lease(self):
+        """
+        Checks if master holds lease after one of two other nodes echoed its timestamp
+        and lease ends after duration shortened by drift.
+        :return: None
+        """
+        self.alice_lease.set_master(self.alice)
+        self.assertFalse(self.alice_lease.holds())
+        self.exchange(self.alice_lease, self.bob_lease, self.alice)
+        self.clock.now = 1.5
+        self.assertIsNone(self.alice_lease.message(self.bob))
+        grant = self.bob_lease.message(self.alice)
+        self.assertEqual((grant.subject, grant.echo, grant.held, grant.grant),
+                         (LEASE_MESSAGE, 1, 0.5, True))
+        self.clock.now = 1.75
+        self.assertEqual(self.alice_lease.receive(self.bob, grant), 0.25)
+        self.assertTrue(self.alice_lease.holds())
+        self.assertEqual(self.alice_lease.status(), (2, 2))
+        self.clock.now = 2
+        self.assertFalse(self.alice_lease.holds())
+        self.assertEqual(self.alice_lease.status(), (None, None))
+
+    def test_lease_of_older_term_is_not_valid(self):
+        """
+        Checks if lease is dropped when own term changed.
+        :return: None
+        """
+        self.alice_lease.set_master(self.alice)
+        self.exchange(self.alice_lease, self.bob_lease, self.alice)
+        self.exchange(self.bob_lease, self.alice_lease, self.bob)
+        self.assertTrue(self.alice_lease.holds())
+        self.alice.term = 3
+        self.assertFalse(self.alice_lease.holds())
+
+    def test_message_only_on_renewal_or_changed_grant(self):
+        """
+        Checks if lease messages are sent only if timestamp is due, received timestamp
+        was not echoed or grant changed and if repeated echo measures no round trip.
+        :return: None
+        """
+        self.exchange(self.alice_lease, self.bob_lease, self.alice)
+        self.assertIsNone(self.alice_lease.message(self.bob))
+        self.clock.now = 1.5
+        self.assertEqual(self.exchange(self.bob_lease, self.alice_lease, self.bob).echo, 1)
+        self.assertIsNone(self.bob_lease.message(self.alice))
+        echo = self.alice_lease.message(self.bob)
+        self.assertEqual((echo.stamp, echo.echo, echo.grant), (0, 1.5, False))
+        self.assertIsNone(self.alice_lease.message(self.bob))
+        self.bob.wish_master = self.bob
+        revoke = self.bob_lease.message(self.alice)
+        self.assertEqual((revoke.stamp, revoke.grant), (0, False))
+        self.assertIsNone(self.alice_lease.receive(self.bob, revoke))
+        self.clock.now = 3.5
+        self.assertEqual(self.alice_lease.message(self.bob).stamp, 3.5)
+
+    def test_digest_frame_without_due_lease(self):
+        """
+        Checks if digest heartbeat carries no lease message while nothing is due.
+        :return: None
+        """
+        message_dict = MessageDict(self.alice, send_digests=True)
+        message_dict.set_lease(self.alice_lease)
+        message_dict.enable_binary(self.bob)
+        subjects = [message.subject for message in
+                    decode_frame(message_dict.get_next_frame(self.bob))]
+        self.assertEqual(subjects, [DEFAULT_MESSAGE, LEASE_MESSAGE])
+        subjects = [message.subject for message in
+                    decode_frame(message_dict.get_next_frame(self.bob))]
+        self.assertEqual(subjects, [DIGEST_MESSAGE])
+
+    def test_majority_counts_lost_nodes(self):
+        """
+        Checks if master which lost nodes does not hold lease with grants of a minority.
+        :return: None
+        """
+        carl = NodeInformation(NetAddress(port=7070), name='carl', birthtime=1)
+        lost = {self.peter}
+        self.alice_lease = LeaderLease(self.alice, {self.bob}, lost, duration=2,
+                                       drift=0.5, clock=self.clock)
+        self.alice_lease.set_master(self.alice)
+        self.exchange(self.alice_lease, self.bob_lease, self.alice)
+        self.exchange(self.bob_lease, self.alice_lease, self.bob)
+        self.assertTrue(self.alice_lease.holds())
+        lost.add(carl)
+        self.alice_lease.renew()
+        self.assertFalse(self.alice_lease.holds())
+
+    def test_single_node_lease_is_bounded(self):
+        """
+        Checks if node without other nodes holds lease for one duration at a time and
+        loses it once it knows a lost node.
+        :return: None
+        """
+        connected, lost = set(), set()
+        lease = LeaderLease(self.alice, connected, lost, duration=2, drift=0.5,
+                            clock=self.clock)
+        lease.set_master(self.alice)
+        self.assertEqual(lease.status(), (2, 2))
+        self.clock.now = 2.5
+        self.assertTrue(lease.holds())
+        self.assertEqual(lease.status(), (3.5, 2))
+        lost.add(self.bob)
+        self.assertTrue(lease.holds())
+        self.clock.now = 3.5
+        self.assertFalse(lease.holds())
+
+    def test_grant_is_promised_to_one_node(self):
+        """
+        Checks if node does not grant to new wish master before promise to old one ended.
+        :return: None
+        """
+        peter_lease = LeaderLease(self.peter, {self.alice, self.bob}, duration=2,
+                                  clock=self.clock)
+        self.exchange(self.alice_lease, self.bob_lease, self.alice)
+        self.exchange(peter_lease, self.bob_lease, self.peter)
+        self.assertTrue(self.bob_lease.message(self.alice).grant)
+        self.bob.wish_master = self.peter
+        self.assertFalse(self.bob_lease.message(self.peter).grant)
+        self.clock.now = 3
+        self.assertTrue(self.bob_lease.message(self.peter).grant)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,12 @@ Tests for data class message dict.
 """
 
 import unittest
-import threading
-import time
-from synchronized_set import SynchronizedSet
 
-from src.beans import NodeInformation, NetAddress
-from src.message_dict import MessageDict, DEFAULT_MESSAGE, DISPATCH_MESSAGE, MESSAGE_SEPARATOR, JSON_SEPARATOR
+from src.beans import NodeInformation, NetAddress, Message
+from src.message_dict import MessageDict, DEFAULT_MESSAGE, MESSAGE_SEPARATOR, JSON_SEPARATOR, \
+    HANDSHAKE_MESSAGE, DIGEST_MESSAGE, decode_frame, is_binary_frame, announces_binary, \
+    messages_to_frame, message_to_string, message_to_bytes, MESSAGE_HEADER_STRUCT, FRAME_HEADER_STRUCT, WIRE_MAGIC, \
+    WIRE_VERSION, UTF_8, is_heartbeat_frame
 
 alice_information = NodeInformation(NetAddress(port=4040), name='alice')
 bob_information = NodeInformation(NetAddress(port=5050), name='bob')
@@ -71,28 +71,115 @@ class MessageDictTestCase(unittest.TestCase):
         self.assertEqual('test', nextMsg)
         self.assertEqual(DEFAULT_MESSAGE + JSON_SEPARATOR + bob_information.to_json(), message_dict.get_next_message(alice_information))
 
-    def test_wait_unit_all_received(self):
+    def test_binary_frame_after_handshake(self):
         """
-        Checks if wait_until_everybody_received to not stuck in an
-        endless loop after all messages has been taken.
+        Checks if handshake is send in json format with announcement of binary wire format
+        and following messages are send in binary format after other node announced it.
         :return: None
         """
         message_dict = MessageDict(bob_information)
-        message_dict.add_node(bob_information)
-        message_dict.add_node(peter_information)
-        message_dict.add_dispatch_message(alice_information, SynchronizedSet(set()))
-        t = threading.Thread(target=self.take_message, args=(message_dict,))
-        t.start()
-        message_dict.wait_until_everybody_received(DISPATCH_MESSAGE + MESSAGE_SEPARATOR + alice_information.to_json())
-
-    def take_message(self, message_dict):
-        """"
-        Help method that take the messages to simulate PingMan who send
-        messages.
-        """
-        time.sleep(1)
-        message_dict.get_next_message(bob_information)
-        message_dict.get_next_message(peter_information)
+        message_dict.add_handshake_message(bob_information, alice_information)
+        frame = message_dict.get_next_frame(alice_information)
+        self.assertFalse(is_binary_frame(frame))
+        self.assertTrue(announces_binary(frame))
+        self.assertEqual(HANDSHAKE_MESSAGE, decode_frame(frame)[0].subject)
+        message_dict.enable_binary(alice_information)
+        frame = message_dict.get_next_frame(alice_information)
+        self.assertTrue(is_binary_frame(frame))
+        messages = decode_frame(frame)
+        self.assertEqual(1, len(messages))
+        self.assertEqual(DEFAULT_MESSAGE, messages[0].subject)
+        self.assertEqual(bob_information, messages[0].node_info)
+        self.assertEqual(peter_information, messages[0].node_info.wish_master)
+
+    def test_digest_until_version_changes(self):
+        """
+        Checks if full information is send once and digests afterwards until wish master
+        changes or other node forgot information.
+        :return: None
+        """
+        own_information = NodeInformation(NetAddress(port=7070), name='own')
+        own_information.wish_master = alice_information
+        message_dict = MessageDict(own_information, send_digests=True)
+        message_dict.enable_binary(bob_information)
+        self.assertEqual(DEFAULT_MESSAGE, decode_frame(message_dict.get_next_frame(bob_information))[0].subject)
+        digest = decode_frame(message_dict.get_next_frame(bob_information))[0]
+        self.assertEqual(DIGEST_MESSAGE, digest.subject)
+        self.assertEqual(own_information.node_key, digest.node_key)
+        self.assertEqual(own_information.version, digest.version)
+        message_dict.forget_sent_version(bob_information)
+        self.assertEqual(DEFAULT_MESSAGE, decode_frame(message_dict.get_next_frame(bob_information))[0].subject)
+        own_information.wish_master = own_information
+        full = decode_frame(message_dict.get_next_frame(bob_information))[0]
+        self.assertEqual(DEFAULT_MESSAGE, full.subject)
+        self.assertEqual(own_information, full.node_info.wish_master)
+
+    def test_default_message_is_encoded_once(self):
+        """
+        Checks if default message is encoded once for all targets and again after
+        wish master changed.
+        :return: None
+        """
+        own_information = NodeInformation(NetAddress(port=7070), name='own')
+        message_dict = MessageDict(own_information)
+        message_dict.enable_binary(bob_information)
+        message_dict.enable_binary(peter_information)
+        default = Message(DEFAULT_MESSAGE, own_information)
+        self.assertIs(message_to_bytes(default), message_to_bytes(default))
+        self.assertEqual(message_dict.get_next_frame(bob_information),
+                         message_dict.get_next_frame(peter_information))
+        self.assertIs(message_to_string(default), message_to_string(default))
+        own_information.wish_master = alice_information
+        self.assertEqual(alice_information, decode_frame(
+            message_dict.get_next_frame(bob_information))[0].node_info.wish_master)
+
+    def test_heartbeat_frames(self):
+        """
+        Checks if json and binary frames are classified by subjects and frames which
+        can't be decoded count as heartbeats.
+        :return: None
+        """
+        default = Message(DEFAULT_MESSAGE, bob_information)
+        handshake = Message(HANDSHAKE_MESSAGE, bob_information)
+        for messages, heartbeat in (([default, default], True), ([default, handshake], False)):
+            json_frame = bytes(MESSAGE_SEPARATOR.join(map(message_to_string, messages)), UTF_8)
+            self.assertEqual(heartbeat, is_heartbeat_frame(json_frame))
+            self.assertEqual(heartbeat, is_heartbeat_frame(messages_to_frame(messages)))
+        self.assertTrue(is_heartbeat_frame(bytes(DEFAULT_MESSAGE + JSON_SEPARATOR + '{', UTF_8)))
+        self.assertTrue(is_heartbeat_frame(b'\xff\xfe'))
+
+    def test_handshakes_are_decoded_first(self):
+        """
+        Checks if handshakes of binary and json frames are returned before other
+        messages and names with separators are decoded correctly.
+        :return: None
+        """
+        tricky_information = NodeInformation(NetAddress(port=8080),
+                                             name='a' + MESSAGE_SEPARATOR + 'b' + JSON_SEPARATOR)
+        messages = [Message(DEFAULT_MESSAGE, bob_information),
+                    Message(HANDSHAKE_MESSAGE, tricky_information)]
+        decoded = decode_frame(messages_to_frame(messages))
+        self.assertEqual([HANDSHAKE_MESSAGE, DEFAULT_MESSAGE], [msg.subject for msg in decoded])
+        self.assertEqual(tricky_information.name, decoded[0].node_info.name)
+        json_frame = MESSAGE_SEPARATOR.join(message_to_string(message) for message in
+                                            [Message(DEFAULT_MESSAGE, bob_information),
+                                             Message(HANDSHAKE_MESSAGE, alice_information)])
+        decoded = decode_frame(json_frame.encode(UTF_8))
+        self.assertEqual([HANDSHAKE_MESSAGE, DEFAULT_MESSAGE], [msg.subject for msg in decoded])
+        self.assertEqual(alice_information, decoded[0].node_info)
+
+    def test_unknown_type_is_skipped(self):
+        """
+        Checks if message with unknown type tag is skipped by its length.
+        :return: None
+        """
+        known = messages_to_frame([Message(DEFAULT_MESSAGE, bob_information)])
+        unknown = MESSAGE_HEADER_STRUCT.pack(255, 3) + b'xyz'
+        frame = FRAME_HEADER_STRUCT.pack(WIRE_MAGIC, WIRE_VERSION, 2) + unknown \
+                + known[FRAME_HEADER_STRUCT.size:]
+        decoded = decode_frame(frame)
+        self.assertEqual(1, len(decoded))
+        self.assertEqual(bob_information, decoded[0].node_info)
 
 
 if __name__ == '__main__':
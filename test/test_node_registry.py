@@ -0,0 +1,120 @@
+"""
+Tests for node registry and node sets backed by bitmasks.
+"""
+import unittest
+
+from synchronized_set import SynchronizedSet
+
+from src.beans import NodeInformation, NetAddress
+from src.node_registry import NodeRegistry, NodeSet, NodeIndex, find_by_key, count_nodes
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+peter_information = NodeInformation(NetAddress(port=6060), name='peter', birthtime=1)
+
+
+class NodeRegistryCase(unittest.TestCase):
+    """
+    Tests for ids of nodes and masks of node sets.
+    """
+
+    def setUp(self):
+        self.registry = NodeRegistry()
+
+    def test_ids_are_stable(self):
+        """
+        Checks if node keeps its id, equal instances share it and nodes can be found
+        by id and node key.
+        :return: None
+        """
+        alice_id = self.registry.register(alice_information)
+        bob_id = self.registry.register(bob_information)
+        self.assertNotEqual(alice_id, bob_id)
+        self.assertEqual(alice_id, self.registry.register(
+            NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)))
+        self.assertIs(self.registry.node(bob_id), bob_information)
+        self.assertIs(self.registry.by_key(bob_information.node_key), bob_information)
+        self.assertIsNone(self.registry.by_key(peter_information.node_key))
+        self.assertEqual(self.registry.nodes_of(self.registry.mask_of(
+            [bob_information, alice_information])), [alice_information, bob_information])
+
+    def test_registry_is_bounded(self):
+        """
+        Checks if registry refuses nodes after max nodes are registered, but keeps ids
+        of registered nodes.
+        :return: None
+        """
+        registry = NodeRegistry(max_nodes=2)
+        nodes = NodeSet(registry, [alice_information, bob_information])
+        with self.assertRaises(ValueError):
+            nodes.add(peter_information)
+        self.assertNotIn(peter_information, nodes)
+        self.assertEqual(registry.mask_of(nodes), 0b11)
+        self.assertEqual(registry.register(bob_information), 1)
+
+    def test_mask_follows_set(self):
+        """
+        Checks if mask of node set contains exactly the nodes of set after changes.
+        :return: None
+        """
+        nodes = NodeSet(self.registry, [alice_information, bob_information])
+        nodes.add(peter_information)
+        nodes.discard(alice_information)
+        nodes.discard(alice_information)
+        self.assertEqual(self.registry.nodes_of(nodes.mask), [bob_information, peter_information])
+        nodes -= {peter_information}
+        copy = nodes.copy()
+        nodes.clear()
+        self.assertEqual(nodes.mask, 0)
+        self.assertEqual(copy, SynchronizedSet({bob_information}))
+        self.assertEqual(count_nodes(copy.mask), 1)
+        union = copy.union({alice_information})
+        self.assertIsInstance(union, NodeSet)
+        self.assertEqual(self.registry.nodes_of(union.mask), [alice_information, bob_information])
+
+    def test_find_by_key(self):
+        """
+        Checks if only nodes of set are found by their key.
+        :return: None
+        """
+        nodes = NodeSet(self.registry, [alice_information])
+        self.registry.register(bob_information)
+        self.assertIs(find_by_key(nodes, alice_information.node_key), alice_information)
+        self.assertIsNone(find_by_key(nodes, bob_information.node_key))
+        self.assertIs(find_by_key([bob_information], bob_information.node_key), bob_information)
+
+
+class NodeIndexCase(unittest.TestCase):
+    """
+    Tests for selecting best node by index.
+    """
+
+    def test_best_node_follows_live_nodes_and_keys(self):
+        """
+        Checks if best node is node with lowest key among live nodes after joins,
+        leaves and changed keys.
+        :return: None
+        """
+        registry = NodeRegistry()
+        ranks = {alice_information: 3, bob_information: 2, peter_information: 1}
+        index = NodeIndex(registry, lambda node: ranks[node])
+        self.assertIsNone(index.best())
+        index.sync(registry.mask_of([alice_information, bob_information]))
+        self.assertIs(index.best(), bob_information)
+        index.sync(registry.mask_of([alice_information, peter_information]))
+        self.assertIs(index.best(), peter_information)
+        ranks[alice_information] = 0
+        index.update(alice_information)
+        self.assertIs(index.best(), alice_information)
+        ranks[alice_information] = 5
+        index.update(alice_information)
+        self.assertIs(index.best(), peter_information)
+        index.sync(registry.mask_of([alice_information]))
+        self.assertIs(index.best(), alice_information)
+        for _ in range(100):
+            index.update(alice_information)
+        self.assertLess(len(index.heap), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Tests for priority lanes of outgoing messages.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress, Message
+from src.message_dict import MessageDict, DEFAULT_MESSAGE, DISPATCH_MESSAGE, MEMBER_ALIVE, \
+    decode_frame
+from src.priority_lanes import PriorityLanes, CONTROL_LANE, MEMBERSHIP_LANE, BULK_LANE
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+
+
+def encode_two_bytes(message: str) -> bytes:
+    """
+    :param message: queued string
+    :return: first two characters as bytes
+    """
+    return message[:2].encode()
+
+
+class PriorityLanesCase(unittest.TestCase):
+    """
+    Tests for draining lanes by priority within byte budget.
+    """
+
+    def test_higher_lanes_first_within_budget(self):
+        """
+        Checks if control messages are taken before older messages of lower lanes and
+        budget limits frame.
+        :return: None
+        """
+        lanes = PriorityLanes(budget=5)
+        for number in range(4):
+            lanes.put(BULK_LANE, 'bulk{}'.format(number))
+        lanes.put(MEMBERSHIP_LANE, 'member')
+        lanes.put(CONTROL_LANE, 'control')
+        self.assertEqual(lanes.depths(), {CONTROL_LANE: 1, MEMBERSHIP_LANE: 1, BULK_LANE: 4})
+        self.assertEqual(lanes.take(encode_two_bytes),
+                         [('control', b'co'), ('member', b'me'), ('bulk0', b'bu')])
+        self.assertEqual(lanes.take(encode_two_bytes), [('bulk1', b'bu'), ('bulk2', b'bu')])
+        self.assertEqual(lanes.take(encode_two_bytes), [('bulk3', b'bu')])
+        self.assertTrue(lanes.empty())
+
+    def test_lower_lanes_are_not_starved(self):
+        """
+        Checks if oldest message of every lane is taken even if higher lanes exceed
+        budget.
+        :return: None
+        """
+        lanes = PriorityLanes(budget=1)
+        lanes.put(BULK_LANE, 'bulk')
+        lanes.put(CONTROL_LANE, 'control0')
+        lanes.put(CONTROL_LANE, 'control1')
+        self.assertEqual([message for message, _ in lanes.take(str.encode)],
+                         ['control0', 'bulk'])
+        self.assertEqual(lanes.take(str.encode), [('control1', b'control1')])
+
+    def test_each_message_is_encoded_once(self):
+        """
+        Checks if taken messages are encoded only once and returned with encoding.
+        :return: None
+        """
+        encoded = []
+
+        def encode(message):
+            encoded.append(message)
+            return message.encode()
+
+        lanes = PriorityLanes(budget=4)
+        lanes.put(BULK_LANE, 'ab')
+        lanes.put(BULK_LANE, 'cd')
+        self.assertEqual(lanes.take(encode), [('ab', b'ab'), ('cd', b'cd')])
+        self.assertEqual(encoded, ['ab', 'cd'])
+
+    def test_dispatch_overtakes_backlog(self):
+        """
+        Checks if dispatch message is sent in next frame although many bulk messages
+        are queued for node.
+        :return: None
+        """
+        message_dict = MessageDict(alice_information, frame_budget=1024)
+        message_dict.enable_binary(bob_information)
+        for _ in range(100):
+            message_dict.add_message_for_node(Message(DEFAULT_MESSAGE, alice_information),
+                                              bob_information)
+        message_dict.add_message_for_node(Message(MEMBER_ALIVE, alice_information),
+                                          bob_information)
+        message_dict.add_dispatch_message(alice_information, [bob_information])
+        messages = decode_frame(message_dict.get_next_frame(bob_information))
+        self.assertEqual([DISPATCH_MESSAGE, MEMBER_ALIVE, DEFAULT_MESSAGE],
+                         [message.subject for message in messages[:3]])
+        self.assertLess(len(messages), 100)
+        depths = message_dict.lane_depths()
+        self.assertEqual(depths[CONTROL_LANE], 0)
+        self.assertEqual(depths[BULK_LANE], 100 - len(messages) + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Tests for round trip times to peers.
+"""
+import unittest
+
+from src.beans import NodeInformation, NetAddress, NO_RTT
+from src.rtt import RttTracker, percentile
+
+alice_information = NodeInformation(NetAddress(port=4040), name='alice', birthtime=1)
+bob_information = NodeInformation(NetAddress(port=5050), name='bob', birthtime=1)
+
+
+class RttTrackerCase(unittest.TestCase):
+    """
+    Tests for samples per peer and summary over peers.
+    """
+
+    def test_summary_over_peers(self):
+        """
+        Checks if peer is summarized by median of its last samples and summary contains
+        median and p95 over peers.
+        :return: None
+        """
+        tracker = RttTracker(window=3)
+        self.assertEqual(tracker.summary(), (NO_RTT, NO_RTT))
+        for rtt in (0.5, 0.001, 0.002, 0.003):
+            tracker.sample(alice_information, rtt)
+        tracker.sample(bob_information, 0.01)
+        self.assertEqual(tracker.rtt_of(alice_information), 0.002)
+        self.assertEqual(tracker.summary(), (0.01, 0.01))
+        tracker.forget(bob_information)
+        self.assertEqual(tracker.summary(), (0.002, 0.002))
+        self.assertIsNone(tracker.rtt_of(bob_information))
+
+    def test_percentile(self):
+        """
+        Checks nearest rank percentile.
+        :return: None
+        """
+        values = list(range(1, 21))
+        self.assertEqual(percentile(values, 0.5), 11)
+        self.assertEqual(percentile(values, 0.95), 20)
+        self.assertEqual(percentile([3], 0.95), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
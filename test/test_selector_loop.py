@@ -0,0 +1,51 @@
+"""
+Tests for loop which waits for readable sockets.
+"""
+import socket
+import threading
+import unittest
+
+from src.selector_loop import SelectorLoop
+
+
+class SelectorLoopCase(unittest.TestCase):
+    """
+    Tests for loop which waits for readable sockets.
+    """
+
+    def test_callback_of_readable_socket(self):
+        """
+        Checks if callback is called in loop thread with readable socket and not
+        after socket was unregistered.
+        :return: None
+        """
+        sender, receiver = socket.socketpair()
+        receiver.setblocking(False)
+        received = []
+        readable = threading.Event()
+
+        def read(sock):
+            received.append((sock.recv(16), threading.current_thread()))
+            readable.set()
+
+        loop = SelectorLoop()
+        loop.acquire()
+        try:
+            loop.register(receiver, read)
+            sender.sendall(b'alice')
+            self.assertTrue(readable.wait(5))
+            self.assertEqual(received[0][0], b'alice')
+            self.assertIs(received[0][1], loop.thread)
+            loop.unregister(receiver)
+            readable.clear()
+            sender.sendall(b'bob')
+            self.assertFalse(readable.wait(0.2))
+        finally:
+            loop.release()
+            sender.close()
+            receiver.close()
+        self.assertFalse(loop.thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,8 @@ import time
 import unittest
 
 from src.beans import NetAddress, NodeInformation
-from src.factory import create_node_manger_by_node_info
+from src.factory import create_node_manger_by_node_info, ASYNCIO_ENGINE, THREAD_ENGINE, \
+    SELECTOR_ENGINE
 from synchronized_set import SynchronizedSet
 
 
@@ -24,6 +25,38 @@ class StandardNetworkCase(unittest.TestCase):
         alice.dispatch()
         alice.kill()
 
+    def test_simple_handshake_with_asyncio_engine(self):
+        """
+        Test if two nodes which use asyncio engine can start, make handshake, add each
+        other to connected and determine same wish_master
+        :return: None
+        """
+        global alice, bob
+        try:
+            alice_information = NodeInformation(NetAddress(port=3003), birthtime=50, name='alice')
+            bob_information = NodeInformation(NetAddress(port=4003), birthtime=100, name='bob')
+            self.start_and_check_master_and_connection(alice_information, bob_information,
+                                                       engine=ASYNCIO_ENGINE)
+        finally:
+            alice.kill()
+            bob.kill()
+
+    def test_simple_handshake_with_selector_engine(self):
+        """
+        Test if two nodes which read connections with selector loop can start, make
+        handshake, add each other to connected and determine same wish_master
+        :return: None
+        """
+        global alice, bob
+        try:
+            alice_information = NodeInformation(NetAddress(port=3006), birthtime=50, name='alice')
+            bob_information = NodeInformation(NetAddress(port=4006), birthtime=100, name='bob')
+            self.start_and_check_master_and_connection(alice_information, bob_information,
+                                                       engine=SELECTOR_ENGINE)
+        finally:
+            alice.kill()
+            bob.kill()
+
     def test_simple_handshake(self):
         """
         Test if two nodes can start, make handshake, add each other to connected and
@@ -39,6 +72,42 @@ class StandardNetworkCase(unittest.TestCase):
             alice.kill()
             bob.kill()
 
+    def test_simple_handshake_with_load_strategy(self):
+        """
+        Test if two nodes which vote by load find each other on 5-digit ports, although
+        they advertise metrics, add each other to connected and determine same wish_master
+        :return: None
+        """
+        global alice, bob
+        try:
+            alice_information = NodeInformation(NetAddress(port=13007), birthtime=50,
+                                                name='alice')
+            bob_information = NodeInformation(NetAddress(port=14007), birthtime=100,
+                                              name='bob')
+            self.start_and_check_master_and_connection(alice_information, bob_information,
+                                                       vote_by_load=True)
+        finally:
+            alice.kill()
+            bob.kill()
+
+    def test_simple_handshake_with_rtt_strategy(self):
+        """
+        Test if two nodes which vote by round trip times find each other on 5-digit
+        ports, add each other to connected and determine same wish_master
+        :return: None
+        """
+        global alice, bob
+        try:
+            alice_information = NodeInformation(NetAddress(port=13008), birthtime=50,
+                                                name='alice')
+            bob_information = NodeInformation(NetAddress(port=14008), birthtime=100,
+                                              name='bob')
+            self.start_and_check_master_and_connection(alice_information, bob_information,
+                                                       vote_by_rtt=True)
+        finally:
+            alice.kill()
+            bob.kill()
+
     def test_shutdown_if_other_is_lost(self):
         """
         Test if node in a network of two nodes shutdown if other has been killed.
@@ -84,16 +153,21 @@ class StandardNetworkCase(unittest.TestCase):
             alice2.kill()
             bob.kill()
 
-    def start_and_check_master_and_connection(self, alice_information, bob_information):
+    def start_and_check_master_and_connection(self, alice_information, bob_information,
+                                              engine=THREAD_ENGINE, **options):
         """
         Help method. Init two nodes and checks if both are connected and determine same master.
         :param alice_information: info for first node
         :param bob_information: info for second node
+        :param engine: engine used by both nodes
+        :param options: further arguments of create_node_manger_by_node_info for both nodes
         :return: None
         """
         global alice, bob
-        alice = create_node_manger_by_node_info(alice_information, debug=True)
-        bob = create_node_manger_by_node_info(bob_information, debug=True)
+        alice = create_node_manger_by_node_info(alice_information, debug=True, engine=engine,
+                                                **options)
+        bob = create_node_manger_by_node_info(bob_information, debug=True, engine=engine,
+                                              **options)
         alice.start()
         time.sleep(3)
         bob.start()
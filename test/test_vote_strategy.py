@@ -3,8 +3,11 @@ Contains testcases for vote calculation.
 """
 import unittest
 
-from src.vote_strategy import PortStrategy, TimeStrategy
-from src.beans import NodeInformation, NetAddress
+from src.vote_strategy import PortStrategy, TimeStrategy, LoadStrategy, RttStrategy, \
+    VoteTally, NO_VOTE, RTT_P95
+from src.beans import NodeInformation, NetAddress, NodeMetrics
+from src.node_registry import NodeRegistry, NodeSet
+from test.helpers import FakeClock
 
 alice_information = NodeInformation(NetAddress(port=4040), birthtime=100, name='alice')
 bob_information = NodeInformation(NetAddress(port=5050), birthtime=200, name='bob')
@@ -32,6 +35,204 @@ class VoteStrategyCase(unittest.TestCase):
         result = port_strategy.get_best_node(all_information)
         self.assertEqual(result, peter_information)
 
+    def test_load_strategy(self):
+        """
+        Check if strategy selects least loaded node and skips nodes without metrics.
+        :return: None
+        """
+        nodes = [NodeInformation(NetAddress(port=port), birthtime=1, name=name,
+                                 metrics=metrics)
+                 for port, name, metrics in [(4040, 'alice', NodeMetrics(2.0, 0, 0)),
+                                             (5050, 'bob', NodeMetrics(0.5, 0, 10)),
+                                             (6060, 'peter', None)]]
+        load_strategy = LoadStrategy(None, None)
+        self.assertEqual(load_strategy.get_best_node(nodes), nodes[1])
+        self.assertEqual(load_strategy.get_best_node(nodes[2:]), nodes[2])
+
+    def test_rtt_strategy(self):
+        """
+        Check if strategy selects node with lowest median or p95 round trip time and
+        earliest time of initialisation between nodes of equal round trip time.
+        :return: None
+        """
+        nodes = [NodeInformation(NetAddress(port=port), birthtime=birthtime, name=name,
+                                 metrics=NodeMetrics(rtt_median=median, rtt_p95=p95))
+                 for port, birthtime, name, median, p95 in [(4040, 3, 'alice', 0.001, 0.05),
+                                                           (5050, 2, 'bob', 0.0105, 0.011),
+                                                           (6060, 1, 'peter', 0.0101, 0.5)]]
+        self.assertEqual(RttStrategy(None, None).get_best_node(nodes), nodes[0])
+        self.assertEqual(RttStrategy(None, None, statistic=RTT_P95).get_best_node(nodes),
+                         nodes[1])
+        self.assertEqual(RttStrategy(None, None).get_best_node(nodes[1:]), nodes[2])
+
+
+class VoteTallyCase(unittest.TestCase):
+
+    def test_leader_follows_changed_votes(self):
+        """
+        Check if leader and margin follow votes which are changed and removed.
+        :return: None
+        """
+        tally = VoteTally()
+        self.assertEqual(tally.leader(), (None, 0))
+        self.assertTrue(tally.set_vote(0, 1))
+        self.assertTrue(tally.set_vote(1, 1))
+        self.assertTrue(tally.set_vote(2, 2))
+        self.assertFalse(tally.set_vote(2, 2))
+        self.assertEqual(tally.leader(), (1, 2))
+        self.assertEqual(tally.margin(), 1)
+        version = tally.version
+        tally.set_vote(0, 2)
+        self.assertEqual(tally.leader(), (2, 2))
+        self.assertEqual(tally.margin(), 1)
+        self.assertGreater(tally.version, version)
+        tally.remove_vote(2)
+        self.assertEqual(tally.margin(), 0)
+        tally.remove_vote(0)
+        tally.set_vote(1, NO_VOTE)
+        self.assertEqual(tally.leader(), (NO_VOTE, 1))
+        tally.remove_vote(1)
+        self.assertEqual(tally.leader(), (None, 0))
+
+
+class FakeNodeManager:
+    """
+    Records master which strategy notified.
+    """
+
+    def __init__(self):
+        self.master = None
+        self.masters = []
+
+    def update(self, update_value):
+        self.master = update_value[0].value[1]
+        self.masters.append(self.master)
+
+
+class TermCase(unittest.TestCase):
+    """
+    Tests for votes which are cast in terms of election.
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = NodeRegistry()
+        self.own = NodeInformation(NetAddress(port=5050), birthtime=1, name='own')
+        self.strategy = PortStrategy(self.own, None, self.registry, clock=self.clock)
+        self.manager = FakeNodeManager()
+        self.strategy.node_manager = self.manager
+        self.strategy.attach(self.manager)
+        self.connected = NodeSet(self.registry)
+        self.empty = NodeSet(self.registry)
+
+    def vote(self, name, port, wish_master, term):
+        """
+        :return: node which votes wish master in term
+        """
+        return NodeInformation(NetAddress(port=port), birthtime=1, name=name,
+                               wish_master=wish_master, term=term)
+
+    def test_changed_view_starts_next_term(self):
+        """
+        Checks if master is decided once all connected nodes voted in current term, a
+        join which changes own vote starts next term and old votes are discarded.
+        :return: None
+        """
+        bob = self.vote('bob', 6060, self.own, 0)
+        self.connected.add(bob)
+        self.strategy.calc_new_master(self.connected, self.empty, self.empty)
+        self.assertTrue(self.strategy.record_vote(bob))
+        self.clock.now = 2
+        self.strategy.calc_new_master(self.connected, self.empty, self.empty)
+        self.assertEqual(self.manager.masters, [self.own])
+        self.assertEqual(self.strategy.election_stats()['convergence'], 2)
+
+        alice = self.vote('alice', 4040, None, 0)
+        self.connected.add(alice)
+        self.strategy.calc_new_master(self.connected, self.empty, self.empty)
+        self.assertEqual((self.strategy.term, self.own.term), (1, 1))
+        self.assertEqual(self.own.wish_master, alice)
+        self.assertFalse(self.strategy.record_vote(bob))
+        self.assertEqual(self.strategy.election_stats()['stale_votes'], 1)
+
+        for voter in (self.vote('bob', 6060, alice, 1), self.vote('alice', 4040, alice, 1)):
+            self.strategy.record_vote(voter)
+        self.strategy.calc_new_master(self.connected, self.empty, self.empty)
+        self.assertEqual(self.manager.masters, [self.own, alice])
+        stats = self.strategy.election_stats()
+        self.assertEqual((stats['term'], stats['transitions']), (1, 1))
+
+    def test_newer_term_is_joined_and_vote_is_cast_once(self):
+        """
+        Checks if vote of newer term makes node join term and cast own vote again and
+        a second different vote of a node in same term is discarded.
+        :return: None
+        """
+        bob = self.vote('bob', 6060, self.own, 0)
+        self.connected.add(bob)
+        self.strategy.calc_new_master(self.connected, self.empty, self.empty)
+        self.strategy.record_vote(self.vote('bob', 6060, self.own, 4))
+        self.assertEqual((self.strategy.term, self.own.term), (4, 4))
+        self.assertEqual(self.strategy.tally.vote_of(self.registry.register(self.own)),
+                         self.registry.register(self.own))
+        self.assertFalse(self.strategy.record_vote(self.vote('bob', 6060, bob, 4)))
+        self.assertEqual(self.strategy.tally.leader()[1], 2)
+
+
+class LoadCase(unittest.TestCase):
+    """
+    Tests for hysteresis of load strategy.
+    """
+
+    def test_master_is_kept_until_clearly_more_loaded(self):
+        """
+        Check if master stays best node while another node is only slightly less
+        loaded and if received metrics sort sender again.
+        :return: None
+        """
+        registry = NodeRegistry()
+        own = NodeInformation(NetAddress(port=5050), birthtime=2, name='own',
+                              metrics=NodeMetrics(1.0, 0, 0))
+        strategy = LoadStrategy(own, None, registry)
+        manager = FakeNodeManager()
+        strategy.node_manager = manager
+        strategy.attach(manager)
+        bob = NodeInformation(NetAddress(port=6060), birthtime=1, name='bob',
+                              metrics=NodeMetrics(1.0, 0, 0))
+        bob.wish_master = bob
+        connected = NodeSet(registry, [bob])
+        strategy.record_vote(bob)
+        strategy.calc_new_master(connected, NodeSet(registry), NodeSet(registry))
+        self.assertEqual(manager.masters, [bob])
+
+        bob.metrics = NodeMetrics(1.3, 0, 0)
+        self.assertTrue(strategy.record_vote(bob))
+        self.assertEqual(strategy.best_node(connected.mask), bob)
+        bob.metrics = NodeMetrics(1.8, 0, 0)
+        self.assertTrue(strategy.record_vote(bob))
+        self.assertEqual(strategy.best_node(connected.mask), own)
+
+    def test_self_election_gets_no_hysteresis(self):
+        """
+        Check if node which elected itself while alone does not prefer itself once
+        another equally loaded node connected.
+        :return: None
+        """
+        registry = NodeRegistry()
+        own = NodeInformation(NetAddress(port=5050), birthtime=2, name='own',
+                              metrics=NodeMetrics(1.0, 0, 0))
+        strategy = LoadStrategy(own, None, registry)
+        manager = FakeNodeManager()
+        strategy.node_manager = manager
+        strategy.attach(manager)
+        strategy.calc_new_master(NodeSet(registry), NodeSet(registry), NodeSet(registry))
+        self.assertEqual(manager.masters, [own])
+        self.assertIsNone(strategy.incumbent)
+        bob = NodeInformation(NetAddress(port=6060), birthtime=1, name='bob',
+                              metrics=NodeMetrics(1.0, 0, 0))
+        strategy.record_vote(bob)
+        self.assertEqual(strategy.best_node(NodeSet(registry, [bob]).mask), bob)
+
 
 if __name__ == '__main__':
     unittest.main()